@@ -0,0 +1,199 @@
+"""
+采集程序开销测试
+在设备上（与 run_with_freq 相同的环境，root）分别在 不采集 / capture.bt / capture_marker.bt 三种情况下
+冷启动同一个App若干次，对比启动时长（am start -W 的 TotalTime）、启动期间全系统CPU占用、
+bpftrace进程本身的CPU时间和输出行数。
+
+BPF程序在被探测的线程上下文中执行，其开销计入全系统CPU占用，而不是bpftrace进程。
+
+用法（在 /root 下，与 capture*.bt 放在一起）:
+    python3 bench_capture_overhead.py com.tencent.mm -n 5
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+import statistics
+import subprocess
+
+
+# 采集模式 -> bpftrace程序（None表示不采集）
+CAPTURE_MODES = {
+    "none": None,
+    "syscall": "capture.bt",
+    "marker": "capture_marker.bt",
+}
+
+# bpftrace 编译、挂载探针的最长等待时间（秒）
+ATTACH_TIMEOUT_S = 60.0
+
+_TOTAL_TIME_RE = re.compile(r"^TotalTime:\s*(\d+)", re.MULTILINE)
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+
+def run_cmd(cmd, timeout=30.0):
+    """执行shell命令，返回标准输出"""
+    result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    return result.stdout.decode("utf-8", "ignore")
+
+
+def read_system_cpu():
+    """
+    Returns:
+        tuple: (忙碌jiffies, 总jiffies)，来自 /proc/stat 的 cpu 行
+    """
+    with open("/proc/stat") as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    return sum(fields) - idle, sum(fields)
+
+
+def read_process_cpu_ms(pid):
+    """进程（含已退出子进程）的 user + sys CPU时间（毫秒），进程不存在时返回0"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # comm 可能含空格，从最后一个 ')' 之后开始数字段
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return 0.0
+    # utime, stime, cutime, cstime 是第14-17个字段
+    return sum(int(v) for v in fields[11:15]) * 1000.0 / CLK_TCK
+
+
+class CaptureProcess:
+    """后台运行的bpftrace进程，输出只计数不处理"""
+
+    def __init__(self, program):
+        self.program = program
+        self.proc = None
+        self.lines = 0
+        self._attached = threading.Event()
+
+    def _drain(self):
+        for _ in self.proc.stdout:
+            self.lines += 1
+            # 第一行是 BEGIN 中打印的 "Tracing..."，说明探针已挂载
+            self._attached.set()
+
+    def start(self):
+        self.proc = subprocess.Popen(["bpftrace", self.program], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        threading.Thread(target=self._drain, daemon=True).start()
+        if not self._attached.wait(ATTACH_TIMEOUT_S):
+            self.stop()
+            raise RuntimeError(f"bpftrace {self.program} 在 {ATTACH_TIMEOUT_S:.0f} 秒内没有完成挂载")
+
+    def cpu_ms(self):
+        return read_process_cpu_ms(self.proc.pid)
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def resolve_component(package_name):
+    """查询App的启动Activity（"包名/Activity"），失败返回None"""
+    output = run_cmd(f"cmd package resolve-activity --brief -c android.intent.category.LAUNCHER {package_name}")
+    lines = [line.strip() for line in output.splitlines() if "/" in line]
+    return lines[-1] if lines else None
+
+
+def cold_start_once(package_name, component, settle_s, capture=None):
+    """
+    冷启动一次
+
+    Returns:
+        dict: {'total_time_ms', 'system_cpu_ms', 'capture_cpu_ms', 'capture_lines'}，启动失败时返回None
+    """
+    run_cmd(f"am force-stop {package_name}")
+    time.sleep(settle_s)
+
+    lines_before = capture.lines if capture else 0
+    capture_cpu_before = capture.cpu_ms() if capture else 0.0
+    busy_before, _ = read_system_cpu()
+    output = run_cmd(f"am start -W -n {component}")
+    busy_after, _ = read_system_cpu()
+
+    match = _TOTAL_TIME_RE.search(output)
+    if not match:
+        return None
+    return {
+        'total_time_ms': float(match.group(1)),
+        'system_cpu_ms': (busy_after - busy_before) * 1000.0 / CLK_TCK,
+        'capture_cpu_ms': (capture.cpu_ms() - capture_cpu_before) if capture else 0.0,
+        'capture_lines': (capture.lines - lines_before) if capture else 0
+    }
+
+
+def bench_mode(mode, package_name, component, repeats, settle_s):
+    """
+    在一种采集模式下冷启动 repeats 次
+
+    Returns:
+        list: cold_start_once() 的结果（不含失败的启动）
+    """
+    program = CAPTURE_MODES[mode]
+    capture = None
+    if program:
+        capture = CaptureProcess(program)
+        capture.start()
+    try:
+        runs = []
+        for i in range(repeats):
+            run = cold_start_once(package_name, component, settle_s, capture)
+            if run is None:
+                print(f"[WARN] {mode} 第 {i + 1} 次启动没有返回TotalTime", flush=True)
+                continue
+            runs.append(run)
+            print(f"[{mode}] 第 {i + 1}/{repeats} 次: TotalTime {run['total_time_ms']:.0f} ms，"
+                  f"系统CPU {run['system_cpu_ms']:.0f} ms，输出 {run['capture_lines']} 行", flush=True)
+        return runs
+    finally:
+        if capture:
+            capture.stop()
+        # 恢复App关闭状态
+        run_cmd(f"am force-stop {package_name}")
+
+
+def print_summary(results):
+    """打印每种模式的中位数，以及相对不采集的差值"""
+    def median(runs, key):
+        return statistics.median(r[key] for r in runs) if runs else float("nan")
+
+    base = results.get("none")
+    print(f"\n{'模式':<10} {'TotalTime':>10} {'系统CPU':>10} {'bpftrace':>10} {'输出行数':>8} {'启动变慢':>10}")
+    for mode, runs in results.items():
+        total = median(runs, 'total_time_ms')
+        delta = f"{total - median(base, 'total_time_ms'):+.0f} ms" if base and mode != "none" else "-"
+        print(f"{mode:<10} {total:>8.0f}ms {median(runs, 'system_cpu_ms'):>8.0f}ms "
+              f"{median(runs, 'capture_cpu_ms'):>8.0f}ms {median(runs, 'capture_lines'):>8.0f} {delta:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比不同采集程序运行时的冷启动开销')
+    parser.add_argument('package', help='App包名，如 com.tencent.mm')
+    parser.add_argument('-n', '--repeats', type=int, default=5, help='每种模式的启动次数（默认: 5）')
+    parser.add_argument('--modes', nargs='+', default=list(CAPTURE_MODES), choices=list(CAPTURE_MODES),
+                        help='测试的采集模式（默认: 全部）')
+    parser.add_argument('--settle', type=float, default=2.0, help='每次启动前的等待时间，秒（默认: 2）')
+    args = parser.parse_args()
+
+    component = resolve_component(args.package)
+    if not component:
+        print(f"[ERROR] 找不到 {args.package} 的启动Activity", flush=True)
+        sys.exit(1)
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = bench_mode(mode, args.package, component, args.repeats, args.settle)
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+bpftrace事件流解析基准测试
+对比旧解析路径（逐行解码 + json.loads + 子串扫描）和 parse_event_line 快速路径的吞吐量（行/秒），
+并检查两者命中的事件是否一致。
+
+录制事件流（在设备上）:
+    bpftrace capture.bt > stream.log
+"""
+import sys
+import json
+import time
+import random
+import argparse
+
+from live_analyzer_with_freq import EVENT_KEYWORDS, parse_event_line
+
+
+def legacy_parse(line):
+    """旧的解析路径（与改动前的 StateMachine.process 相同的步骤）"""
+    line = line.decode('utf-8', errors='replace').strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        entry = json.loads(line)
+    except:
+        return None
+    if "B|" not in entry['log']:
+        return None
+    content = entry['log'].split('|', 2)[2]
+    keywords = {k for k in EVENT_KEYWORDS if k in content}
+    if not keywords:
+        return None
+    return entry['pid'], content, keywords
+
+
+def synthetic_stream(n, hit_ratio=0.02, seed=0):
+    """
+    生成模拟的事件流：大部分是无关的 trace 日志，少量包含关键字
+
+    Returns:
+        list: bytes行
+    """
+    rng = random.Random(seed)
+    noise = ["Choreographer#doFrame 123456", "RV OnBindView", "Record View#draw()", "inflate",
+             "Lock contention on thread list lock (owner tid: 0)", "binder transaction async"]
+    hits = ["activityStart: cmp=com.tencent.mm/.ui.LauncherUI", "bindApplication",
+            "dispatchInputEvent MotionEvent", "activityResume", "showSoftInput"]
+    lines = []
+    for i in range(n):
+        pid = rng.randint(1000, 30000)
+        if rng.random() < 0.01:
+            lines.append(b"sys_event:AUDIO_ACTIVE\n")
+            continue
+        msg = rng.choice(hits) if rng.random() < hit_ratio else rng.choice(noise)
+        lines.append(f'{{"ts": {i * 100000}, "pid": {pid}, "log": "B|{pid}|{msg}"}}\n'.encode())
+    return lines
+
+
+def _throughput(parse, lines, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for line in lines:
+            parse(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def bench_parser(lines, repeats=3):
+    """
+    Args:
+        lines: bytes行列表
+        repeats: 重复次数（取最快的一次）
+
+    Returns:
+        dict: {'lines', 'hits', 'legacy_lps', 'fast_lps', 'mismatches'}
+    """
+    mismatches = 0
+    hits = 0
+    for line in lines:
+        fast = parse_event_line(line.strip())
+        legacy = legacy_parse(line)
+        hits += fast is not None
+        if (fast is None) != (legacy is None) or (fast and (fast[0], fast[2]) != (legacy[0], legacy[2])):
+            mismatches += 1
+    legacy_lps = _throughput(legacy_parse, lines, repeats)
+    fast_lps = _throughput(lambda l: parse_event_line(l.strip()), lines, repeats)
+    return {'lines': len(lines), 'hits': hits, 'legacy_lps': legacy_lps,
+            'fast_lps': fast_lps, 'mismatches': mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='bpftrace事件流解析基准测试')
+    parser.add_argument('stream', nargs='?', default=None, help='录制的事件流文件（默认使用模拟数据）')
+    parser.add_argument('--synthetic', type=int, default=200000, help='模拟数据行数（默认: 200000）')
+    parser.add_argument('--repeats', type=int, default=3, help='重复次数（默认: 3）')
+    args = parser.parse_args()
+
+    if args.stream:
+        with open(args.stream, 'rb') as f:
+            lines = f.readlines()
+        print(f"事件流: {args.stream}（{len(lines)} 行）")
+    else:
+        lines = synthetic_stream(args.synthetic)
+        print(f"事件流: 模拟数据（{len(lines)} 行）")
+
+    r = bench_parser(lines, args.repeats)
+    print(f"命中关键字: {r['hits']} 行")
+    print(f"旧解析路径: {r['legacy_lps']:,.0f} 行/秒")
+    print(f"快速路径:   {r['fast_lps']:,.0f} 行/秒（{r['fast_lps'] / r['legacy_lps']:.1f}x）")
+    if r['mismatches']:
+        print(f"[WARN] {r['mismatches']} 行两种解析结果不一致")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
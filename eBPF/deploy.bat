@@ -46,8 +46,10 @@ adb shell "mkdir -p %REMOTE_DIR%"
 
 echo [3/3] Transferring files...
 adb push capture.bt %REMOTE_DIR%/
+adb push capture_marker.bt %REMOTE_DIR%/
 adb push live_analyzer_with_freq.py %REMOTE_DIR%/
 adb push freq_config.py %REMOTE_DIR%/
+adb push bench_capture_overhead.py %REMOTE_DIR%/
 if exist "run_with_freq" (
     adb push run_with_freq %REMOTE_DIR%/
 )
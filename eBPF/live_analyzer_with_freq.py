@@ -1,390 +1,1941 @@
 """
 eBPF实时分析器 - 支持本地频率设置
 在设备本地运行，检测app启动事件并立即设置频率，避免WiFi延迟
+
+事件来源：
+    stdin   - bpftrace（capture.bt / capture_marker.bt）的输出，默认
+    tracefs - 直接读取独立tracing实例的 trace_pipe，不需要bpftrace
 """
 import sys
-import json
 import os
+import re
+import json
 import time
+import asyncio
+import signal
+import argparse
 import threading
 import subprocess
+import importlib.util
+from collections import OrderedDict, deque
+
+# 导入频率配置
+try:
+    from freq_config import APPS, APP_FREQ_CONFIGS
+except ImportError:
+    # 如果导入失败，使用空配置
+    APPS = {}
+    APP_FREQ_CONFIGS = {}
+
+# 音频超时 (1.5s)
+AUDIO_TIMEOUT = 1.5
+
+# 音频信号行 (来自 capture.bt 的 Module A)
+AUDIO_EVENT = b"sys_event:AUDIO_ACTIVE"
+
+# StateMachine 关心的trace关键字，其余UI日志行在解码前直接丢弃
+EVENT_KEYWORDS = (
+    "showSoftInput",
+    "hideSoftInput",
+    "activityStart",
+    "activityResume",
+    "dispatchInputEvent",
+    "bindApplication",
+    "startActivity",
+)
+_KEYWORD_RE = re.compile("|".join(EVENT_KEYWORDS).encode())
+
+# capture.bt Module B 的固定输出格式: {"ts": %d, "pid": %d, "log": "B|<pid>|<内容>"}
+_TS_FIELD = b'"ts": '
+_PID_FIELD = b'"pid": '
+_LOG_FIELD = b'"log": "B|'
+
+# capture_marker.bt 的定长记录: E <类型> <pid> <内核时间戳ns> [日志内容]，类型对应的关键字
+MARKER_KINDS = {
+    b"S": "showSoftInput",
+    b"H": "hideSoftInput",
+    b"A": "activityStart",
+    b"R": "activityResume",
+    b"I": "dispatchInputEvent",
+    b"B": "bindApplication",
+    b"T": "startActivity",
+}
+
+# 进程生命周期记录（capture*.bt）: X <pid> 进程退出，N <pid> exec或主线程改名，
+# F <子进程pid> <内核时间戳ns> zygote fork
+_LIFECYCLE_EXIT = b"X "
+_LIFECYCLE_RENAME = b"N "
+_LIFECYCLE_FORK = b"F "
+# trace_pipe 中对应的事件
+_TRACEFS_LIFECYCLE_RE = re.compile(rb"(sched_process_exit|sched_process_exec|task_rename): .*?\bpid=(\d+)")
+_TRACEFS_FORK_RE = re.compile(rb"task_newtask: pid=(\d+)")
+
+# pid缓存的最大条目数
+PID_CACHE_SIZE = 1024
+
+# 进程刚fork时的临时名称，不缓存
+TRANSIENT_PROCESS_NAMES = ("zygote64", "zygote", "<pre-initialized>")
+
+# tracefs 挂载点（按顺序查找）
+TRACEFS_ROOTS = ("/sys/kernel/tracing", "/sys/kernel/debug/tracing")
+
+# 独立的tracing实例，不影响同时运行的Perfetto/atrace
+TRACE_INSTANCE = "live_analyzer"
+
+# 内核不支持 copy_trace_marker 时，用kprobe事件挂在 trace_marker 的写入函数上
+# tracing_mark_write(file, ubuf, cnt, ppos)，第二个参数是用户态缓冲区
+KPROBE_EVENT = "live_analyzer/marker"
+KPROBE_DEFINITION = f"p:{KPROBE_EVENT} tracing_mark_write buf=+0($arg2):ustring"
+
+# 在内核中按关键字过滤（ftrace/print 和 kprobe 事件的字段都叫 buf）
+TRACEFS_FILTER = " || ".join(f'buf ~ "*{k}*"' for k in EVENT_KEYWORDS)
+
+# trace_pipe 行中的时间戳（秒.微秒），实例使用 mono 时钟，与 time.monotonic_ns() 一致
+_TRACE_PIPE_TS_RE = re.compile(rb" (\d+)\.(\d{6}): ")
+
+# 启动延迟日志（每次启动一行JSON），--latency-summary 汇总
+LATENCY_LOG = "launch_latency.jsonl"
+
+# 从启动事件到第一次频率写入完成的各阶段：(名称, 说明, 开始字段, 结束字段)
+# 所有时间都是 CLOCK_MONOTONIC 纳秒（bpftrace的nsecs、trace_pipe的mono时钟与time.monotonic_ns()相同）
+LATENCY_STAGES = (
+    ("capture", "内核记录 -> 分析器读到（bpftrace缓冲、管道）", "kernel_ns", "read_ns"),
+    ("dispatch", "读到事件 -> 启动频率控制（异步等待、线程创建）", "read_ns", "dispatch_ns"),
+    ("setup", "启动频率控制 -> 开始写频率（查找配置）", "dispatch_ns", "apply_start_ns"),
+    ("write", "写入sysfs", "apply_start_ns", "apply_done_ns"),
+    ("total", "内核记录 -> 频率写入完成", "kernel_ns", "apply_done_ns"),
+)
+
+# 直方图分桶上限（毫秒）
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# tracefs模式中用于维护pid缓存的进程生命周期事件
+TRACEFS_LIFECYCLE_EVENTS = ("sched/sched_process_exit", "sched/sched_process_exec", "task/task_rename")
+
+# tracefs模式中的zygote fork事件：父进程是zygote的主线程（common_pid），并且不是创建线程（CLONE_THREAD）
+TRACEFS_FORK_EVENT = "task/task_newtask"
+TRACEFS_FORK_FILTER = "({parents}) && !(clone_flags & 0x10000)"
+# zygote进程的cmdline
+ZYGOTE_PROCESS_NAMES = ("zygote64", "zygote")
+
+# 推测提升（确认启动哪个App之前先提升频率）的触发来源
+#   startActivity - system_server 的 startActivity* marker（点击之后、创建进程之前）
+#   launcherInput - Launcher 进程中的输入事件
+#   zygoteFork    - zygote fork 子进程
+EARLY_TRIGGERS = ("startActivity", "launcherInput", "zygoteFork")
+
+# 推测提升的截止时间（秒），期间没有已配置的App启动则恢复提升前的频率
+SPECULATIVE_DEADLINE_S = 0.5
+
+# 保留的推测提升记录数
+SPECULATION_HISTORY = 1000
+
+# Launcher 包名（launcherInput 触发）
+LAUNCHER_PACKAGES = (
+    "com.google.android.apps.nexuslauncher",
+    "com.android.launcher3",
+    "com.miui.home",
+    "com.huawei.android.launcher",
+    "com.sec.android.app.launcher",
+)
+
+# 冷启动时 cmdline 还是临时名称，每隔多久重新读取、最多读取几次（总共约0.2秒）
+CMDLINE_RETRY_S = 0.02
+CMDLINE_RETRY_LIMIT = 10
+
+# 没有实测切换耗时时，"auto" 模式使用的提前量（毫秒）
+DEFAULT_SWITCH_LEAD_MS = 0.0
+
+# GPU路径
+GPU_PATH = "/sys/devices/genpd:0:1f000000.mali/consumer:platform:1f000000.mali/consumer"
+
+# CPU频率策略目录
+CPUFREQ_PATH = "/sys/devices/system/cpu/cpufreq"
+
+# devfreq域目录（DDR、总线、缓存等），时间段中的 "devfreq" 写入 <域>/min_freq、max_freq
+DEVFREQ_CLASS_PATH = "/sys/class/devfreq"
+
+# 时间段频率配置的控制后端（cpu_freq_settings 中的 "backend"，与 experiments/cold_start/control_backends.py 相同）：
+#   freq_pin - 写 min/max 固定频率（cpu_freq / gpu_freq / devfreq）
+#   uclamp   - 设置cgroup的 cpu.uclamp.min/max 和cpuset（uclamp_min / uclamp_max / cpuset）
+#   governor - 修改调度器参数（tunables / policy_tunables）
+DEFAULT_BACKEND = "freq_pin"
+BACKEND_PERIOD_KEYS = {
+    "freq_pin": {"start", "end", "cpu_freq", "gpu_freq", "devfreq"},
+    "uclamp": {"start", "end", "uclamp_min", "uclamp_max", "cpuset"},
+    "governor": {"start", "end", "tunables", "policy_tunables"},
+}
+
+# uclamp后端默认调整的cgroup（前台App启动时所在的组）
+CPUCTL_ROOT = "/dev/cpuctl"
+CPUSET_ROOT = "/dev/cpuset"
+DEFAULT_BOOST_CGROUP = "top-app"
+
+# devfreq域分类：按域名中的单词匹配（与 experiments/device/topology.py 的 DEVFREQ_KINDS 相同）
+DEVFREQ_KINDS = (
+    ("gpu", ("gpu", "mali", "kgsl", "gpubw")),
+    ("ddr", ("mif", "ddr", "dmc", "memlat", "mem")),
+    ("cache", ("dsu", "llcc", "l3", "cache", "bci")),
+    ("bus", ("int", "bus", "noc", "cci", "cpubw", "bw")),
+)
+
+# 频率配置文件（与分析器放在同一目录，修改后自动重新加载）
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "freq_config.py")
+
+# 检查配置文件是否修改的间隔（秒）
+CONFIG_POLL_S = 1.0
+
+
+def parse_event_line(line):
+    """
+    解析一行bpftrace UI日志（不经过json），不含关心的关键字时尽早返回
+
+    Args:
+        line: bytes，capture.bt / capture_marker.bt 输出或 trace_pipe 的一行
+
+    Returns:
+        tuple: (pid, content, keywords, ts_ns)，content为 "B|<pid>|" 之后的内容，keywords为命中的关键字集合，
+               ts_ns为内核记录时间（CLOCK_MONOTONIC纳秒，未知时为None）；不是UI日志或不含关键字时返回None
+    """
+    if line.startswith(b"E "):
+        return _parse_marker_record(line)
+    # 在原始字节上预过滤，绝大多数行在这里被丢弃
+    if _KEYWORD_RE.search(line) is None:
+        return None
+    if not line.startswith(b"{"):
+        return _parse_trace_pipe_line(line)
+    pid_start = line.find(_PID_FIELD)
+    log_start = line.find(_LOG_FIELD)
+    if pid_start < 0 or log_start < 0:
+        return None
+    pid_start += len(_PID_FIELD)
+    pid_end = line.find(b",", pid_start)
+    # 跳过 "B|<pid>|"
+    content_start = line.find(b"|", log_start + len(_LOG_FIELD))
+    content_end = line.rfind(b'"}')
+    if pid_end < 0 or content_start < 0 or content_end < content_start:
+        return None
+    content = line[content_start + 1:content_end]
+    keywords = {k.decode() for k in _KEYWORD_RE.findall(content)}
+    if not keywords:
+        return None
+    try:
+        pid = int(line[pid_start:pid_end])
+    except ValueError:
+        return None
+    ts_ns = None
+    ts_start = line.find(_TS_FIELD)
+    if ts_start >= 0:
+        ts_start += len(_TS_FIELD)
+        try:
+            ts_ns = int(line[ts_start:line.find(b",", ts_start)])
+        except ValueError:
+            pass
+    return pid, content.decode("utf-8", errors="replace"), keywords, ts_ns
+
+
+def _parse_marker_record(line):
+    """解析 capture_marker.bt 的定长记录（关键字已在内核中匹配）"""
+    parts = line.split(b" ", 4)
+    keyword = MARKER_KINDS.get(parts[1]) if len(parts) >= 4 else None
+    if keyword is None:
+        return None
+    try:
+        pid = int(parts[2])
+        ts_ns = int(parts[3])
+    except ValueError:
+        return None
+    # 只有activityStart附带日志内容 "B|<pid>|<内容>"
+    content = parts[4].split(b"|", 2)[-1].decode("utf-8", errors="replace") if len(parts) == 5 else keyword
+    return pid, content, {keyword}, ts_ns
+
+
+def parse_lifecycle_line(line):
+    """
+    解析进程生命周期事件
+
+    Args:
+        line: bytes，capture*.bt 的 X/N 记录或 trace_pipe 的一行
+
+    Returns:
+        tuple: ("exit" / "rename" / "fork", pid, 内核时间戳ns或None)，不是生命周期事件时返回None；
+               fork 的pid是zygote的子进程
+    """
+    head = line[:2]
+    if head == _LIFECYCLE_EXIT or head == _LIFECYCLE_RENAME:
+        try:
+            pid = int(line[2:])
+        except ValueError:
+            return None
+        return ("exit" if head == _LIFECYCLE_EXIT else "rename"), pid, None
+    if head == _LIFECYCLE_FORK:
+        parts = line.split(b" ")
+        try:
+            return "fork", int(parts[1]), int(parts[2]) if len(parts) > 2 else None
+        except ValueError:
+            return None
+    if line.startswith(b"{") or line.startswith(b"E "):
+        return None
+    match = _TRACEFS_FORK_RE.search(line)
+    if match is not None:
+        ts = _TRACE_PIPE_TS_RE.search(line, 0, match.start())
+        ts_ns = int(ts.group(1)) * 1000000000 + int(ts.group(2)) * 1000 if ts else None
+        return "fork", int(match.group(1)), ts_ns
+    match = _TRACEFS_LIFECYCLE_RE.search(line)
+    if match is None:
+        return None
+    # trace_pipe 中的pid是线程id，非主线程不会在缓存中，失效操作没有影响
+    return ("exit" if match.group(1) == b"sched_process_exit" else "rename"), int(match.group(2)), None
+
+
+class PidCache:
+    """
+    pid -> (进程短名, 完整包名) 的LRU缓存
+
+    一次读取 /proc/<pid>/cmdline 同时得到短名和包名；条目数有上限，
+    进程退出时失效（避免pid复用后得到旧名称），exec或主线程改名时刷新
+    """
+
+    def __init__(self, max_size=PID_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def entry_from_cmdline(content):
+        """cmdline -> (短名, 包名)，cmdline为空时返回None"""
+        if not content:
+            return None
+        name = content.split('.')[-1] if '.' in content else content
+        return name, content
+
+    @staticmethod
+    def find_pids(names):
+        """
+        Returns:
+            list: cmdline为names之一的进程pid
+        """
+        pids = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            cached = PidCache._read(int(entry))
+            if cached is not None and cached[1] in names:
+                pids.append(int(entry))
+        return pids
+
+    @staticmethod
+    def _read(pid):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                content = f.read().replace(b'\x00', b'').decode('utf-8').strip()
+        except (OSError, UnicodeDecodeError):
+            return None
+        return PidCache.entry_from_cmdline(content)
+
+    def get(self, pid):
+        """
+        Returns:
+            tuple: (短名, 包名)，进程不存在时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is not None:
+                self._entries.move_to_end(pid)
+                return entry
+        return self.refresh(pid)
+
+    def refresh(self, pid):
+        """重新读取 cmdline；临时名称（进程还没完成初始化）不缓存"""
+        entry = self._read(pid)
+        if STREAM_RECORDER is not None:
+            STREAM_RECORDER.pid(pid, entry)
+        with self._lock:
+            if entry is None or entry[0] in TRANSIENT_PROCESS_NAMES:
+                self._entries.pop(pid, None)
+            else:
+                self._entries[pid] = entry
+                self._entries.move_to_end(pid)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, pid):
+        with self._lock:
+            self._entries.pop(pid, None)
+
+
+def _parse_trace_pipe_line(line):
+    """
+    解析 trace_pipe 的一行，例如
+        <...>-1234 [003] ..... 123.456: tracing_mark_write: B|1234|bindApplication
+        <...>-1234 [003] ..... 123.456: marker: (tracing_mark_write+0x0/0x1c0) buf="B|1234|bindApplication"
+    """
+    start = line.find(b"B|")
+    if start < 0:
+        return None
+    pid, _, content = line[start + 2:].partition(b"|")
+    content = content.rstrip(b'"')
+    keywords = {k.decode() for k in _KEYWORD_RE.findall(content)}
+    if not keywords:
+        return None
+    try:
+        pid = int(pid)
+    except ValueError:
+        return None
+    match = _TRACE_PIPE_TS_RE.search(line, 0, start)
+    ts_ns = int(match.group(1)) * 1000000000 + int(match.group(2)) * 1000 if match else None
+    return pid, content.decode("utf-8", errors="replace"), keywords, ts_ns
+
+
+class TracefsMarkerSource:
+    """
+    从独立tracing实例的 trace_pipe 读取atrace marker
+
+    内核支持 copy_trace_marker 选项（6.17+）时，顶层 trace_marker 的写入会复制到实例中，直接使用 ftrace/print 事件；
+    否则在实例中启用一个挂在 tracing_mark_write 上的kprobe事件。两种方式都通过事件过滤器在内核中只保留含关键字的日志。
+    """
+
+    def __init__(self, instance=TRACE_INSTANCE):
+        self.instance = instance
+        self.root = None
+        self.path = None
+        self.event = None
+
+    def _write(self, path, value, append=False):
+        with open(path, "a" if append else "w") as f:
+            f.write(value)
+
+    def setup(self):
+        """创建实例、配置事件和过滤器"""
+        self.root = next((r for r in TRACEFS_ROOTS if os.path.isdir(f"{r}/instances")), None)
+        if self.root is None:
+            raise RuntimeError("找不到tracefs（/sys/kernel/tracing）")
+        self.path = f"{self.root}/instances/{self.instance}"
+        if not os.path.isdir(self.path):
+            os.mkdir(self.path)
+
+        if os.path.exists(f"{self.path}/options/copy_trace_marker"):
+            self._write(f"{self.path}/options/copy_trace_marker", "1")
+            self.event = "ftrace/print"
+        else:
+            if not os.path.isdir(f"{self.root}/events/{KPROBE_EVENT}"):
+                self._write(f"{self.root}/kprobe_events", KPROBE_DEFINITION + "\n", append=True)
+            self.event = KPROBE_EVENT
+
+        # 与bpftrace的nsecs和time.monotonic_ns()使用同一个时钟
+        self._write(f"{self.path}/trace_clock", "mono")
+        event_dir = f"{self.path}/events/{self.event}"
+        self._write(f"{event_dir}/filter", TRACEFS_FILTER)
+        self._write(f"{event_dir}/enable", "1")
+        for event in TRACEFS_LIFECYCLE_EVENTS:
+            if os.path.isdir(f"{self.path}/events/{event}"):
+                self._write(f"{self.path}/events/{event}/enable", "1")
+        fork_dir = f"{self.path}/events/{TRACEFS_FORK_EVENT}"
+        zygote_pids = PidCache.find_pids(ZYGOTE_PROCESS_NAMES)
+        if os.path.isdir(fork_dir) and zygote_pids:
+            parents = " || ".join(f"common_pid == {pid}" for pid in zygote_pids)
+            self._write(f"{fork_dir}/filter", TRACEFS_FORK_FILTER.format(parents=parents))
+            self._write(f"{fork_dir}/enable", "1")
+        elif os.path.isdir(fork_dir):
+            print("⚠️ [tracefs] 找不到zygote进程，不启用zygote fork事件", flush=True)
+        self._write(f"{self.path}/tracing_on", "1")
+        print(f"[tracefs] 实例 {self.path}，事件 {self.event}", flush=True)
+
+    def open_pipe(self):
+        """
+        Returns:
+            int: trace_pipe 的文件描述符（非阻塞）
+        """
+        return os.open(f"{self.path}/trace_pipe", os.O_RDONLY | os.O_NONBLOCK)
+
+    def teardown(self):
+        """关闭事件，删除kprobe事件和实例（setup中途失败时只清理已经创建的部分）"""
+        if not self.path:
+            return
+        try:
+            if self.event:
+                self._write(f"{self.path}/events/{self.event}/enable", "0")
+            for event in TRACEFS_LIFECYCLE_EVENTS:
+                if os.path.isdir(f"{self.path}/events/{event}"):
+                    self._write(f"{self.path}/events/{event}/enable", "0")
+            fork_dir = f"{self.path}/events/{TRACEFS_FORK_EVENT}"
+            if os.path.isdir(fork_dir):
+                self._write(f"{fork_dir}/enable", "0")
+                self._write(f"{fork_dir}/filter", "0")
+            if self.event:
+                self._write(f"{self.path}/events/{self.event}/filter", "0")
+            if self.event == KPROBE_EVENT:
+                self._write(f"{self.root}/kprobe_events", f"-:{KPROBE_EVENT}\n", append=True)
+            os.rmdir(self.path)
+        except OSError as e:
+            print(f"[WARN] 清理tracing实例失败: {e}", flush=True)
+
+
+def execute_shell(cmd, need_root=False):
+    """
+    在设备本地执行shell命令（不使用adb，直接执行）
+    
+    Args:
+        cmd: shell命令
+        need_root: 是否需要root权限
+    
+    Returns:
+        命令输出（字符串）
+    """
+    try:
+        if need_root:
+            full_cmd = f"su -c \"{cmd}\""
+        else:
+            full_cmd = cmd
+        
+        result = subprocess.run(
+            full_cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=2.0
+        )
+        out = result.stdout.decode("utf-8", "ignore").strip()
+        if result.returncode != 0:
+            err = result.stderr.decode("utf-8", "ignore").strip()
+            print(f"[WARN] 命令执行失败: {full_cmd}\n错误: {err}", flush=True)
+        return out
+    except subprocess.TimeoutExpired:
+        print(f"[WARN] 命令执行超时: {cmd}", flush=True)
+        return ""
+    except Exception as e:
+        print(f"[WARN] 命令执行异常: {cmd}, 错误: {e}", flush=True)
+        return ""
+
+
+class SysfsWriter:
+    """
+    sysfs节点写入器
+    分析器在设备上以root运行，节点第一次写入时打开并保持文件描述符，之后用 os.pwrite 直接写入，
+    不再为每次写入启动 su/sh 进程。没有root权限时回退到 execute_shell。
+    """
+
+    def __init__(self):
+        self._fds = {}
+        self._lock = threading.Lock()
+        self.direct = hasattr(os, "geteuid") and os.geteuid() == 0
+
+    def _fd(self, path):
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_RDWR)
+            self._fds[path] = fd
+        return fd
+
+    def read(self, path):
+        """读取节点当前值，失败返回None"""
+        try:
+            if self.direct:
+                return os.pread(self._fd(path), 64, 0).decode("utf-8", "ignore").strip()
+            return execute_shell(f"cat {path}", need_root=True) or None
+        except OSError:
+            return None
+
+    def write(self, path, value):
+        """
+        写入单个节点
+
+        Returns:
+            bool: 是否写入成功（内核拒绝写入时为False）
+        """
+        if not self.direct:
+            execute_shell(f"sh -c 'echo {value} > {path}'", need_root=True)
+            return True
+        try:
+            os.pwrite(self._fd(path), f"{value}\n".encode(), 0)
+            return True
+        except OSError as e:
+            print(f"[WARN] 写入失败: {path} = {value}，错误: {e.strerror}", flush=True)
+            return False
+
+    def write_range(self, min_path, max_path, min_freq, max_freq):
+        """
+        写入一组min/max节点，按当前值决定顺序，避免中间状态 min > max 被内核拒绝
+
+        Returns:
+            bool: 两个节点是否都写入成功
+        """
+        cur_max = self.read(max_path)
+        if cur_max and cur_max.isdigit() and min_freq > int(cur_max):
+            order = ((max_path, max_freq), (min_path, min_freq))
+        else:
+            order = ((min_path, min_freq), (max_path, max_freq))
+        ok = True
+        for path, value in order:
+            ok = self.write(path, value) and ok
+        return ok
+
+    def snapshot(self, ranges):
+        """
+        读取一组min/max节点的当前值
+
+        Returns:
+            list: [(min_path, max_path, 当前min, 当前max)]，读取失败的组不包含在内
+        """
+        current = []
+        for min_path, max_path, _, _ in ranges:
+            cur_min, cur_max = self.read(min_path), self.read(max_path)
+            if cur_min and cur_max and cur_min.isdigit() and cur_max.isdigit():
+                current.append((min_path, max_path, int(cur_min), int(cur_max)))
+        return current
+
+    def apply(self, ranges):
+        """
+        批量写入一个频率计划
+
+        Args:
+            ranges: [(min_path, max_path, min_freq, max_freq), ...]
+
+        Returns:
+            tuple: (失败的组数, 耗时毫秒)
+        """
+        with self._lock:
+            start = time.perf_counter()
+            failed = sum(0 if self.write_range(*r) else 1 for r in ranges)
+            return failed, (time.perf_counter() - start) * 1000.0
+
+    def open_nodes(self, paths):
+        """
+        预先打开节点（加载频率计划时调用），第一次启动不再有打开文件的开销
+
+        Returns:
+            int: 无法打开的节点数
+        """
+        if not self.direct:
+            return 0
+        failed = 0
+        with self._lock:
+            for path in paths:
+                try:
+                    self._fd(path)
+                except OSError as e:
+                    print(f"[WARN] 无法打开节点: {path}，错误: {e.strerror}", flush=True)
+                    failed += 1
+        return failed
+
+    def close(self):
+        """关闭所有已打开的节点"""
+        with self._lock:
+            for fd in self._fds.values():
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            self._fds.clear()
+
+
+SYSFS_WRITER = SysfsWriter()
+
+
+def _parse_freq_range(freq_setting):
+    """
+    解析频率设置
+
+    Args:
+        freq_setting: 单个频率，或 {'min': ..., 'max': ...}（也接受 min_freq/max_freq）
+
+    Returns:
+        tuple: (min_freq, max_freq)，无法解析时返回None
+    """
+    if isinstance(freq_setting, dict):
+        min_freq = freq_setting.get('min', freq_setting.get('min_freq'))
+        max_freq = freq_setting.get('max', freq_setting.get('max_freq'))
+        if min_freq is None or max_freq is None:
+            return None
+        return int(min_freq), int(max_freq)
+    if isinstance(freq_setting, (int, float)):
+        return int(freq_setting), int(freq_setting)
+    return None
+
+
+def list_devfreq_domains():
+    """
+    Returns:
+        list: /sys/class/devfreq 下的域名，不在设备上时为空
+    """
+    try:
+        return sorted(os.listdir(DEVFREQ_CLASS_PATH))
+    except OSError:
+        return []
+
+
+def resolve_devfreq_domain(key, domains):
+    """
+    把时间段配置中的devfreq键解析为域名（与 DeviceTopology.resolve_devfreq 相同的规则）
+
+    Args:
+        key: 完整域名（如 17000010.devfreq_mif）、类型（ddr / bus / cache / gpu，需唯一）或域名的一部分（如 mif）
+        domains: 设备上的域名列表
+
+    Returns:
+        str: 域名，找不到或匹配到多个域时返回None
+    """
+    if key in domains:
+        return key
+    by_kind = []
+    for name in domains:
+        words = set(re.split(r"[^a-z0-9]+", name.lower()))
+        kind = next((kind for kind, keywords in DEVFREQ_KINDS if words & set(keywords)), "other")
+        if kind == key:
+            by_kind.append(name)
+    matches = by_kind or [name for name in domains if key in name]
+    return matches[0] if len(matches) == 1 else None
+
+
+def compile_period(cpu_freq_settings=None, gpu_freq_setting=None, devfreq_settings=None, devfreq_domains=None):
+    """
+    把一个时间段的频率设置编译为sysfs写入列表
+
+    Args:
+        cpu_freq_settings: dict，格式为 {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
+        gpu_freq_setting: int/float (Hz) 或 dict {'min': min_hz, 'max': max_hz}
+        devfreq_settings: dict，{域名/类型/域名片段: freq 或 {'min', 'max'}}
+        devfreq_domains: 设备上的devfreq域名列表，None时读取 /sys/class/devfreq；无法解析的键被跳过
+
+    Returns:
+        dict: {'cpu_freq', 'gpu_freq', 'devfreq', 'ranges': [(min_path, max_path, min_freq, max_freq), ...], 'labels'}
+    """
+    ranges = []
+    labels = []
+    for policy_id, freq_setting in (cpu_freq_settings or {}).items():
+        freq_range = _parse_freq_range(freq_setting)
+        if freq_range is None:
+            continue
+        policy_path = f"{CPUFREQ_PATH}/policy{policy_id}"
+        ranges.append((f"{policy_path}/scaling_min_freq", f"{policy_path}/scaling_max_freq") + freq_range)
+        labels.append(f"policy{policy_id}: {freq_range[0]} KHz ({freq_range[0]/1000:.0f} MHz)")
+
+    gpu_range = _parse_freq_range(gpu_freq_setting) if gpu_freq_setting else None
+    if gpu_range is not None:
+        ranges.append((f"{GPU_PATH}/scaling_min_freq", f"{GPU_PATH}/scaling_max_freq") + gpu_range)
+        labels.append(f"GPU: {gpu_range[0]} Hz ({gpu_range[0]/1e6:.0f} MHz)")
+
+    if devfreq_settings and devfreq_domains is None:
+        devfreq_domains = list_devfreq_domains()
+    for key, freq_setting in (devfreq_settings or {}).items():
+        name = resolve_devfreq_domain(key, devfreq_domains)
+        freq_range = _parse_freq_range(freq_setting)
+        if name is None or freq_range is None:
+            continue
+        domain_path = f"{DEVFREQ_CLASS_PATH}/{name}"
+        ranges.append((f"{domain_path}/min_freq", f"{domain_path}/max_freq") + freq_range)
+        labels.append(f"devfreq {name}: {freq_range[0]} ({freq_range[0]/1000:.0f} MHz)")
+
+    return {
+        'cpu_freq': cpu_freq_settings or None,
+        'gpu_freq': gpu_freq_setting or None,
+        'devfreq': devfreq_settings or None,
+        'ranges': ranges,
+        'labels': labels
+    }
+
+
+def apply_plan_period(period):
+    """
+    写入一个已编译的时间段（见 compile_period / compile_uclamp_period / compile_governor_period），所有节点一次写完
+
+    period 中有 'restore' 列表时，写入前先把这些节点的当前值保存到列表中（推测提升用于恢复）
+
+    Returns:
+        float: 应用耗时（毫秒），没有需要写入的节点时返回None
+    """
+    ranges = period.get("ranges") or []
+    writes = period.get("writes") or []
+    if not ranges and not writes:
+        return None
+    try:
+        if period.get("restore") is not None:
+            period["restore"][:] = SYSFS_WRITER.snapshot(ranges)
+        start = time.perf_counter()
+        failed, _ = SYSFS_WRITER.apply(ranges)
+        failed += sum(0 if SYSFS_WRITER.write(path, value) else 1 for path, value in writes)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        for label in period.get("labels", ()):
+            print(f"[频率] {label}", flush=True)
+        status = f"，{failed} 组失败" if failed else ""
+        print(f"[频率] 已写入 {len(ranges) * 2 + len(writes)} 个节点，耗时 {elapsed_ms:.2f} ms{status}", flush=True)
+        return elapsed_ms
+    except Exception as e:
+        print(f"[WARN] 设置频率失败: {e}", flush=True)
+        return None
+
+
+def apply_frequency_period(cpu_freq_settings=None, gpu_freq_setting=None):
+    """
+    在设备本地批量设置CPU和GPU频率（一个时间段的所有节点一次写完）
+
+    Args:
+        cpu_freq_settings: dict，格式为 {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
+        gpu_freq_setting: int/float (Hz) 或 dict {'min': min_hz, 'max': max_hz}
+
+    Returns:
+        float: 应用耗时（毫秒），没有需要写入的节点时返回None
+    """
+    try:
+        period = compile_period(cpu_freq_settings, gpu_freq_setting)
+    except Exception as e:
+        print(f"[WARN] 设置频率失败: {e}", flush=True)
+        return None
+    return apply_plan_period(period)
+
+
+def set_cpu_frequencies_local(cpu_freq_settings):
+    """
+    在设备本地设置CPU频率（不使用adb）
+    
+    Args:
+        cpu_freq_settings: dict，格式为 {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
+    """
+    if not cpu_freq_settings:
+        return
+    apply_frequency_period(cpu_freq_settings=cpu_freq_settings)
+
+
+def set_gpu_frequency_local(gpu_freq_setting):
+    """
+    在设备本地设置GPU频率（不使用adb）
+    
+    Args:
+        gpu_freq_setting: int/float (Hz) 或 dict {'min': min_hz, 'max': max_hz}
+    """
+    if not gpu_freq_setting:
+        return
+    apply_frequency_period(gpu_freq_setting=gpu_freq_setting)
+
+
+def set_cpu_mode(mode):
+    """
+    设置CPU模式（兼容旧接口）
+    
+    Args:
+        mode: "boost" 或 "normal"
+    """
+    if mode == "boost":
+        # 设置为最大频率
+        set_cpu_frequencies_local({
+            "0": 1950000,
+            "4": 2450000,
+            "7": 3015000
+        })
+    elif mode == "normal":
+        # 恢复默认（这里可以设置为中等频率）
+        set_cpu_frequencies_local({
+            "0": 1328000,
+            "4": 1549000,
+            "7": 2147000
+        })
+
+
+class StreamRecorder:
+    """
+    把事件流录制到文件，供 replay_stream.py 离线回放
+
+    每行一条记录，时间戳为分析器读到的 time.monotonic_ns()：
+        <ns> L <原始行>              事件行
+        <ns> P <pid> <cmdline>       pid解析结果（回放时没有对应的 /proc，进程不存在时cmdline为 -）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._lock = threading.Lock()
+
+    def line(self, ns, line):
+        with self._lock:
+            self._file.write(b"%d L " % ns + line.rstrip(b"\n") + b"\n")
+
+    def pid(self, pid, entry):
+        cmdline = entry[1] if entry else "-"
+        with self._lock:
+            self._file.write(f"{time.monotonic_ns()} P {pid} {cmdline}\n".encode("utf-8"))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# 当前的事件流录制器，main() 中按 --record 创建
+STREAM_RECORDER = None
+
+
+class LatencyRecorder:
+    """把每次启动的各阶段延迟写入日志文件（每次启动一行JSON）"""
+
+    def __init__(self, path=LATENCY_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, launch):
+        """
+        Args:
+            launch: 启动记录，包含 package、trigger 和 LATENCY_STAGES 中用到的时间戳字段
+        """
+        stages = {}
+        for name, _, start_key, end_key in LATENCY_STAGES:
+            start, end = launch.get(start_key), launch.get(end_key)
+            if start is not None and end is not None:
+                stages[name] = (end - start) / 1e6
+        launch = dict(launch, stages_ms=stages)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(launch, ensure_ascii=False) + "\n")
+        breakdown = "，".join(f"{name} {ms:.1f}" for name, ms in stages.items())
+        print(f"[延迟] {launch.get('package')}（{launch.get('trigger')}）: {breakdown} ms", flush=True)
+
+
+# 当前的延迟记录器，main() 中创建
+LATENCY_RECORDER = None
+
+
+def summarize_latency_log(path=LATENCY_LOG):
+    """
+    汇总启动延迟日志：每个阶段的分位数和直方图
+
+    Returns:
+        dict: {阶段名: 毫秒列表}
+    """
+    samples = {name: [] for name, _, _, _ in LATENCY_STAGES}
+    launches = 0
+    with open(path) as f:
+        for line in f:
+            try:
+                stages = json.loads(line).get("stages_ms", {})
+            except ValueError:
+                continue
+            launches += 1
+            for name, ms in stages.items():
+                samples.setdefault(name, []).append(ms)
+
+    print(f"启动延迟日志: {path}（{launches} 次启动）\n")
+    print(f"{'阶段':<10} {'次数':>5} {'P50':>9} {'P90':>9} {'最大':>9}  说明")
+    for name, desc, _, _ in LATENCY_STAGES:
+        values = sorted(samples[name])
+        if not values:
+            continue
+        p50 = values[len(values) // 2]
+        p90 = values[min(len(values) - 1, int(len(values) * 0.9))]
+        print(f"{name:<10} {len(values):>5} {p50:>7.1f}ms {p90:>7.1f}ms {values[-1]:>7.1f}ms  {desc}")
+
+    for name, _, _, _ in LATENCY_STAGES:
+        values = samples[name]
+        if not values:
+            continue
+        print(f"\n{name}:")
+        bounds = (0,) + LATENCY_BUCKETS_MS + (float("inf"),)
+        counts = [sum(1 for v in values if lower <= v < upper) for lower, upper in zip(bounds, bounds[1:])]
+        # 只打印第一个到最后一个非空的桶
+        used = [i for i, count in enumerate(counts) if count]
+        for i in range(used[0], used[-1] + 1):
+            lower, upper = bounds[i], bounds[i + 1]
+            label = f"{lower}-{upper}ms" if upper != float("inf") else f">={lower}ms"
+            print(f"  {label:>12} {counts[i]:>5} {'#' * min(counts[i], 60)}")
+    return samples
+
+
+def _read_freq_list(path):
+    """读取可用频率列表节点，不存在或无法读取时返回None"""
+    try:
+        with open(path) as f:
+            values = f.read().split()
+    except OSError:
+        return None
+    freqs = {int(v) for v in values if v.isdigit()}
+    return freqs or None
+
+
+def read_opp_table():
+    """
+    读取设备的可用频率（OPP）
+
+    Returns:
+        dict: {'policies': {policy_id: 可用频率集合或None}, 'gpu': 可用频率集合或None,
+               'devfreq': {域名: 可用频率集合或None}}；没有cpufreq目录时（不在设备上）返回None，不做校验
+    """
+    if not os.path.isdir(CPUFREQ_PATH):
+        return None
+    policies = {}
+    for entry in sorted(os.listdir(CPUFREQ_PATH)):
+        if entry.startswith("policy") and entry[6:].isdigit():
+            policies[entry[6:]] = _read_freq_list(f"{CPUFREQ_PATH}/{entry}/scaling_available_frequencies")
+    devfreq = {name: _read_freq_list(f"{DEVFREQ_CLASS_PATH}/{name}/available_frequencies")
+               for name in list_devfreq_domains()}
+    return {'policies': policies, 'gpu': _read_freq_list(f"{GPU_PATH}/available_frequencies"), 'devfreq': devfreq}
+
+
+def _check_freq(label, setting, available, errors):
+    freq_range = _parse_freq_range(setting)
+    if freq_range is None:
+        errors.append(f"{label}: 无法解析频率 {setting!r}")
+        return
+    if freq_range[0] > freq_range[1]:
+        errors.append(f"{label}: min {freq_range[0]} > max {freq_range[1]}")
+    if available:
+        for freq in sorted(set(freq_range)):
+            if freq not in available:
+                errors.append(f"{label}: {freq} 不在可用频率中（{min(available)}-{max(available)}）")
+
+
+# uclamp / governor 后端写入的节点在第一次编译时读取的原值 {节点路径: 值}，
+# 重新加载配置时不再读取，避免把加速时段写入的值当作原值
+_ORIGINAL_VALUES = {}
+
+
+def _original_value(path):
+    if path not in _ORIGINAL_VALUES:
+        value = SYSFS_WRITER.read(path) if os.path.exists(path) else None
+        if value is None:
+            return None
+        _ORIGINAL_VALUES[path] = value
+    return _ORIGINAL_VALUES[path]
+
+
+def _format_uclamp(percent):
+    """把百分比转换为cgroup接受的格式（100为 "max"）"""
+    percent = float(percent)
+    if not 0 <= percent <= 100:
+        raise ValueError(f"uclamp值必须在0~100之间: {percent}")
+    return "max" if percent >= 100 else f"{percent:.2f}"
+
+
+def _writes_period(writes, labels):
+    """单节点写入的时间段（uclamp / governor 后端），格式与 compile_period 的结果兼容"""
+    return {'cpu_freq': None, 'gpu_freq': None, 'devfreq': None, 'ranges': [], 'writes': writes, 'labels': labels}
+
+
+def compile_uclamp_period(period, cgroup=DEFAULT_BOOST_CGROUP):
+    """
+    把uclamp后端的一个时间段编译为写入列表（先写max再写min，最后写cpuset）
+
+    没有 cpuset 字段的时间段写回cpuset的原值；节点不存在时（不在设备上）跳过
+
+    Raises:
+        ValueError: uclamp值不在0~100之间
+    """
+    cpuset_path = f"{CPUSET_ROOT}/{cgroup}/cpus"
+    # 无论本时间段是否设置cpuset都先读取原值
+    cpuset = period.get("cpuset") or _original_value(cpuset_path)
+    writes = [
+        (f"{CPUCTL_ROOT}/{cgroup}/cpu.uclamp.max", _format_uclamp(period.get("uclamp_max", 100))),
+        (f"{CPUCTL_ROOT}/{cgroup}/cpu.uclamp.min", _format_uclamp(period.get("uclamp_min", 0))),
+    ]
+    if cpuset:
+        writes.append((cpuset_path, cpuset))
+    writes = [(path, value) for path, value in writes if os.path.exists(path)]
+    labels = [f"{cgroup}: uclamp {writes[1][1] if len(writes) > 1 else '-'}~{writes[0][1] if writes else '-'}"
+              f"，cpuset {cpuset or '-'}"]
+    return _writes_period(writes, labels)
+
+
+def read_governor_tunables(names):
+    """
+    找到每个policy当前调度器的参数节点（优先 policyN/<governor>/，没有时为全局 cpufreq/<governor>/）
+
+    Args:
+        names: 需要的参数名
+
+    Returns:
+        dict: {policy_id: {参数名: 节点路径}}，不在设备上时为空
+    """
+    tunables = {}
+    if not os.path.isdir(CPUFREQ_PATH):
+        return tunables
+    for entry in sorted(os.listdir(CPUFREQ_PATH)):
+        if not (entry.startswith("policy") and entry[6:].isdigit()):
+            continue
+        governor = SYSFS_WRITER.read(f"{CPUFREQ_PATH}/{entry}/scaling_governor")
+        if not governor:
+            continue
+        tdir = f"{CPUFREQ_PATH}/{entry}/{governor}"
+        if not os.path.isdir(tdir):
+            tdir = f"{CPUFREQ_PATH}/{governor}"
+        tunables[entry[6:]] = {name: f"{tdir}/{name}" for name in names if os.path.isfile(f"{tdir}/{name}")}
+    return tunables
+
+
+def compile_governor_period(period, tunables, names):
+    """
+    把governor后端的一个时间段编译为写入列表
+
+    Args:
+        period: 时间段（tunables 对所有policy生效，policy_tunables 按policy覆盖）
+        tunables: read_governor_tunables() 的结果
+        names: 所有时间段涉及的参数名，本时间段没有设置的写回原值
+    """
+    writes = []
+    for policy_id, nodes in sorted(tunables.items(), key=lambda kv: int(kv[0])):
+        wanted = dict(period.get("tunables") or {})
+        wanted.update((period.get("policy_tunables") or {}).get(policy_id, {}))
+        for name in sorted(names):
+            path = nodes.get(name)
+            value = str(wanted[name]) if name in wanted else (_original_value(path) if path else None)
+            if path and value is not None:
+                writes.append((path, value))
+    labels = [f"调度器参数: {len(writes)} 个节点"]
+    return _writes_period(writes, labels)
+
+
+def _compile_freq_pin_period(label, period, opp, errors):
+    """校验并编译freq_pin后端的一个时间段"""
+    for policy_id, setting in (period.get("cpu_freq") or {}).items():
+        available = None
+        if opp is not None:
+            if str(policy_id) not in opp['policies']:
+                errors.append(f"{label}: 设备上没有 policy{policy_id}")
+                continue
+            available = opp['policies'][str(policy_id)]
+        _check_freq(f"{label} policy{policy_id}", setting, available, errors)
+    if period.get("gpu_freq"):
+        _check_freq(f"{label} GPU", period["gpu_freq"], opp['gpu'] if opp else None, errors)
+    for key, setting in (period.get("devfreq") or {}).items():
+        available = None
+        if opp is not None:
+            name = resolve_devfreq_domain(key, list(opp['devfreq']))
+            if name is None:
+                errors.append(f"{label}: 无法确定devfreq域 '{key}'（设备上的域: {'、'.join(opp['devfreq']) or '无'}）")
+                continue
+            available = opp['devfreq'][name]
+        _check_freq(f"{label} devfreq {key}", setting, available, errors)
+    return compile_period(period.get("cpu_freq"), period.get("gpu_freq"), period.get("devfreq"),
+                          list(opp['devfreq']) if opp is not None else None)
+
+
+def compile_plan(app_name, config, opp=None):
+    """
+    把一个App的时间段频率配置编译为频率计划，并按设备的可用频率校验
+
+    Args:
+        app_name: App名称（用于错误信息）
+        config: APP_FREQ_CONFIGS 中的一项
+        opp: read_opp_table() 的结果，None时不校验频率值
+
+    Returns:
+        tuple: (计划, 错误列表)；计划为 {'app_name', 'backend', 'switch_lead_ms', 'periods': [编译后的时间段]}，
+               没有时间段配置时为None
+    """
+    cpu_cfg = (config or {}).get("cpu_freq_settings")
+    if not cpu_cfg or not cpu_cfg.get("time_based") or not cpu_cfg.get("periods"):
+        return None, []
+
+    backend = cpu_cfg.get("backend", DEFAULT_BACKEND)
+    if backend not in BACKEND_PERIOD_KEYS:
+        return None, [f"{app_name}: 未知的频率控制后端 {backend!r}（可选: {', '.join(BACKEND_PERIOD_KEYS)}）"]
+
+    errors = []
+    periods = []
+    ordered = sorted(cpu_cfg["periods"], key=lambda p: p.get("start", 0))
+    if backend == "governor":
+        names = set()
+        for period in ordered:
+            names.update(period.get("tunables") or {})
+            for overrides in (period.get("policy_tunables") or {}).values():
+                names.update(overrides)
+        tunables = read_governor_tunables(names)
+        if opp is not None:
+            missing = sorted(name for name in names if not any(name in nodes for nodes in tunables.values()))
+            if missing:
+                errors.append(f"{app_name}: 当前调度器没有参数 {', '.join(missing)}")
+    for idx, period in enumerate(ordered):
+        label = f"{app_name} 时间段{idx + 1}"
+        if period.get("start", 0) >= period.get("end", 10.0):
+            errors.append(f"{label}: start {period.get('start', 0)} >= end {period.get('end', 10.0)}")
+        unknown = sorted(set(period) - BACKEND_PERIOD_KEYS[backend])
+        if unknown:
+            errors.append(f"{label}: {backend} 后端不支持的字段 {', '.join(unknown)}")
+        if backend == "uclamp":
+            try:
+                compiled = compile_uclamp_period(period, cpu_cfg.get("cgroup", DEFAULT_BOOST_CGROUP))
+            except (TypeError, ValueError) as e:
+                errors.append(f"{label}: {e}")
+                continue
+        elif backend == "governor":
+            compiled = compile_governor_period(period, tunables, names)
+        else:
+            compiled = _compile_freq_pin_period(label, period, opp, errors)
+        compiled["start"] = period.get("start", 0)
+        compiled["end"] = period.get("end", 10.0)
+        periods.append(compiled)
+
+    lead = cpu_cfg.get("switch_lead_ms", 0)
+    if lead != "auto" and not isinstance(lead, (int, float)):
+        errors.append(f"{app_name}: switch_lead_ms 应为毫秒数或 \"auto\"，实际为 {lead!r}")
+    return {'app_name': app_name, 'backend': backend, 'switch_lead_ms': lead, 'periods': periods}, errors
+
+
+class PlanTable:
+    """
+    包名 -> 预编译频率计划 的表
+
+    启动时只需一次字典查找，时间段已排序、sysfs写入列表已生成；重新加载配置时整体替换，不修改已有的表
+    """
+
+    def __init__(self, names=None, plans=None, source=None):
+        """
+        Args:
+            names: 包名 -> App名称（APPS 中的全部App）
+            plans: 包名 -> compile_plan() 的计划（只包含有时间段配置且校验通过的App）
+            source: 配置来源（文件路径）
+        """
+        self.names = names or {}
+        self.plans = plans or {}
+        self.source = source
+        self.speculative = self._speculative_period()
+
+    def _speculative_period(self):
+        """
+        推测提升使用的时间段：所有计划第一个时间段中每个节点的最高频率
+
+        Returns:
+            dict: compile_period() 的结果，没有计划时返回None
+        """
+        cpu = {}
+        gpu = None
+        for plan in self.plans.values():
+            first = plan['periods'][0]
+            for policy_id, setting in (first['cpu_freq'] or {}).items():
+                freq_range = _parse_freq_range(setting)
+                if freq_range is not None:
+                    cpu[policy_id] = max(cpu.get(policy_id, 0), freq_range[1])
+            gpu_range = _parse_freq_range(first['gpu_freq']) if first['gpu_freq'] else None
+            if gpu_range is not None:
+                gpu = max(gpu or 0, gpu_range[1])
+        if not cpu and not gpu:
+            return None
+        return compile_period(cpu, gpu)
+
+    def __contains__(self, package_name):
+        return package_name in self.names
+
+    def get(self, package_name):
+        return self.plans.get(package_name)
+
+    def paths(self):
+        """所有计划会写入的sysfs节点"""
+        paths = set()
+        for plan in self.plans.values():
+            for period in plan['periods']:
+                for min_path, max_path, _, _ in period['ranges']:
+                    paths.update((min_path, max_path))
+                paths.update(path for path, _ in period.get('writes', ()))
+        return sorted(paths)
+
+    @classmethod
+    def build(cls, apps, configs, opp=None, source=None):
+        """
+        Args:
+            apps: APPS（App名称 -> 包名）
+            configs: APP_FREQ_CONFIGS（App名称 -> 频率配置）
+            opp: read_opp_table() 的结果，None时不校验频率值
+
+        Returns:
+            tuple: (PlanTable, 错误列表)，校验失败的App不进入计划表
+        """
+        names = {package: name for name, package in apps.items()}
+        plans = {}
+        errors = []
+        for name, package in apps.items():
+            plan, plan_errors = compile_plan(name, configs.get(name), opp)
+            errors.extend(plan_errors)
+            if plan is not None and not plan_errors:
+                plans[package] = plan
+        return cls(names, plans, source), errors
+
+
+def load_config_file(path):
+    """
+    从文件加载频率配置（每次重新执行，不使用已导入的模块）
+
+    Returns:
+        tuple: (APPS, APP_FREQ_CONFIGS)
+    """
+    spec = importlib.util.spec_from_file_location("_freq_config_reload", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.APPS, module.APP_FREQ_CONFIGS
+
+
+# 当前使用的频率计划表（ConfigWatcher 重新加载时整体替换）
+PLAN_TABLE, _ = PlanTable.build(APPS, APP_FREQ_CONFIGS)
+
+
+class ConfigWatcher:
+    """
+    监视频率配置文件，文件修改或收到SIGHUP时重新加载
+
+    新配置编译并按设备可用频率校验通过后才替换 PLAN_TABLE；语法错误或校验失败时继续使用旧配置。
+    已经在运行的频率控制器继续使用启动时的计划。
+    """
+
+    def __init__(self, path=CONFIG_PATH, poll_s=CONFIG_POLL_S):
+        self.path = path
+        self.poll_s = poll_s
+        self._stamp = None
+        self._loop = None
+        self._timer = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def load(self, initial=False):
+        """
+        加载配置文件
+
+        Args:
+            initial: 启动时的第一次加载；此时校验失败的App被跳过，其余App照常使用
+
+        Returns:
+            bool: 是否替换了 PLAN_TABLE
+        """
+        global PLAN_TABLE
+        self._stamp = self._stat()
+        start = time.perf_counter()
+        try:
+            apps, configs = load_config_file(self.path)
+        except Exception as e:
+            print(f"[配置] 加载 {self.path} 失败，继续使用{'内置' if initial else '旧'}配置: {e}", flush=True)
+            return False
+
+        table, errors = PlanTable.build(apps, configs, read_opp_table(), self.path)
+        for error in errors:
+            print(f"[配置] 校验失败: {error}", flush=True)
+        if errors and not initial:
+            print(f"[配置] {len(errors)} 个错误，继续使用旧配置", flush=True)
+            return False
+
+        PLAN_TABLE = table
+        SYSFS_WRITER.open_nodes(table.paths())
+        print(f"[配置] 已加载 {self.path}: {len(table.names)} 个App，{len(table.plans)} 个频率计划，"
+              f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms", flush=True)
+        return True
+
+    def start(self):
+        """在当前事件循环中定时检查文件修改，并注册SIGHUP（必须在事件循环中调用）"""
+        self._loop = asyncio.get_running_loop()
+        if self._stamp is None:
+            self._stamp = self._stat()
+        try:
+            self._loop.add_signal_handler(signal.SIGHUP, self._on_sighup)
+        except (NotImplementedError, RuntimeError, AttributeError):
+            pass
+        self._timer = self._loop.call_later(self.poll_s, self._poll)
 
-# 导入频率配置
-try:
-    from freq_config import APPS, APP_FREQ_CONFIGS
-except ImportError:
-    # 如果导入失败，使用空配置
-    APPS = {}
-    APP_FREQ_CONFIGS = {}
+    def _on_sighup(self):
+        print("[配置] 收到SIGHUP，重新加载", flush=True)
+        self.load()
 
-# 音频超时 (1.5s)
-AUDIO_TIMEOUT = 1.5
+    def _poll(self):
+        stamp = self._stat()
+        if stamp is not None and stamp != self._stamp:
+            print(f"[配置] {self.path} 已修改，重新加载", flush=True)
+            self.load()
+        self._timer = self._loop.call_later(self.poll_s, self._poll)
 
-# GPU路径
-GPU_PATH = "/sys/devices/genpd:0:1f000000.mali/consumer:platform:1f000000.mali/consumer"
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
 
 
-def execute_shell(cmd, need_root=False):
+class ActuationQueue:
     """
-    在设备本地执行shell命令（不使用adb，直接执行）
-    
-    Args:
-        cmd: shell命令
-        need_root: 是否需要root权限
-    
-    Returns:
-        命令输出（字符串）
+    串行的频率写入队列
+
+    所有频率控制器的写入都提交到这里，由事件循环中唯一的工作协程按提交顺序执行；
+    控制器已经停止时跳过它尚未执行的写入，重叠的启动不会互相覆盖
     """
-    try:
-        if need_root:
-            full_cmd = f"su -c \"{cmd}\""
-        else:
-            full_cmd = cmd
-        
-        result = subprocess.run(
-            full_cmd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=2.0
-        )
-        out = result.stdout.decode("utf-8", "ignore").strip()
-        if result.returncode != 0:
-            err = result.stderr.decode("utf-8", "ignore").strip()
-            print(f"[WARN] 命令执行失败: {full_cmd}\n错误: {err}", flush=True)
-        return out
-    except subprocess.TimeoutExpired:
-        print(f"[WARN] 命令执行超时: {cmd}", flush=True)
-        return ""
-    except Exception as e:
-        print(f"[WARN] 命令执行异常: {cmd}, 错误: {e}", flush=True)
-        return ""
 
+    def __init__(self, inline=None):
+        """
+        Args:
+            inline: 是否在事件循环中直接写入（None时按 SYSFS_WRITER.direct 决定）；
+                    回退到su子进程时在线程池中执行，不阻塞事件循环
+        """
+        self.inline = SYSFS_WRITER.direct if inline is None else inline
+        self._queue = None
+        self._task = None
 
-def set_cpu_frequencies_local(cpu_freq_settings):
-    """
-    在设备本地设置CPU频率（不使用adb）
-    
-    Args:
-        cpu_freq_settings: dict，格式为 {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
-    """
-    if not cpu_freq_settings:
-        return
-    
-    try:
-        for policy_id, freq_setting in cpu_freq_settings.items():
-            policy_path = f"/sys/devices/system/cpu/cpufreq/policy{policy_id}"
-            
-            # 解析频率设置
-            if isinstance(freq_setting, dict):
-                min_freq = freq_setting.get('min', freq_setting.get('min_freq'))
-                max_freq = freq_setting.get('max', freq_setting.get('max_freq'))
-            elif isinstance(freq_setting, (int, float)):
-                min_freq = max_freq = int(freq_setting)
-            else:
-                continue
-            
-            # 设置频率
-            min_path = f"{policy_path}/scaling_min_freq"
-            max_path = f"{policy_path}/scaling_max_freq"
-            
-            # 直接执行shell命令，不使用adb
-            execute_shell(f"sh -c 'echo {min_freq} > {min_path}'", need_root=True)
-            execute_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
-            
-            print(f"[频率] policy{policy_id}: {min_freq} KHz ({min_freq/1000:.0f} MHz)", flush=True)
-    except Exception as e:
-        print(f"[WARN] 设置CPU频率失败: {e}", flush=True)
+    @property
+    def pending(self):
+        return self._queue is not None and self._queue.qsize() > 0
 
+    def submit(self, controller, period, on_done=None):
+        """
+        提交一个时间段的写入（必须在事件循环中调用）
 
-def set_gpu_frequency_local(gpu_freq_setting):
+        Args:
+            period: 已编译的时间段（见 compile_period）
+            on_done: 写入完成后的回调 on_done(start_ns, done_ns, elapsed_ms)
+        """
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._queue.put_nowait((controller, period, on_done))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            controller, period, on_done = await self._queue.get()
+            try:
+                if not controller.is_running:
+                    continue
+                start_ns = time.monotonic_ns()
+                if self.inline:
+                    elapsed_ms = apply_plan_period(period)
+                else:
+                    elapsed_ms = await loop.run_in_executor(None, apply_plan_period, period)
+                if on_done is not None:
+                    on_done(start_ns, time.monotonic_ns(), elapsed_ms)
+            except Exception as e:
+                print(f"[WARN] 频率写入失败: {e}", flush=True)
+            finally:
+                self._queue.task_done()
+
+    async def join(self):
+        """等待已提交的写入全部完成"""
+        if self._queue is not None:
+            await self._queue.join()
+
+
+class LineReader:
     """
-    在设备本地设置GPU频率（不使用adb）
-    
-    Args:
-        gpu_freq_setting: int/float (Hz) 或 dict {'min': min_hz, 'max': max_hz}
+    在事件循环中按行读取文件描述符（stdin管道或trace_pipe），每读到一行调用 on_line
+
+    不支持epoll的文件（如重定向的普通文件）回退到后台线程阻塞读取
     """
-    if not gpu_freq_setting:
-        return
-    
-    try:
-        # 解析频率设置
-        if isinstance(gpu_freq_setting, dict):
-            min_freq = int(gpu_freq_setting.get('min', gpu_freq_setting.get('min_freq', 0)))
-            max_freq = int(gpu_freq_setting.get('max', gpu_freq_setting.get('max_freq', 0)))
-        elif isinstance(gpu_freq_setting, (int, float)):
-            min_freq = max_freq = int(gpu_freq_setting)
-        else:
+
+    def __init__(self, fd, on_line, on_eof, chunk_size=65536):
+        self.fd = fd
+        self.on_line = on_line
+        self.on_eof = on_eof
+        self.chunk_size = chunk_size
+        self._buffer = b""
+        self._loop = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            os.set_blocking(self.fd, False)
+            self._loop.add_reader(self.fd, self._on_readable)
+        except (OSError, ValueError):
+            os.set_blocking(self.fd, True)
+            self._loop.run_in_executor(None, self._read_blocking)
+
+    def _feed(self, data):
+        if not data:
+            if self._buffer:
+                self.on_line(self._buffer)
+                self._buffer = b""
+            self.on_eof()
             return
-        
-        # 设置频率
-        min_path = f"{GPU_PATH}/scaling_min_freq"
-        max_path = f"{GPU_PATH}/scaling_max_freq"
-        
-        execute_shell(f"sh -c 'echo {min_freq} > {min_path}'", need_root=True)
-        execute_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
-        
-        print(f"[频率] GPU: {min_freq} Hz ({min_freq/1e6:.0f} MHz)", flush=True)
-    except Exception as e:
-        print(f"[WARN] 设置GPU频率失败: {e}", flush=True)
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self.on_line(line)
 
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, self.chunk_size)
+        except (BlockingIOError, InterruptedError):
+            return
+        if not data:
+            self._loop.remove_reader(self.fd)
+        self._feed(data)
 
-def set_cpu_mode(mode):
-    """
-    设置CPU模式（兼容旧接口）
-    
-    Args:
-        mode: "boost" 或 "normal"
-    """
-    if mode == "boost":
-        # 设置为最大频率
-        set_cpu_frequencies_local({
-            "0": 1950000,
-            "4": 2450000,
-            "7": 3015000
-        })
-    elif mode == "normal":
-        # 恢复默认（这里可以设置为中等频率）
-        set_cpu_frequencies_local({
-            "0": 1328000,
-            "4": 1549000,
-            "7": 2147000
-        })
+    def _read_blocking(self):
+        while True:
+            data = os.read(self.fd, self.chunk_size)
+            self._loop.call_soon_threadsafe(self._feed, data)
+            if not data:
+                return
 
 
 class FrequencyController:
-    """频率控制器 - 管理时间段频率切换"""
+    """频率控制器 - 在事件循环中用计时器管理时间段频率切换"""
     
-    def __init__(self, app_package_name):
+    def __init__(self, app_package_name, actuator, launch=None, schedule_periods=True):
         """
         初始化频率控制器
         
         Args:
             app_package_name: 应用包名（例如 "com.tencent.mm"）
+            actuator: ActuationQueue，所有写入都提交到这里
+            launch: 启动延迟记录（见 StateMachine._start_freq_controller），第一次写入频率后写入延迟日志
+            schedule_periods: 是否为后续时间段设置计时器（离线快速回放时关闭）
         """
         self.app_package_name = app_package_name
-        self.app_name = None
-        self.freq_config = None
+        self.actuator = actuator
+        self.launch = launch
+        self.schedule_periods = schedule_periods
+        self.plan = PLAN_TABLE.get(app_package_name)
+        self.app_name = self.plan['app_name'] if self.plan else PLAN_TABLE.names.get(app_package_name)
+        self.periods = []
+        self.switch_lead_ms = 0
         self.start_time = None
-        self.monitor_thread = None
         self.is_running = False
+        # 所有时间段结束或被停止时完成
+        self.done = None
+        self._loop = None
+        self._timer = None
+        # 每次切换频率的应用耗时（毫秒）
+        self.apply_latencies_ms = []
+        # 每次切换的计划时间与实际时间
+        self.transitions = []
         
-        # 查找对应的app配置
-        for name, package in APPS.items():
-            if package == app_package_name:
-                self.app_name = name
-                break
-        
-        # 获取频率配置
-        if self.app_name and self.app_name in APP_FREQ_CONFIGS:
-            self.freq_config = APP_FREQ_CONFIGS[self.app_name]
-            print(f"[频率控制] 找到配置: {self.app_name}", flush=True)
+        # 预编译的频率计划（包名直接查表）
+        if self.plan:
+            backend = self.plan.get('backend', DEFAULT_BACKEND)
+            suffix = f"（{backend} 后端）" if backend != DEFAULT_BACKEND else ""
+            print(f"[频率控制] 找到配置: {self.app_name}{suffix}", flush=True)
         else:
             print(f"[频率控制] 未找到配置: {app_package_name}", flush=True)
     
     def start(self):
-        """开始频率控制"""
-        if not self.freq_config:
-            return
-        
-        cpu_cfg = self.freq_config.get("cpu_freq_settings")
-        if not cpu_cfg or not cpu_cfg.get("time_based"):
-            return
-        
-        periods = cpu_cfg.get("periods", [])
-        if not periods:
+        """开始频率控制（必须在事件循环中调用）"""
+        if not self.plan:
             return
         
-        # 设置初始频率（第一个时间段）
-        first_period = periods[0]
-        if first_period.get("cpu_freq"):
-            set_cpu_frequencies_local(first_period["cpu_freq"])
-        if first_period.get("gpu_freq"):
-            set_gpu_frequency_local(first_period["gpu_freq"])
+        # 时间段已按开始时间排序，每个时间段边界一个计时器
+        self.periods = self.plan['periods']
+        self.switch_lead_ms = self.plan['switch_lead_ms']
         
-        # 记录启动时间
-        self.start_time = time.time()
+        # 记录启动时间（loop.time() 即单调时钟）
+        self._loop = asyncio.get_running_loop()
+        self.done = self._loop.create_future()
+        self.start_time = self._loop.time()
         self.is_running = True
         
-        # 启动监控线程
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        # 设置初始频率（第一个时间段）
+        self.actuator.submit(self, self.periods[0], self._on_initial_applied)
+        if self.schedule_periods:
+            self._arm(1)
         
-        print(f"[频率控制] 已启动，时间段数: {len(periods)}", flush=True)
+        print(f"[频率控制] 已启动，时间段数: {len(self.periods)}", flush=True)
+    
+    def _lead_s(self):
+        """
+        计算切换提前量
+
+        switch_lead_ms 为固定提前量（毫秒），或 "auto"（使用已测得的最大应用耗时）
+        """
+        if self.switch_lead_ms == "auto":
+            lead_ms = max(self.apply_latencies_ms) if self.apply_latencies_ms else DEFAULT_SWITCH_LEAD_MS
+        else:
+            lead_ms = float(self.switch_lead_ms or 0)
+        return lead_ms / 1000.0
     
-    def _monitor_loop(self):
-        """监控循环 - 根据时间段切换频率"""
-        if not self.freq_config:
+    def _arm(self, idx):
+        """为第 idx 个时间段的开始（或最后一个时间段的结束）设置计时器"""
+        if not self.is_running:
             return
+        if idx >= len(self.periods):
+            end_s = self.periods[-1].get("end", 10.0)
+            self._timer = self._loop.call_at(self.start_time + end_s, self._finish)
+            return
+        lead_s = self._lead_s()
+        deadline = self.start_time + self.periods[idx].get("start", 0) - lead_s
+        self._timer = self._loop.call_at(deadline, self._switch, idx, lead_s)
+    
+    def _switch(self, idx, lead_s):
+        """计时器到期：提交第 idx 个时间段的写入，完成后设置下一个计时器"""
+        wake_s = self._loop.time() - self.start_time
         
-        cpu_cfg = self.freq_config.get("cpu_freq_settings")
-        periods = cpu_cfg.get("periods", [])
-        last_period_index = 0
+        def _on_done(start_ns, done_ns, elapsed_ms):
+            self._record_apply(elapsed_ms)
+            start_s = self.periods[idx].get("start", 0)
+            done_s = self._loop.time() - self.start_time
+            self.transitions.append({
+                "period": idx + 1,
+                "intended_s": start_s,
+                "wake_s": wake_s,
+                "applied_s": done_s,
+                "lead_s": lead_s
+            })
+            print(f"[频率切换] 时间段 {idx+1}/{len(self.periods)}: 计划 {start_s:.3f}s，唤醒 {wake_s:.3f}s，"
+                  f"完成 {done_s:.3f}s（偏差 {(done_s - start_s) * 1000:+.1f} ms，提前 {lead_s * 1000:.1f} ms）",
+                  flush=True)
+            self._arm(idx + 1)
         
-        while self.is_running:
-            if not self.start_time:
-                time.sleep(0.01)
-                continue
-            
-            elapsed = time.time() - self.start_time
-            
-            # 检查是否需要切换到下一个时间段
-            for idx, period in enumerate(periods):
-                start_s = period.get("start", 0)
-                end_s = period.get("end", float('inf'))
-                
-                if start_s <= elapsed < end_s and idx != last_period_index:
-                    # 需要切换到这个时间段
-                    print(f"[频率切换] 时间段 {idx+1}/{len(periods)}: {start_s:.2f}s - {end_s:.2f}s (当前: {elapsed:.3f}s)", flush=True)
-                    
-                    if period.get("cpu_freq"):
-                        set_cpu_frequencies_local(period["cpu_freq"])
-                    if period.get("gpu_freq"):
-                        set_gpu_frequency_local(period["gpu_freq"])
-                    
-                    last_period_index = idx
-                    break
-            
-            # 如果超过最后一个时间段，停止监控
-            if elapsed >= periods[-1].get("end", 10.0):
-                self.is_running = False
-                break
-            
-            time.sleep(0.01)  # 每10ms检查一次
+        self.actuator.submit(self, self.periods[idx], _on_done)
     
+    def _on_initial_applied(self, start_ns, done_ns, elapsed_ms):
+        self._record_apply(elapsed_ms)
+        if self.launch is not None and LATENCY_RECORDER is not None:
+            self.launch["apply_start_ns"] = start_ns
+            self.launch["apply_done_ns"] = done_ns
+            LATENCY_RECORDER.record(self.launch)
+    
+    def _record_apply(self, elapsed_ms):
+        if elapsed_ms is not None:
+            self.apply_latencies_ms.append(elapsed_ms)
+    
+    def _finish(self):
+        """最后一个时间段结束"""
+        self.is_running = False
+        self._print_latency_summary()
+        if not self.done.done():
+            self.done.set_result(True)
+
+    def _print_latency_summary(self):
+        """打印本次启动所有频率切换的耗时"""
+        if not self.apply_latencies_ms:
+            return
+        latencies = self.apply_latencies_ms
+        print(f"[频率控制] 切换 {len(latencies)} 次，平均 {sum(latencies)/len(latencies):.2f} ms，"
+              f"最大 {max(latencies):.2f} ms", flush=True)
+        if self.transitions:
+            offsets = [(t["applied_s"] - t["intended_s"]) * 1000 for t in self.transitions]
+            print(f"[频率控制] 切换时间偏差: 平均 {sum(offsets)/len(offsets):+.2f} ms，"
+                  f"最大 {max(offsets, key=abs):+.2f} ms", flush=True)
+
     def stop(self):
-        """停止频率控制"""
+        """停止频率控制（取消计时器，队列中尚未执行的写入会被跳过）"""
+        self.is_running = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.done is not None and not self.done.done():
+            self.done.set_result(False)
+
+
+class SpeculativeBoost:
+    """
+    推测提升：在确认启动哪个App之前先提升频率
+
+    截止时间内有已配置的App启动时由 confirm() 结束（命中，之后由该App的频率控制器接管）；
+    否则 cancel() 把节点恢复为提升前的值（误报）。
+    """
+
+    def __init__(self, trigger, pid, t_ns, actuator, period, deadline_s=SPECULATIVE_DEADLINE_S):
+        """
+        Args:
+            trigger: 触发来源（EARLY_TRIGGERS 之一）
+            pid: 触发事件的进程
+            t_ns: 触发事件的时间（内核时间戳，没有时为读到事件的时间）
+            actuator: ActuationQueue
+            period: 提升使用的时间段（PlanTable.speculative）
+            deadline_s: 截止时间（秒）
+        """
+        self.trigger = trigger
+        self.pid = pid
+        self.t_ns = t_ns
+        self.actuator = actuator
+        self.period = period
+        self.deadline_s = deadline_s
+        # "hit" / "miss"，未结束时为None
+        self.outcome = None
+        self.package = None
+        self.confirm_ns = None
         self.is_running = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=1.0)
+        self._restore = []
+        self._timer = None
+
+    def start(self, use_timer=True):
+        """
+        提交提升（必须在事件循环中调用）
+
+        Args:
+            use_timer: 是否设置截止时间计时器（离线快速回放时按事件时间判断，不使用计时器）
+        """
+        self.is_running = True
+        self.actuator.submit(self, dict(self.period, restore=self._restore))
+        if use_timer:
+            self._timer = asyncio.get_running_loop().call_later(self.deadline_s, self.cancel)
+
+    def expired(self, now_ns):
+        return now_ns is not None and now_ns - self.t_ns > self.deadline_s * 1e9
+
+    @property
+    def saved_ms(self):
+        """比原来的触发（activityStart / bindApplication）提前的时间（毫秒），未命中时为None"""
+        if self.outcome != "hit":
+            return None
+        return (self.confirm_ns - self.t_ns) / 1e6
+
+    def confirm(self, package_name, confirm_ns):
+        """已配置的App启动，频率控制器接管（尚未执行的提升会被跳过）"""
+        if self.outcome is not None:
+            return
+        self.outcome = "hit"
+        self.package = package_name
+        self.confirm_ns = confirm_ns
+        self.is_running = False
+        if self._timer is not None:
+            self._timer.cancel()
+        print(f"[推测提升] 命中 {package_name}，比 {self.trigger} 之后的确认早 {self.saved_ms:.1f} ms", flush=True)
+
+    def cancel(self):
+        """截止时间内没有已配置的App启动，恢复提升前的频率"""
+        if self.outcome is not None:
+            return
+        self.outcome = "miss"
+        if self._timer is not None:
+            self._timer.cancel()
+        print(f"[推测提升] {self.deadline_s:.1f}s 内没有已配置的App启动（{self.trigger}），恢复频率", flush=True)
+        restore = {"cpu_freq": None, "gpu_freq": None, "ranges": self._restore, "restores": self.trigger,
+                   "labels": [f"恢复推测提升前的频率（{len(self._restore)} 组节点）"]}
+        self.actuator.submit(self, restore, self._on_restored)
+
+    def _on_restored(self, start_ns, done_ns, elapsed_ms):
+        self.is_running = False
+
+    def to_dict(self):
+        return {
+            "trigger": self.trigger,
+            "pid": self.pid,
+            "t_ns": self.t_ns,
+            "outcome": self.outcome,
+            "package": self.package,
+            "saved_ms": self.saved_ms
+        }
 
 
 class StateMachine:
-    def __init__(self):
+    def __init__(self, actuator=None, schedule_periods=True, early_triggers=EARLY_TRIGGERS,
+                 speculative_deadline_s=SPECULATIVE_DEADLINE_S):
+        """
+        Args:
+            actuator: 频率写入队列（None时新建）
+            schedule_periods: 是否使用真实时间的计时器（传给 FrequencyController，也用于推测提升的截止时间）
+            early_triggers: 启用的推测提升触发来源
+            speculative_deadline_s: 推测提升的截止时间（秒）
+        """
         self.foreground_app = "System"
-        self.pid_map = {}
+        self.pids = PidCache()
         self.last_input_time = time.time()
         self.input_count = 0
         
         self.is_audio_active = False
         self.last_audio_signal_ts = 0
+        self._audio_timer = None
         
-        # 频率控制器
+        # 频率控制器（所有状态只在事件循环中修改）
+        self.actuator = actuator or ActuationQueue()
+        self.schedule_periods = schedule_periods
         self.freq_controller = None
+        self._controller_t_ns = None
+        # 等待cmdline的冷启动数
+        self.pending_cold_starts = 0
+        # 不使用计时器时（快速回放）按事件时间排队的cmdline重试: [(到期时间ns, 参数)]，以及回放的虚拟时钟
+        self._retry_queue = []
+        self._virtual_now_ns = 0
         
-        threading.Thread(target=self._audio_watchdog, daemon=True).start()
+        # 推测提升
+        self.early_triggers = set(early_triggers)
+        self.speculative_deadline_s = speculative_deadline_s
+        self.speculation = None
+        self.speculations = deque(maxlen=SPECULATION_HISTORY)
 
-    def _audio_watchdog(self):
-        while True:
-            time.sleep(0.5)
-            if self.is_audio_active:
-                if time.time() - self.last_audio_signal_ts > AUDIO_TIMEOUT:
-                    print(f"\033[33m>>> [停止] 音频结束\033[0m", flush=True)
-                    # set_cpu_mode("normal")  # 已关闭：只为app冷启动设置频率
-                    self.is_audio_active = False
+    def _audio_timeout(self):
+        """最后一次音频信号之后 AUDIO_TIMEOUT 秒"""
+        self._audio_timer = None
+        if self.is_audio_active:
+            print(f"\033[33m>>> [停止] 音频结束\033[0m", flush=True)
+            # set_cpu_mode("normal")  # 已关闭：只为app冷启动设置频率
+            self.is_audio_active = False
 
     def get_process_name(self, pid):
-        if pid in self.pid_map:
-            return self.pid_map[pid]
-        try:
-            path = f"/proc/{pid}/cmdline"
-            if not os.path.exists(path):
-                return None
-            with open(path, "rb") as f:
-                content = f.read().replace(b'\x00', b'').decode('utf-8').strip()
-                if content:
-                    name = content.split('.')[-1] if '.' in content else content
-                    if name in ["zygote64", "zygote", "<pre-initialized>"]:
-                        return name
-                    self.pid_map[pid] = name
-                    return name
-        except:
-            pass
-        return None
+        """获取进程短名（包名最后一段）"""
+        entry = self.pids.get(pid)
+        return entry[0] if entry else None
     
     def get_package_name(self, pid):
         """获取完整的包名"""
-        try:
-            path = f"/proc/{pid}/cmdline"
-            if not os.path.exists(path):
-                return None
-            with open(path, "rb") as f:
-                content = f.read().replace(b'\x00', b'').decode('utf-8').strip()
-                return content
-        except:
-            pass
-        return None
+        entry = self.pids.get(pid)
+        return entry[1] if entry else None
 
-    def handle_cold_start_async(self, pid, temp_name):
-        def _wait_and_print():
-            time.sleep(0.2)
-            final_name = temp_name
-            package_name = None
-            try:
-                path = f"/proc/{pid}/cmdline"
-                if os.path.exists(path):
-                    with open(path, "rb") as f:
-                        c = f.read().replace(b'\x00', b'').decode('utf-8').strip()
-                        if c:
-                            final_name = c.split('.')[-1]
-                            package_name = c
-            except:
-                pass
-            self.pid_map[pid] = final_name
-            print(f"[冷启动] 新进程创建: {final_name}", flush=True)
-            
-            # 启动频率控制
-            if package_name:
-                # 停止旧的频率控制器
-                if self.freq_controller:
-                    self.freq_controller.stop()
-                
-                # 创建新的频率控制器
-                self.freq_controller = FrequencyController(package_name)
-                self.freq_controller.start()
+    def _speculate(self, trigger, pid, ts_ns=None, read_ns=None):
+        """
+        推测即将有App启动，先提升频率
+
+        频率控制器正在运行、或已有未结束的推测提升时不触发（不覆盖正在使用的频率）；
+        写入队列按顺序执行，新的提升在上一次的恢复之后才读取节点当前值，不会把提升后的值当作恢复目标
+        """
+        if trigger not in self.early_triggers or PLAN_TABLE.speculative is None:
+            return
+        t_ns = ts_ns if ts_ns is not None else read_ns
+        if self._controller_active(t_ns):
+            return
+        self.expire_speculation(t_ns)
+        if self.speculation is not None and self.speculation.outcome is None:
+            return
+        self.speculation = SpeculativeBoost(trigger, pid, t_ns, self.actuator, PLAN_TABLE.speculative,
+                                            self.speculative_deadline_s)
+        self.speculations.append(self.speculation)
+        print(f"[推测提升] {trigger}（pid {pid}），截止 {self.speculative_deadline_s:.1f}s", flush=True)
+        self.speculation.start(use_timer=self.schedule_periods)
+
+    def _controller_active(self, now_ns):
+        """频率控制器是否还在时间段内（快速回放时没有计时器，按事件时间判断）"""
+        c = self.freq_controller
+        if not c or not c.is_running or not c.periods:
+            return False
+        return now_ns is None or now_ns - self._controller_t_ns < c.periods[-1].get("end", 10.0) * 1e9
+
+    def _expire_on_event(self, ts_ns):
+        """
+        快速回放没有截止时间计时器：每个带内核时间戳的事件先结束已超过截止时间的推测提升，
+        恢复写入排在该事件之前（没有时间戳的事件无法与推测的时间比较，跳过）
+        """
+        if not self.schedule_periods and ts_ns is not None:
+            self.expire_speculation(ts_ns)
+
+    def expire_speculation(self, now_ns=None):
+        """
+        按事件时间结束已超过截止时间的推测提升
+
+        Args:
+            now_ns: 当前事件的时间；None时无条件结束未确认的推测提升（回放结束时）
+        """
+        s = self.speculation
+        if s is not None and s.outcome is None and (now_ns is None or s.expired(now_ns)):
+            s.cancel()
+
+    def _start_freq_controller(self, package_name, trigger, ts_ns=None, read_ns=None):
+        """
+        停止旧的频率控制器并为 package_name 启动新的
+
+        Args:
+            trigger: 触发事件（activityStart / bindApplication）
+            ts_ns: 事件的内核记录时间
+            read_ns: 分析器读到事件的时间
+        """
+        t_ns = ts_ns if ts_ns is not None else read_ns
+        self.expire_speculation(t_ns)
+        if self.speculation is not None and PLAN_TABLE.get(package_name):
+            self.speculation.confirm(package_name, t_ns)
+        self._controller_t_ns = t_ns
+        launch = {
+            "package": package_name,
+            "trigger": trigger,
+            "kernel_ns": ts_ns,
+            "read_ns": read_ns,
+            "dispatch_ns": time.monotonic_ns()
+        }
+        # 停止旧的频率控制器
+        if self.freq_controller:
+            self.freq_controller.stop()
+        self.freq_controller = FrequencyController(package_name, self.actuator, launch, self.schedule_periods)
+        self.freq_controller.start()
+
+    def handle_cold_start_async(self, pid, temp_name, ts_ns=None, read_ns=None):
+        """进程还是临时名称，每隔 CMDLINE_RETRY_S 重新读取 cmdline"""
+        self.pending_cold_starts += 1
+        self._schedule_cold_start_retry(pid, temp_name, ts_ns, read_ns, 1)
+
+    def _schedule_cold_start_retry(self, pid, temp_name, ts_ns, read_ns, attempt):
+        """
+        安排第 attempt 次重新读取
+
+        使用计时器时按真实时间执行；否则（快速回放）按 run_due_retries() 推进的虚拟时钟排队，
+        保证冷启动与之后的事件按录制时的顺序处理
+        """
+        if self.schedule_periods:
+            asyncio.get_running_loop().call_later(
+                CMDLINE_RETRY_S, self._resolve_cold_start, pid, temp_name, ts_ns, read_ns, attempt)
+            return
+        due_ns = self._virtual_now_ns + int(CMDLINE_RETRY_S * 1e9)
+        self._retry_queue.append((due_ns, (pid, temp_name, ts_ns, read_ns, attempt)))
+
+    def run_due_retries(self, now_ns=None):
+        """
+        把虚拟时钟推进到 now_ns，执行到期的cmdline重试（只用于不使用计时器的快速回放）
+
+        Args:
+            now_ns: 下一条事件的录制时间；None时执行全部（回放结束时）
+        """
+        while self._retry_queue:
+            due = min(self._retry_queue, key=lambda r: r[0])
+            if now_ns is not None and due[0] > now_ns:
+                break
+            self._retry_queue.remove(due)
+            self._virtual_now_ns = due[0]
+            self._resolve_cold_start(*due[1])
+        if now_ns is not None:
+            self._virtual_now_ns = now_ns
+
+    def _resolve_cold_start(self, pid, temp_name, ts_ns, read_ns, attempt):
+        entry = self.pids.refresh(pid)
+        if (entry is None or entry[0] in TRANSIENT_PROCESS_NAMES) and attempt < CMDLINE_RETRY_LIMIT:
+            self._schedule_cold_start_retry(pid, temp_name, ts_ns, read_ns, attempt + 1)
+            return
+        self.pending_cold_starts -= 1
+        final_name, package_name = entry if entry else (temp_name, None)
+        print(f"[冷启动] 新进程创建: {final_name}", flush=True)
         
-        threading.Thread(target=_wait_and_print).start()
+        # 启动频率控制
+        if package_name:
+            self._start_freq_controller(package_name, "bindApplication", ts_ns, read_ns)
 
     def process(self, line):
+        """
+        处理一行事件（bpftrace输出或 trace_pipe）
+
+        Args:
+            line: bytes（str也可以，会先编码）
+        """
+        read_ns = time.monotonic_ns()
         try:
+            if isinstance(line, str):
+                line = line.encode("utf-8")
             line = line.strip()
             
+            # 0. 进程退出/改名，维护pid缓存
+            lifecycle = parse_lifecycle_line(line)
+            if lifecycle is not None:
+                kind, pid, ts_ns = lifecycle
+                self._expire_on_event(ts_ns)
+                if kind == "exit":
+                    self.pids.invalidate(pid)
+                elif kind == "fork":
+                    self._speculate("zygoteFork", pid, ts_ns, read_ns)
+                else:
+                    self.pids.refresh(pid)
+                return
+            
             # 1. 音频信号 (来自 Module A) - 已关闭频率设置
-            if line == "sys_event:AUDIO_ACTIVE":
+            if line == AUDIO_EVENT:
                 self.last_audio_signal_ts = time.time()
+                # 每次信号重新计时，超时后认为音频结束
+                if self._audio_timer is not None:
+                    self._audio_timer.cancel()
+                self._audio_timer = asyncio.get_running_loop().call_later(AUDIO_TIMEOUT, self._audio_timeout)
                 if not self.is_audio_active:
                     print(f"\033[36m>>> [播放] 音频活跃\033[0m", flush=True)
                     # set_cpu_mode("boost")  # 已关闭：只为app冷启动设置频率
                     self.is_audio_active = True
                 return
 
-            # 2. UI 日志 (来自 Module B)
-            if not line.startswith("{"):
+            # 2. UI 日志 (来自 Module B)，不含关键字的行直接丢弃
+            event = parse_event_line(line)
+            if event is None:
                 return
-            
-            try:
-                entry = json.loads(line)
-            except:
-                return
-
-            if "B|" not in entry['log']:
-                return
-            
-            content = entry['log'].split('|', 2)[2]
-            pid = entry['pid']
+            pid, content, keywords, ts_ns = event
+            self._expire_on_event(ts_ns)
             
             # 输入法监测 - 已关闭频率设置
-            if "showSoftInput" in content:
+            if "showSoftInput" in keywords:
                 print(f"[输入法] 键盘弹出", flush=True)
                 # set_cpu_mode("boost")  # 已关闭：只为app冷启动设置频率
                 return
 
-            if "hideSoftInput" in content:
+            if "hideSoftInput" in keywords:
                 print(f"[输入法] 键盘收起", flush=True)
                 return
 
             # Activity启动 - 只保留时间段频率控制，关闭固定boost
-            if "activityStart" in content:
+            if "activityStart" in keywords:
                 # set_cpu_mode("boost")  # 已关闭：只为app冷启动设置频率
                 # 尝试从activityStart中提取包名
                 # 格式: activityStart: cmp=com.tencent.mm/.ui.LauncherUI
@@ -392,14 +1943,9 @@ class StateMachine:
                     try:
                         cmp_part = content.split("cmp=")[1].split()[0]
                         package_name = cmp_part.split("/")[0]
-                        if package_name in APPS.values():
-                            # 停止旧的频率控制器
-                            if self.freq_controller:
-                                self.freq_controller.stop()
-                            
+                        if package_name in PLAN_TABLE:
                             # 创建新的频率控制器（时间段频率控制）
-                            self.freq_controller = FrequencyController(package_name)
-                            self.freq_controller.start()
+                            self._start_freq_controller(package_name, "activityStart", ts_ns, read_ns)
                     except:
                         pass
             
@@ -410,15 +1956,23 @@ class StateMachine:
             #     self.last_input_time = time.time()
             
             # 仅用于滑动检测的时间戳更新（不触发频率设置）
-            if "dispatchInputEvent" in content:
+            if "dispatchInputEvent" in keywords:
                 self.last_input_time = time.time()
 
             # 获取进程名
             pid_name = self.get_process_name(pid)
             is_ui = pid_name and pid_name not in ["system_server", "surfaceflinger", "audioserver"]
 
+            # 推测提升：system_server 开始启动Activity，或在Launcher中点击
+            if "startActivity" in keywords:
+                if pid_name == "system_server":
+                    self._speculate("startActivity", pid, ts_ns, read_ns)
+                return
+            if "dispatchInputEvent" in keywords and self.get_package_name(pid) in LAUNCHER_PACKAGES:
+                self._speculate("launcherInput", pid, ts_ns, read_ns)
+
             # 触摸与滑动
-            if "dispatchInputEvent" in content and is_ui:
+            if "dispatchInputEvent" in keywords and is_ui:
                 self.foreground_app = pid_name
                 if time.time() - self.last_input_time < 0.5:
                     self.input_count += 1
@@ -434,24 +1988,21 @@ class StateMachine:
                     print(f"[滑动] 正在 {self.foreground_app} (持续滑动...)", flush=True)
 
             # 冷启动
-            if "bindApplication" in content:
+            if "bindApplication" in keywords:
                 if is_ui:
                     if pid_name in ["<pre-initialized>", "zygote64", "zygote"]:
-                        self.handle_cold_start_async(pid, pid_name)
+                        self.handle_cold_start_async(pid, pid_name, ts_ns, read_ns)
                     else:
                         print(f"[冷启动] 新进程创建: {pid_name}", flush=True)
                         # 获取完整包名并启动频率控制
                         package_name = self.get_package_name(pid)
                         if package_name:
-                            if self.freq_controller:
-                                self.freq_controller.stop()
-                            self.freq_controller = FrequencyController(package_name)
-                            self.freq_controller.start()
+                            self._start_freq_controller(package_name, "bindApplication", ts_ns, read_ns)
                     self.foreground_app = pid_name if pid_name not in ["<pre-initialized>"] else self.foreground_app
                 return
 
             # 页面切换
-            if any(k in content for k in ["activityStart", "activityResume"]):
+            if "activityStart" in keywords or "activityResume" in keywords:
                 if is_ui and pid_name != self.foreground_app:
                     print(f"[页面切换] {self.foreground_app} -> {pid_name}", flush=True)
                     self.foreground_app = pid_name
@@ -460,20 +2011,101 @@ class StateMachine:
             pass  # 静默忽略错误
 
 
-def main():
-    print(f"Start - 频率控制模式", flush=True)
-    sm = StateMachine()
-    # 使用errors='replace'或'ignore'来处理非UTF-8字符
-    # 这样可以避免UnicodeDecodeError，即使bpftrace输出包含特殊字符
-    for line in sys.stdin.buffer:
+async def run_live(fd, watcher=None, sm=None):
+    """
+    在一个事件循环中运行分析器：非阻塞读取事件、计时器切换时间段、串行写入频率
+
+    Args:
+        fd: 事件来源的文件描述符（stdin 或 trace_pipe），读到EOF时返回
+        watcher: ConfigWatcher，None时不监视配置文件
+        sm: StateMachine，None时使用默认参数新建
+    """
+    loop = asyncio.get_running_loop()
+    sm = sm or StateMachine()
+    eof = loop.create_future()
+
+    def _on_line(line):
+        # 直接处理原始字节，只有命中关键字的行才解码（非UTF-8字符用replace策略）
         try:
-            # 尝试UTF-8解码，失败时使用replace策略
-            line_str = line.decode('utf-8', errors='replace').strip()
-            sm.process(line_str)
+            if STREAM_RECORDER is not None:
+                STREAM_RECORDER.line(time.monotonic_ns(), line)
+            sm.process(line)
         except Exception as e:
-            # 静默忽略解码错误，继续处理下一行
+            # 静默忽略错误，继续处理下一行
             pass
 
+    def _on_eof():
+        if not eof.done():
+            eof.set_result(None)
+
+    LineReader(fd, _on_line, _on_eof).start()
+    if watcher is not None:
+        watcher.start()
+    await eof
+    if watcher is not None:
+        watcher.stop()
+    sm.expire_speculation()
+    if sm.freq_controller:
+        sm.freq_controller.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='实时分析器 - 检测app启动并设置频率')
+    parser.add_argument('--source', choices=['stdin', 'tracefs'], default='stdin',
+                        help='事件来源：stdin（bpftrace输出，默认）或 tracefs（直接读取trace_pipe）')
+    parser.add_argument('--instance', default=TRACE_INSTANCE, help=f'tracefs模式使用的tracing实例（默认: {TRACE_INSTANCE}）')
+    parser.add_argument('--latency-log', default=LATENCY_LOG, help=f'启动延迟日志文件（默认: {LATENCY_LOG}）')
+    parser.add_argument('--no-latency-log', action='store_true', help='不记录启动延迟')
+    parser.add_argument('--latency-summary', action='store_true', help='汇总启动延迟日志后退出')
+    parser.add_argument('--record', default=None, help='同时把事件流录制到文件（用 replay_stream.py 回放）')
+    parser.add_argument('--config', default=CONFIG_PATH, help='频率配置文件（默认: 分析器目录下的 freq_config.py）')
+    parser.add_argument('--no-watch', action='store_true', help='不监视配置文件的修改')
+    parser.add_argument('--early-triggers', default=",".join(EARLY_TRIGGERS),
+                        help=f'推测提升的触发来源，逗号分隔，空字符串关闭（默认: {",".join(EARLY_TRIGGERS)}）')
+    parser.add_argument('--speculative-deadline', type=float, default=SPECULATIVE_DEADLINE_S,
+                        help=f'推测提升的截止时间，秒（默认: {SPECULATIVE_DEADLINE_S}）')
+    args = parser.parse_args()
+    early_triggers = [t for t in args.early_triggers.split(",") if t]
+    unknown = [t for t in early_triggers if t not in EARLY_TRIGGERS]
+    if unknown:
+        parser.error(f"未知的触发来源: {', '.join(unknown)}（可选: {', '.join(EARLY_TRIGGERS)}）")
+
+    if args.latency_summary:
+        summarize_latency_log(args.latency_log)
+        return
+
+    global LATENCY_RECORDER, STREAM_RECORDER
+    if not args.no_latency_log:
+        LATENCY_RECORDER = LatencyRecorder(args.latency_log)
+    if args.record:
+        STREAM_RECORDER = StreamRecorder(args.record)
+        print(f"[录制] 事件流写入 {args.record}", flush=True)
+
+    print(f"Start - 频率控制模式（事件来源: {args.source}）", flush=True)
+    watcher = ConfigWatcher(args.config)
+    watcher.load(initial=True)
+    source = None
+    pipe_fd = None
+    try:
+        fd = sys.stdin.fileno()
+        if args.source == "tracefs":
+            # 在try中创建，setup中途失败时同样会清理已创建的实例
+            source = TracefsMarkerSource(args.instance)
+            source.setup()
+            fd = pipe_fd = source.open_pipe()
+        sm = StateMachine(early_triggers=early_triggers, speculative_deadline_s=args.speculative_deadline)
+        asyncio.run(run_live(fd, None if args.no_watch else watcher, sm))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pipe_fd is not None:
+            os.close(pipe_fd)
+        if source:
+            source.teardown()
+        if STREAM_RECORDER is not None:
+            STREAM_RECORDER.close()
+        SYSFS_WRITER.close()
+
 
 if __name__ == "__main__":
     main()
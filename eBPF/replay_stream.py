@@ -0,0 +1,307 @@
+"""
+事件流回放
+把 live_analyzer_with_freq.py --record 录制的事件流（或bpftrace的原始输出）离线送入 StateMachine，
+频率写入由 FakeFrequencyBackend 记录而不是写sysfs，不需要手机。
+
+用途：
+    - 回归测试控制器的决策（--output 保存命令，--expect 对比）
+    - 测量 StateMachine 的事件吞吐量（行/秒）
+    - 在相同输入上对比不同的频率配置（多次 --config）
+
+用法:
+    python3 replay_stream.py stream.rec                      # 尽快回放
+    python3 replay_stream.py stream.rec --realtime           # 按录制时间回放（包括时间段切换）
+    python3 replay_stream.py stream.rec --output cmds.json
+    python3 replay_stream.py stream.rec --expect cmds.json
+    python3 replay_stream.py stream.rec --config freq_config --config freq_config_new
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import importlib
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import live_analyzer_with_freq as analyzer
+
+
+# 事件行之后最多查看多少条P记录
+PID_LOOKAHEAD = 8
+
+
+def load_stream(path):
+    """
+    读取录制文件
+
+    Returns:
+        list: [(ns, kind, payload)]，kind为 "L"（事件行，payload为bytes）或 "P"（payload为 (pid, cmdline)）；
+              bpftrace原始输出没有时间戳，ns为None
+    """
+    records = []
+    with open(path, "rb") as f:
+        for raw in f:
+            raw = raw.rstrip(b"\n")
+            parts = raw.split(b" ", 2)
+            if len(parts) >= 2 and parts[0].isdigit() and parts[1] in (b"L", b"P"):
+                ns = int(parts[0])
+                payload = parts[2] if len(parts) == 3 else b""
+                if parts[1] == b"L":
+                    records.append((ns, "L", payload))
+                else:
+                    pid, _, cmdline = payload.decode("utf-8", "replace").partition(" ")
+                    records.append((ns, "P", (int(pid), None if cmdline == "-" else cmdline)))
+            else:
+                records.append((None, "L", raw))
+    return records
+
+
+class FakeFrequencyBackend:
+    """代替 apply_plan_period，只记录发出的频率命令"""
+
+    def __init__(self, latency_ms=0.0):
+        """
+        Args:
+            latency_ms: 模拟的写入耗时（毫秒），也作为返回值
+        """
+        self.latency_ms = latency_ms
+        self.commands = []
+        self.event_index = 0
+        self.start_ns = time.monotonic_ns()
+        self._lock = threading.Lock()
+
+    def __call__(self, cpu_freq_settings=None, gpu_freq_setting=None):
+        if not cpu_freq_settings and not gpu_freq_setting:
+            return None
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        with self._lock:
+            self.commands.append({
+                "event_index": self.event_index,
+                "t_s": round((time.monotonic_ns() - self.start_ns) / 1e9, 4),
+                "cpu": cpu_freq_settings or None,
+                "gpu": gpu_freq_setting or None
+            })
+        return self.latency_ms
+
+    def apply_period(self, period):
+        """与 apply_plan_period 相同的接口（已编译的时间段）；推测提升的恢复记为 cpu="restore" """
+        if period.get("restores"):
+            return self("restore")
+        if period.get("writes"):
+            # uclamp / governor 后端：记录写入的节点和值
+            return self({"writes": dict(period["writes"])})
+        return self(period.get("cpu_freq"), period.get("gpu_freq"))
+
+
+def load_config(module_name):
+    """导入频率配置模块（需要定义 APPS 和 APP_FREQ_CONFIGS）"""
+    module = importlib.import_module(module_name)
+    return module.APPS, module.APP_FREQ_CONFIGS
+
+
+async def _replay(records, realtime, backend, early_triggers):
+    """
+    在事件循环中逐条送入事件，写入在每个事件之后执行，命令的 event_index 是确定的
+
+    快速回放不使用计时器：冷启动的cmdline重试按录制时间排队，在录制时间晚于到期时间的下一条事件之前执行，
+    其命令的 event_index 为之前最后一条事件行
+    """
+    # 录制时的pid解析结果代替 /proc
+    cmdlines = {}
+    sm = analyzer.StateMachine(actuator=analyzer.ActuationQueue(inline=True), schedule_periods=realtime,
+                               early_triggers=early_triggers)
+    sm.pids._read = lambda pid: analyzer.PidCache.entry_from_cmdline(cmdlines.get(pid))
+
+    loop = asyncio.get_running_loop()
+    lines = 0
+    last_index = 0
+    first_ns = next((ns for ns, _, _ in records if ns is not None), None)
+    start = time.perf_counter()
+    try:
+        for index, (ns, kind, payload) in enumerate(records):
+            if realtime and ns is not None:
+                delay = (ns - first_ns) / 1e9 - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if kind == "P":
+                pid, cmdline = payload
+                cmdlines[pid] = cmdline
+                continue
+            # 录制时pid在处理事件行的过程中解析，P记录写在对应的L记录之后，需要先应用
+            for _, next_kind, next_payload in records[index + 1:index + 1 + PID_LOOKAHEAD]:
+                if next_kind != "P":
+                    break
+                cmdlines[next_payload[0]] = next_payload[1]
+            if not realtime and ns is not None:
+                backend.event_index = last_index
+                sm.run_due_retries(ns)
+                if sm.actuator.pending:
+                    await sm.actuator.join()
+            backend.event_index = index
+            last_index = index
+            lines += 1
+            sm.process(payload)
+            if sm.actuator.pending:
+                await sm.actuator.join()
+        elapsed = time.perf_counter() - start
+        if not realtime:
+            backend.event_index = last_index
+            sm.run_due_retries()
+
+        # 等待冷启动的cmdline重试计时器；实时回放时等待最后一个控制器的时间段结束
+        while sm.pending_cold_starts:
+            await asyncio.sleep(analyzer.CMDLINE_RETRY_S)
+        await sm.actuator.join()
+        if realtime and sm.freq_controller and sm.freq_controller.done:
+            await sm.freq_controller.done
+        # 没有等到确认的推测提升记为误报
+        sm.expire_speculation()
+        await sm.actuator.join()
+    finally:
+        if sm.freq_controller:
+            sm.freq_controller.stop()
+    return lines, elapsed, [s.to_dict() for s in sm.speculations]
+
+
+def replay(records, realtime=False, config=None, latency_ms=0.0, early_triggers=analyzer.EARLY_TRIGGERS):
+    """
+    回放一次事件流
+
+    快速回放时不设置时间段切换的计时器（时间段切换依赖真实时间），只记录启动时的决策和初始频率；
+    --realtime 按录制的时间间隔回放，时间段切换也会被记录。
+
+    Args:
+        records: load_stream() 的结果
+        realtime: 是否按录制时间回放
+        config: (APPS, APP_FREQ_CONFIGS)，None使用 freq_config.py
+        latency_ms: 模拟的写入耗时
+        early_triggers: 启用的推测提升触发来源
+
+    Returns:
+        dict: {'lines', 'events', 'elapsed_s', 'lines_per_s', 'commands', 'speculations'}
+    """
+    saved = (analyzer.PLAN_TABLE, analyzer.apply_plan_period,
+             analyzer.LATENCY_RECORDER, analyzer.STREAM_RECORDER)
+    backend = FakeFrequencyBackend(latency_ms)
+    if config is not None:
+        # 离线回放不按设备的可用频率校验
+        analyzer.PLAN_TABLE, _ = analyzer.PlanTable.build(*config)
+    analyzer.apply_plan_period = backend.apply_period
+    analyzer.LATENCY_RECORDER = None
+    analyzer.STREAM_RECORDER = None
+    try:
+        lines, elapsed, speculations = asyncio.run(_replay(records, realtime, backend, early_triggers))
+    finally:
+        (analyzer.PLAN_TABLE, analyzer.apply_plan_period,
+         analyzer.LATENCY_RECORDER, analyzer.STREAM_RECORDER) = saved
+
+    return {
+        'lines': lines,
+        'events': sum(1 for _, kind, payload in records if kind == "L" and analyzer.parse_event_line(payload.strip())),
+        'elapsed_s': elapsed,
+        'lines_per_s': lines / elapsed if elapsed > 0 else float("inf"),
+        'commands': backend.commands,
+        'speculations': speculations
+    }
+
+
+def print_speculation_report(speculations):
+    """
+    按触发来源统计推测提升：命中率、误报率，以及命中时比原来的触发提前的时间
+    """
+    if not speculations:
+        print("推测提升: 没有触发")
+        return
+    groups = {}
+    for s in speculations:
+        groups.setdefault(s["trigger"], []).append(s)
+    if len(groups) > 1:
+        groups["全部"] = list(speculations)
+
+    print(f"\n{'触发来源':<14} {'次数':>5} {'命中':>5} {'误报':>5} {'命中率':>7} {'误报率':>7} {'提前(中位数)':>12} {'提前(平均)':>10}")
+    for trigger, group in groups.items():
+        hits = [s for s in group if s["outcome"] == "hit"]
+        saved = sorted(s["saved_ms"] for s in hits)
+        median = f"{saved[len(saved) // 2]:.1f} ms" if saved else "-"
+        mean = f"{sum(saved) / len(saved):.1f} ms" if saved else "-"
+        misses = len(group) - len(hits)
+        print(f"{trigger:<14} {len(group):>5} {len(hits):>5} {misses:>5} {len(hits) / len(group):>7.0%} "
+              f"{misses / len(group):>7.0%} {median:>12} {mean:>10}")
+
+
+def _decisions(commands):
+    """用于比较的命令（去掉时间）"""
+    return [(c["event_index"], json.dumps(c["cpu"], sort_keys=True), json.dumps(c["gpu"])) for c in commands]
+
+
+def diff_commands(expected, actual):
+    """
+    Returns:
+        list: 不一致的描述，一致时为空
+    """
+    expected, actual = _decisions(expected), _decisions(actual)
+    diffs = []
+    for i in range(max(len(expected), len(actual))):
+        e = expected[i] if i < len(expected) else None
+        a = actual[i] if i < len(actual) else None
+        if e != a:
+            diffs.append(f"第 {i + 1} 条命令: 期望 {e}，实际 {a}")
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线回放事件流，记录控制器发出的频率命令')
+    parser.add_argument('stream', help='录制文件（live_analyzer_with_freq.py --record）或bpftrace原始输出')
+    parser.add_argument('--realtime', action='store_true', help='按录制时间回放（默认尽快回放）')
+    parser.add_argument('--config', action='append', default=None,
+                        help='频率配置模块名（默认 freq_config），可指定多次在相同输入上对比')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='模拟的频率写入耗时（毫秒）')
+    parser.add_argument('--output', default=None, help='把第一个配置的命令保存为JSON')
+    parser.add_argument('--expect', default=None, help='与保存的命令对比，不一致时返回码为1')
+    parser.add_argument('--early-triggers', default=",".join(analyzer.EARLY_TRIGGERS),
+                        help='推测提升的触发来源，逗号分隔，空字符串关闭（默认: 全部）')
+    args = parser.parse_args()
+
+    records = load_stream(args.stream)
+    print(f"事件流: {args.stream}（{len(records)} 条记录）", flush=True)
+
+    results = {}
+    for module_name in args.config or ["freq_config"]:
+        print(f"\n=== 配置: {module_name} ===", flush=True)
+        results[module_name] = replay(records, args.realtime, load_config(module_name), args.latency_ms,
+                                      [t for t in args.early_triggers.split(",") if t])
+        r = results[module_name]
+        print(f"回放 {r['lines']} 行（{r['events']} 个事件），耗时 {r['elapsed_s']:.3f}s，"
+              f"{r['lines_per_s']:,.0f} 行/秒，频率命令 {len(r['commands'])} 条", flush=True)
+        print_speculation_report(r['speculations'])
+
+    names = list(results)
+    baseline = results[names[0]]['commands']
+    for name in names[1:]:
+        diffs = diff_commands(baseline, results[name]['commands'])
+        print(f"\n{names[0]} vs {name}: {len(diffs)} 条命令不同")
+        for d in diffs[:20]:
+            print(f"  {d}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n命令已保存: {args.output}")
+
+    if args.expect:
+        with open(args.expect, encoding='utf-8') as f:
+            expected = json.load(f)
+        diffs = diff_commands(expected, baseline)
+        if diffs:
+            print(f"\n[FAIL] 与 {args.expect} 有 {len(diffs)} 条命令不同")
+            for d in diffs[:20]:
+                print(f"  {d}")
+            sys.exit(1)
+        print(f"\n[OK] 与 {args.expect} 一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+频率切换延迟测量
+让每个CPU policy和GPU在几个典型OPP之间切换（低→高、高→低、低→中…），测量从写入sysfs到频率生效的延迟：
+- sysfs: 写入后在设备端轮询 scaling_cur_freq（GPU为 cur_freq），直到读到目标频率
+- trace: 写入前向 trace_marker 写入标记，在perfetto trace中找标记之后第一个目标频率的
+         power/cpu_frequency（power/gpu_frequency）事件
+
+结果保存到设备拓扑缓存（DeviceTopology.actuation），时间段频率控制器据此提前切换频率
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+from experiments.device.topology import get_topology, save_topology
+from experiments.cold_start.frequency_plan import PLAN_SCRIPT_PRELUDE
+from experiments.cold_start.frequency_state import frequency_state
+
+try:
+    from perfetto.trace_processor import TraceProcessor, TraceProcessorConfig
+    _TRACE_PROCESSOR_AVAILABLE = True
+except ImportError:
+    _TRACE_PROCESSOR_AVAILABLE = False
+
+
+DEVICE_TRACE_PATH = "/data/misc/perfetto-traces/actuation.perfetto-trace"
+
+# 只抓频率事件和trace_marker，trace很小
+ACTUATION_TRACE_CONFIG = """\
+buffers {
+  size_kb: 16384
+  fill_policy: DISCARD
+}
+data_sources {
+  config {
+    name: "linux.ftrace"
+    ftrace_config {
+      ftrace_events: "power/cpu_frequency"
+      ftrace_events: "power/gpu_frequency"
+      ftrace_events: "ftrace/print"
+    }
+  }
+}
+duration_ms: 600000
+"""
+
+# step <序号> <标签> <目录> <起始频率> <目标频率> <当前频率文件>
+# 先把目标固定在起始频率并等待稳定，然后计时写入目标频率并轮询（read是shell内建命令，轮询不fork）
+# 输出：T <序号> <标签> <起始> <目标> <写入耗时ns> <生效耗时ns> <轮询次数> <最后读到的值>
+STEP_FUNCTION = """\
+M=/sys/kernel/tracing/trace_marker
+[ -w "$M" ] || M=/sys/kernel/debug/tracing/trace_marker
+step() {{
+  apply_range "$2" "$3" "$4" "$4" "$6" >/dev/null
+  sleep {settle_s}
+  echo "B|$$|actuate:$1" 2>/dev/null > "$M"
+  t0=$(date +%s%N)
+  if [ "$5" -gt "$4" ]; then
+    sysfs_write "$3/scaling_max_freq" "$5"; sysfs_write "$3/scaling_min_freq" "$5"
+  else
+    sysfs_write "$3/scaling_min_freq" "$5"; sysfs_write "$3/scaling_max_freq" "$5"
+  fi
+  t1=$(date +%s%N)
+  n=0; v=
+  while [ $n -lt {max_polls} ]; do
+    read -r v < "$3/$6"
+    [ "$v" = "$5" ] && break
+    n=$((n + 1))
+  done
+  t2=$(date +%s%N)
+  echo "E|$$" 2>/dev/null > "$M"
+  echo "T $1 $2 $4 $5 $((t1 - t0)) $((t2 - t0)) $n $v"
+}}
+"""
+
+TRACE_START = """\
+rm -f {trace_out}
+perfetto --txt -c - -o {trace_out} >/dev/null 2>&1 <<'ACTUATION_TRACE_CONFIG' &
+{config}ACTUATION_TRACE_CONFIG
+perfetto_pid=$!
+sleep 2
+"""
+
+TRACE_STOP = """\
+sleep 0.5
+kill -INT $perfetto_pid 2>/dev/null
+wait $perfetto_pid 2>/dev/null
+"""
+
+
+def actuation_targets(topology, only=None):
+    """
+    列出要测量的目标
+
+    Returns:
+        list: [(标签, sysfs目录, 可用频率列表, 当前频率文件名, trace中对应的CPU编号或None)]
+    """
+    targets = []
+    for policy_id in topology.policy_ids:
+        policy = topology.policies[policy_id]
+        if policy['available_freqs'] and policy['cpus']:
+            targets.append((f"policy{policy_id}", policy['path'], policy['available_freqs'],
+                            "scaling_cur_freq", policy['cpus'][0]))
+    if topology.gpu and topology.gpu['available_freqs']:
+        targets.append(("gpu", topology.gpu['path'], topology.gpu['available_freqs'], "cur_freq", None))
+    if only:
+        targets = [t for t in targets if t[0] in only]
+    return targets
+
+
+def opp_transitions(freqs):
+    """典型OPP切换：低→高、高→低、低→中、中→高、高→中（去掉重复和起止相同的切换）"""
+    freqs = sorted(freqs)
+    low, mid, high = freqs[0], freqs[len(freqs) // 2], freqs[-1]
+    transitions = []
+    for pair in ((low, high), (high, low), (low, mid), (mid, high), (high, mid)):
+        if pair[0] != pair[1] and pair not in transitions:
+            transitions.append(pair)
+    return transitions
+
+
+def build_actuation_script(steps, settle_s=0.3, max_polls=20000, with_trace=True):
+    """
+    编译测量脚本
+
+    Args:
+        steps: [(序号, 标签, 目录, 起始频率, 目标频率, 当前频率文件名)]
+        settle_s: 每次切换前在起始频率上的稳定时间（秒）
+        max_polls: 轮询次数上限（超过视为未生效）
+        with_trace: 是否同时录制perfetto trace
+    """
+    parts = [PLAN_SCRIPT_PRELUDE, STEP_FUNCTION.format(settle_s=settle_s, max_polls=max_polls)]
+    if with_trace:
+        parts.append(TRACE_START.format(trace_out=DEVICE_TRACE_PATH, config=ACTUATION_TRACE_CONFIG))
+    for seq, tag, path, from_freq, to_freq, cur_file in steps:
+        parts.append(f"step {seq} {tag} {path} {from_freq} {to_freq} {cur_file}\n")
+    if with_trace:
+        parts.append(TRACE_STOP)
+    parts.append("true\n")
+    return "".join(parts)
+
+
+def parse_actuation_output(output):
+    """
+    解析测量脚本输出
+
+    Returns:
+        dict: {序号: {tag, from, to, write_ms, sysfs_ms, polls, reached}}，未生效时 sysfs_ms 为None
+    """
+    results = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) < 8 or parts[0] != "T":
+            continue
+        try:
+            seq = int(parts[1])
+            to_freq = int(parts[4])
+            reached = len(parts) >= 9 and parts[8] == parts[4]
+            results[seq] = {
+                'tag': parts[2],
+                'from': int(parts[3]),
+                'to': to_freq,
+                'write_ms': int(parts[5]) / 1e6,
+                'sysfs_ms': int(parts[6]) / 1e6 if reached else None,
+                'polls': int(parts[7]),
+                'reached': reached
+            }
+        except ValueError:
+            continue
+    return results
+
+
+def _default_tp_bin_path():
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+    return os.path.join(project_root, "Perfetto", "configPerfetto", "trace_processor_shell.exe")
+
+
+def measure_trace_latency(trace_path, results, cpu_of_tag, tp_bin_path=None, window_ns=1000000000):
+    """
+    从trace中计算每次切换的生效延迟，写入 results[序号]['trace_ms']
+
+    Args:
+        trace_path: 本地trace文件
+        results: parse_actuation_output() 的结果
+        cpu_of_tag: {标签: trace中对应的CPU编号}，GPU为None
+        tp_bin_path: trace_processor可执行文件路径
+        window_ns: 标记之后查找频率事件的时间窗口
+    """
+    tp = TraceProcessor(trace=trace_path, config=TraceProcessorConfig(bin_path=tp_bin_path or _default_tp_bin_path()))
+    try:
+        markers = {}
+        for row in tp.query("SELECT ts, name FROM slice WHERE name LIKE 'actuate:%'"):
+            try:
+                markers[int(row.name.split(":", 1)[1])] = row.ts
+            except ValueError:
+                continue
+
+        cpu_events = {}
+        for row in tp.query("""
+            SELECT c.ts, c.value, cct.cpu
+            FROM counter c
+            JOIN cpu_counter_track cct ON c.track_id = cct.id
+            WHERE cct.name IN ('cpufreq', 'cpu_freq')
+            ORDER BY c.ts
+        """):
+            cpu_events.setdefault(row.cpu, []).append((row.ts, int(row.value)))
+        gpu_events = [(row.ts, int(row.value)) for row in tp.query("""
+            SELECT c.ts, c.value
+            FROM counter c
+            JOIN track t ON c.track_id = t.id
+            WHERE t.name = 'gpufreq'
+            ORDER BY c.ts
+        """)]
+    finally:
+        tp.close()
+
+    for seq, result in results.items():
+        marker_ts = markers.get(seq)
+        result['trace_ms'] = None
+        if marker_ts is None:
+            continue
+        cpu = cpu_of_tag.get(result['tag'])
+        events = gpu_events if cpu is None else cpu_events.get(cpu, [])
+        to_freq = result['to']
+        for ts, value in events:
+            if ts < marker_ts:
+                continue
+            if ts > marker_ts + window_ns:
+                break
+            # gpu_frequency 事件单位可能是KHz，sysfs中为Hz
+            if value == to_freq or value * 1000 == to_freq:
+                result['trace_ms'] = (ts - marker_ts) / 1e6
+                break
+
+
+def latency_distribution(values):
+    """
+    Returns:
+        dict: {count, missing, mean_ms, p50_ms, p90_ms, max_ms, samples_ms}，没有有效值时为None
+    """
+    valid = sorted(v for v in values if v is not None)
+    if not valid:
+        return None
+    return {
+        'count': len(valid),
+        'missing': len(values) - len(valid),
+        'mean_ms': sum(valid) / len(valid),
+        'p50_ms': valid[len(valid) // 2],
+        'p90_ms': valid[min(len(valid) - 1, int(len(valid) * 0.9))],
+        'max_ms': valid[-1],
+        'samples_ms': valid
+    }
+
+
+def measure_actuation_latency(device=None, repeats=5, settle_s=0.3, with_trace=True,
+                              only=None, output_dir=None, tp_bin_path=None, save_profile=True):
+    """
+    测量所有目标的频率切换延迟
+
+    测量过程在 frequency_state() 中执行，结束后恢复原有的调度器和频率设置
+
+    Args:
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        repeats: 每种切换的重复次数
+        settle_s: 每次切换前的稳定时间（秒）
+        with_trace: 是否同时用perfetto测量（需要perfetto Python包和trace_processor）
+        only: 只测量这些标签（如 ["policy0", "gpu"]），None为全部
+        output_dir: 原始结果和trace的保存目录
+        tp_bin_path: trace_processor可执行文件路径
+        save_profile: 是否写入设备拓扑缓存
+
+    Returns:
+        dict: {measured_at, settle_s, repeats, targets: {标签: {write_ms, sysfs_ms, trace_ms}}}
+    """
+    device = resolve_device(device)
+    topology = get_topology(device)
+    targets = actuation_targets(topology, only)
+    if not targets:
+        print("❌ 没有可测量的频率目标")
+        return None
+    if with_trace and not _TRACE_PROCESSOR_AVAILABLE:
+        print("⚠️  未安装perfetto Python包，只使用sysfs轮询测量")
+        with_trace = False
+
+    steps = []
+    for _ in range(repeats):
+        for tag, path, freqs, cur_file, _ in targets:
+            for from_freq, to_freq in opp_transitions(freqs):
+                steps.append((len(steps), tag, path, from_freq, to_freq, cur_file))
+    timeout_s = len(steps) * (settle_s + 1.0) + 30
+    print(f"⏱️  测量 {len(targets)} 个目标、共 {len(steps)} 次频率切换（预计 {len(steps) * (settle_s + 0.1):.0f} 秒）...")
+
+    script = build_actuation_script(steps, settle_s=settle_s, with_trace=with_trace)
+    with frequency_state(device):
+        output = device.run_script(script, need_root=True, timeout_s=timeout_s)
+    results = parse_actuation_output(output)
+    if not results:
+        print("❌ 测量脚本没有输出结果")
+        return None
+
+    if output_dir is None:
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+        output_dir = os.path.join(project_root, "Perfetto", "trace", "traceAnalysis", "results", "actuation")
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    if with_trace:
+        local_trace = os.path.join(output_dir, f"actuation_{device.label}_{timestamp}.perfetto-trace")
+        try:
+            device.pull(DEVICE_TRACE_PATH, local_trace)
+            device.shell(f"rm -f {DEVICE_TRACE_PATH}", need_root=True)
+            measure_trace_latency(local_trace, results, {t[0]: t[4] for t in targets}, tp_bin_path)
+        except Exception as e:
+            print(f"⚠️  trace分析失败，只使用sysfs轮询结果: {e}")
+
+    summary = {
+        'measured_at': datetime.now().isoformat(timespec='seconds'),
+        'settle_s': settle_s,
+        'repeats': repeats,
+        'targets': {}
+    }
+    for tag, _, _, _, _ in targets:
+        rows = [r for r in results.values() if r['tag'] == tag]
+        summary['targets'][tag] = {
+            'write_ms': latency_distribution([r['write_ms'] for r in rows]),
+            'sysfs_ms': latency_distribution([r['sysfs_ms'] for r in rows]),
+            'trace_ms': latency_distribution([r.get('trace_ms') for r in rows])
+        }
+
+    with open(os.path.join(output_dir, f"actuation_{device.label}_{timestamp}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'summary': summary, 'transitions': list(results.values())}, f, ensure_ascii=False, indent=2)
+
+    if save_profile:
+        topology.actuation = summary
+        save_topology(topology, device)
+        print("💾 已写入设备拓扑缓存")
+
+    print_actuation_summary(summary)
+    return summary
+
+
+def print_actuation_summary(summary):
+    """打印每个目标的延迟分布"""
+    print(f"\n{'目标':<10} {'方式':<8} {'P50':>9} {'P90':>9} {'最大':>9} {'未生效':>6}")
+    for tag, methods in summary['targets'].items():
+        for method, label in (('write_ms', '写入'), ('sysfs_ms', 'sysfs'), ('trace_ms', 'trace')):
+            dist = methods.get(method)
+            if not dist:
+                continue
+            print(f"{tag:<10} {label:<8} {dist['p50_ms']:>7.2f}ms {dist['p90_ms']:>7.2f}ms "
+                  f"{dist['max_ms']:>7.2f}ms {dist['missing']:>6}")
+
+
+def get_switch_lead_s(device=None, percentile='p90_ms'):
+    """
+    根据设备拓扑缓存中的测量结果，返回频率切换应提前的时间（秒）
+
+    取所有目标中最大的生效延迟（优先使用trace测量值，没有时使用sysfs轮询值）；
+    未测量过时返回0
+
+    Args:
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        percentile: 使用的分位数（'p50_ms' / 'p90_ms' / 'max_ms'）
+    """
+    try:
+        actuation = get_topology(device).actuation
+    except AdbError:
+        return 0.0
+    if not actuation:
+        return 0.0
+    lead_ms = 0.0
+    for methods in actuation.get('targets', {}).values():
+        dist = methods.get('trace_ms') or methods.get('sysfs_ms')
+        if dist:
+            lead_ms = max(lead_ms, dist[percentile])
+    return lead_ms / 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量CPU/GPU频率切换延迟并写入设备拓扑缓存')
+    parser.add_argument('--repeats', type=int, default=5, help='每种切换的重复次数（默认: 5）')
+    parser.add_argument('--settle', type=float, default=0.3, help='每次切换前的稳定时间，秒（默认: 0.3）')
+    parser.add_argument('--targets', nargs='+', default=None, help='只测量指定目标，如 policy0 gpu')
+    parser.add_argument('--no-trace', action='store_true', help='不录制perfetto trace，只用sysfs轮询')
+    parser.add_argument('--no-save', action='store_true', help='不写入设备拓扑缓存')
+    parser.add_argument('--output-dir', default=None, help='原始结果和trace的保存目录')
+    parser.add_argument('--tp-bin', default=None, help='trace_processor可执行文件路径')
+    parser.add_argument('--serial', default=None, help='目标设备序列号（默认: adb默认设备）')
+    args = parser.parse_args()
+
+    start = time.time()
+    summary = measure_actuation_latency(
+        device=args.serial,
+        repeats=args.repeats,
+        settle_s=args.settle,
+        with_trace=not args.no_trace,
+        only=args.targets,
+        output_dir=args.output_dir,
+        tp_bin_path=args.tp_bin,
+        save_profile=not args.no_save
+    )
+    if summary is None:
+        sys.exit(1)
+    print(f"\n✅ 测量完成，用时 {time.time() - start:.0f} 秒")
+
+
+if __name__ == "__main__":
+    main()
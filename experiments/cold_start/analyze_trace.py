@@ -11,19 +11,23 @@ import pandas as pd
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from Perfetto.trace.traceAnalysis.extract_trace_time import ns_to_cst
-from experiments.cold_start.frequency_manager import get_available_cpu_frequencies, get_available_gpu_frequencies
+from experiments.cold_start.frequency_manager import (
+    get_available_cpu_frequencies, get_available_gpu_frequencies, get_available_devfreq_frequencies
+)
 
 
 class ColdStartAnalyzer:
-    def __init__(self, trace_path, tp_bin_path=None):
+    def __init__(self, trace_path, tp_bin_path=None, device=None):
         """
         初始化分析器
         
         Args:
             trace_path: trace文件路径
             tp_bin_path: trace_processor可执行文件路径
+            device: 采集trace的设备（用于查询可用频率表），None为adb默认设备
         """
         self.trace_path = trace_path
+        self.device = device
         if not os.path.exists(trace_path):
             raise FileNotFoundError(f"Trace文件不存在: {trace_path}")
         
@@ -236,6 +240,47 @@ class ColdStartAnalyzer:
             traceback.print_exc()
             return pd.DataFrame()
     
+    def get_devfreq_frequency_data(self, start_time_ns, end_time_ns):
+        """
+        从trace中查询devfreq域（DDR、总线、缓存等）的频率数据
+        
+        来自 HardwareInfo.pbtx 中的 devfreq/* ftrace事件（devfreq_frequency），
+        trace processor不会把它转换为counter，直接从原始ftrace事件表读取参数
+        """
+        # 新版trace processor的表名为ftrace_event，旧版为raw
+        for table in ('ftrace_event', 'raw'):
+            try:
+                query = f"""
+                SELECT 
+                    ts,
+                    EXTRACT_ARG(arg_set_id, 'args.dev_name') as dev_name,
+                    EXTRACT_ARG(arg_set_id, 'args.freq') as frequency,
+                    EXTRACT_ARG(arg_set_id, 'args.prev_freq') as prev_frequency
+                FROM {table}
+                WHERE name = 'devfreq_frequency'
+                AND ts >= {start_time_ns}
+                AND ts <= {end_time_ns}
+                ORDER BY ts ASC
+                """
+                result = self.tp.query(query)
+                data = []
+                for row in result:
+                    data.append({
+                        'timestamp_ns': row.ts,
+                        'domain': row.dev_name,
+                        'frequency': row.frequency if row.frequency else 0,
+                        'prev_frequency': row.prev_frequency
+                    })
+                if len(data) > 0:
+                    domains = sorted(set(d['domain'] for d in data if d['domain']))
+                    print(f"   ✅ 使用 {table}.devfreq_frequency, {len(data)}条（{len(domains)}个域: {', '.join(domains)}）")
+                    return pd.DataFrame(data)
+            except Exception:
+                continue
+        
+        print("   ⚠️  未找到devfreq频率数据")
+        return pd.DataFrame()
+    
     def get_power_data(self, start_time_ns, end_time_ns):
         """从trace中查询功耗数据"""
         data = []
@@ -505,6 +550,15 @@ class ColdStartAnalyzer:
         else:
             print("⚠️  未获取到GPU频率数据")
         
+        # 5.1 获取devfreq域（DDR、总线、缓存等）频率数据
+        print("📈 提取devfreq频率数据...")
+        devfreq_df = self.get_devfreq_frequency_data(gpu_query_start, gpu_query_end)
+        if not devfreq_df.empty:
+            devfreq_df['time_relative_s'] = (devfreq_df['timestamp_ns'] - app_start_ns_orig) / 1e9
+            print(f"✅ 获取到 {len(devfreq_df)} 条devfreq频率数据")
+        else:
+            print("⚠️  未获取到devfreq频率数据")
+        
         # 6. 获取功耗数据（扩展查询范围：前后各30%的启动时长）
         print("📈 提取功耗数据...")
         power_query_start = app_start_ns_orig - duration_extend_ns
@@ -547,7 +601,7 @@ class ColdStartAnalyzer:
         cpu_available_freqs = {}  # {cpu_id: {'min': min_freq, 'max': max_freq}}
         if not cpu_freq_df.empty and 'cpu' in cpu_freq_df.columns:
             for cpu_id in cpu_freq_df['cpu'].unique():
-                freqs = get_available_cpu_frequencies(int(cpu_id))
+                freqs = get_available_cpu_frequencies(int(cpu_id), self.device)
                 if freqs:
                     # 保持原始单位，不转换
                     cpu_available_freqs[int(cpu_id)] = {
@@ -556,7 +610,7 @@ class ColdStartAnalyzer:
                     }
         
         gpu_available_freqs = None  # {'min': min_freq, 'max': max_freq}
-        gpu_freqs = get_available_gpu_frequencies()
+        gpu_freqs = get_available_gpu_frequencies(self.device)
         if gpu_freqs:
             # 保持原始单位，不转换
             gpu_available_freqs = {
@@ -564,6 +618,16 @@ class ColdStartAnalyzer:
                 'max': max(gpu_freqs)
             }
         
+        devfreq_available_freqs = {}  # {域名: {'min': min_freq, 'max': max_freq}}
+        if not devfreq_df.empty:
+            for domain in devfreq_df['domain'].dropna().unique():
+                freqs = get_available_devfreq_frequencies(domain, self.device)
+                if freqs:
+                    devfreq_available_freqs[domain] = {
+                        'min': min(freqs),
+                        'max': max(freqs)
+                    }
+        
         # 计算启动区间内的功耗统计（平均、最大、最小、总功耗）
         start_window_end_s = cold_start_duration_ns / 1e9  # 启动时长（秒）
         
@@ -643,6 +707,7 @@ class ColdStartAnalyzer:
         start_window_end_s = cold_start_duration_ns / 1e9
         cpu_freq_startup_stats = {}  # {cpu_id: {'avg': ..., 'max': ..., 'min': ...}}
         gpu_freq_startup_stats = None  # {'avg': ..., 'max': ..., 'min': ...}
+        devfreq_startup_stats = {}  # {域名: {'avg': ..., 'max': ..., 'min': ...}}
         
         if not cpu_freq_df.empty:
             # 筛选启动区间内的CPU频率数据
@@ -672,6 +737,20 @@ class ColdStartAnalyzer:
                     'min': startup_gpu_freq_df['frequency'].min()
                 }
         
+        if not devfreq_df.empty:
+            # 筛选启动区间内的devfreq频率数据（按域统计）
+            startup_devfreq_df = devfreq_df[
+                (devfreq_df['time_relative_s'] >= 0) & 
+                (devfreq_df['time_relative_s'] <= start_window_end_s)
+            ]
+            for domain in startup_devfreq_df['domain'].dropna().unique():
+                domain_data = startup_devfreq_df[startup_devfreq_df['domain'] == domain]
+                devfreq_startup_stats[domain] = {
+                    'avg': domain_data['frequency'].mean(),
+                    'max': domain_data['frequency'].max(),
+                    'min': domain_data['frequency'].min()
+                }
+        
         # 汇总结果（使用转换后的真实时间戳）
         results = {
             'cold_start_duration_ms': cold_start_duration_ms,
@@ -680,6 +759,7 @@ class ColdStartAnalyzer:
             'app_drawn_time_ns': app_drawn_ns_real,
             'cpu_frequency': cpu_freq_df,
             'gpu_frequency': gpu_freq_df,
+            'devfreq_frequency': devfreq_df,
             'power': power_df,
             'cpu_scheduling': cpu_sched_df,
             'cpu_utilization': cpu_util_df,
@@ -698,10 +778,12 @@ class ColdStartAnalyzer:
             # 启动区间内的频率统计
             'cpu_freq_startup_stats': cpu_freq_startup_stats,  # CPU频率统计（启动区间内）
             'gpu_freq_startup_stats': gpu_freq_startup_stats,  # GPU频率统计（启动区间内）
+            'devfreq_startup_stats': devfreq_startup_stats,  # devfreq频率统计（启动区间内，按域）
             'start_window_start_s': -duration_extend_ns / 1e9,  # 启动区间开始（相对时间）
             'start_window_end_s': cold_start_duration_ns / 1e9,  # 启动区间结束（相对时间，即启动时长）
             'cpu_available_frequencies': cpu_available_freqs,  # CPU可用频率范围
-            'gpu_available_frequencies': gpu_available_freqs   # GPU可用频率范围
+            'gpu_available_frequencies': gpu_available_freqs,  # GPU可用频率范围
+            'devfreq_available_frequencies': devfreq_available_freqs  # devfreq可用频率范围
         }
         
         return results
@@ -711,7 +793,7 @@ class ColdStartAnalyzer:
         self.tp.close()
 
 
-def analyze_cold_start_trace(trace_path, package_name, output_dir=None):
+def analyze_cold_start_trace(trace_path, package_name, output_dir=None, device=None):
     """
     分析冷启动trace的主函数
     
@@ -719,11 +801,12 @@ def analyze_cold_start_trace(trace_path, package_name, output_dir=None):
         trace_path: trace文件路径
         package_name: 应用包名
         output_dir: 输出目录(可选)
+        device: 采集trace的设备(可选，多设备并行时必须指定)
     
     Returns:
         分析结果字典
     """
-    analyzer = ColdStartAnalyzer(trace_path)
+    analyzer = ColdStartAnalyzer(trace_path, device=device)
     try:
         results = analyzer.analyze(package_name)
         if results:
@@ -740,6 +823,11 @@ def analyze_cold_start_trace(trace_path, package_name, output_dir=None):
                         os.path.join(output_dir, 'gpu_frequency.csv'), 
                         index=False
                     )
+                if not results['devfreq_frequency'].empty:
+                    results['devfreq_frequency'].to_csv(
+                        os.path.join(output_dir, 'devfreq_frequency.csv'), 
+                        index=False
+                    )
                 if not results['power'].empty:
                     results['power'].to_csv(
                         os.path.join(output_dir, 'power.csv'), 
@@ -768,10 +856,11 @@ if __name__ == "__main__":
     parser.add_argument('trace_path', help='Trace文件路径')
     parser.add_argument('package_name', help='应用包名')
     parser.add_argument('--output-dir', help='输出目录')
+    parser.add_argument('--serial', help='采集trace的设备序列号（多台设备连接时必须指定）')
     
     args = parser.parse_args()
     
-    results = analyze_cold_start_trace(args.trace_path, args.package_name, args.output_dir)
+    results = analyze_cold_start_trace(args.trace_path, args.package_name, args.output_dir, args.serial)
     
     if results:
         print("\n" + "=" * 60)
@@ -780,4 +869,5 @@ if __name__ == "__main__":
         print(f"冷启动时长: {results['cold_start_duration_ms']:.2f} ms")
         print(f"CPU频率数据点: {len(results['cpu_frequency'])}")
         print(f"GPU频率数据点: {len(results['gpu_frequency'])}")
+        print(f"devfreq频率数据点: {len(results['devfreq_frequency'])}")
         print(f"功耗数据点: {len(results['power'])}")
@@ -5,13 +5,15 @@
 import os
 import sys
 import json
-import time
 from datetime import datetime
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from experiments.cold_start.run_experiment import run_cold_start_experiment
 from experiments.cold_start.analyze_trace import analyze_cold_start_trace
+from experiments.cold_start.parallel_runner import run_sharded, resolve_parallel_devices
+from experiments.cold_start.thermal_pacing import ThermalPacer
+from experiments.device import resolve_device
 
 
 # ============================================================================
@@ -77,6 +79,9 @@ APPS = {
 #         {"start": 0.2, "end": 0.4, "cpu_freq": {"0": 1500000, "4": 2000000}, "gpu_freq": 521000}
 #     ]}
 #     说明: start/end是相对于App启动时间的秒数，eBPF程序会自动根据时间段切换频率
+#     时间段中还可以用 "devfreq" 设置DDR/总线/缓存等devfreq域，例如 "devfreq": {"ddr": 3172000}
+#     （键为域名、类型或域名片段，见 experiments/device/topology.py；eBPF程序加载配置时解析域名并按可用频率校验，
+#      时间段中的其他字段会被拒绝）
 #
 # GPU频率设置（Hz单位）：
 #   - 单个数值（固定频率）: 850000 (表示850 MHz)
@@ -308,13 +313,64 @@ APP_FREQ_CONFIGS = {
 # ============================================================================
 
 
+def print_batch_summary(results, total, analyze=True):
+    """
+    打印批量测试总结（启动时长与功耗统计）
+    
+    Args:
+        results: batch_test_apps 返回的结果字典
+        total: 测试App总数
+        analyze: 是否包含分析结果
+    """
+    print("\n" + "=" * 80)
+    print("📊 测试总结")
+    print("=" * 80)
+    
+    successful_apps = [name for name, result in results.items() if result.get('status') == 'success']
+    failed_apps = [name for name, result in results.items() if result.get('status') != 'success']
+    print(f"✅ 成功: {len(successful_apps)}/{total}")
+    if failed_apps:
+        print(f"❌ 失败: {len(failed_apps)}/{total}")
+        print(f"   失败App: {', '.join(failed_apps)}")
+    
+    if analyze:
+        print("\n📈 启动时长统计:")
+        for app_name in successful_apps:
+            duration_ms = results[app_name].get('cold_start_duration_ms')
+            if duration_ms:
+                throttled = " ⚠️ 开始时处于限频状态" if results[app_name].get('throttled_at_start') else ""
+                print(f"   {app_name}: {duration_ms:.2f} ms{throttled}")
+        
+        print("\n⚡ 功耗统计（启动区间）:")
+        for app_name in successful_apps:
+            total_power_j = results[app_name].get('total_power_consumption_j')
+            avg_power_mw = results[app_name].get('avg_power_mw')
+            avg_current_ma = results[app_name].get('avg_current_ma')
+            
+            info_parts = []
+            if total_power_j is not None:
+                info_parts.append(f"总功耗: {total_power_j:.3f} J")
+            if avg_power_mw is not None:
+                info_parts.append(f"平均功率: {avg_power_mw:.1f} mW")
+            if avg_current_ma is not None:
+                info_parts.append(f"平均电流: {avg_current_ma:.1f} mA")
+            
+            if info_parts:
+                print(f"   {app_name}: {', '.join(info_parts)}")
+            else:
+                print(f"   {app_name}: 无功耗数据")
+
+
 def batch_test_apps(apps=None, 
                    experiment_name="BatchTest",
                    trace_duration=30,
                    config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
                    max_frequency=False,  # 是否使用最大频率模式（覆盖所有App的个性化配置）
                    analyze=True,
-                   output_dir=None):
+                   output_dir=None,
+                   device=None,
+                   thermal_threshold_c=45.0,
+                   max_pacing_wait_s=180.0):
     """
     批量测试多个App的冷启动时长
     
@@ -326,12 +382,18 @@ def batch_test_apps(apps=None,
         max_frequency: 是否设置CPU/GPU到最大频率（True时会覆盖所有App的个性化配置）
         analyze: 是否自动分析trace文件
         output_dir: 输出目录
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        thermal_threshold_c: 开始每次启动前要求的最高温度（摄氏度），替代固定的测试间隔
+        max_pacing_wait_s: 等待降温的最长时间（秒）
     
     Returns:
         dict: 测试结果，包含每个App的启动时长等信息
+              每个App的结果中包含开始温度 start_temp_c 和是否在限频状态下开始 throttled_at_start
     """
     if apps is None:
         apps = APPS
+    device = resolve_device(device)
+    pacer = ThermalPacer(device, threshold_c=thermal_threshold_c, max_wait_s=max_pacing_wait_s)
     
     print("=" * 80)
     print("📱 批量测试App冷启动时长")
@@ -371,6 +433,7 @@ def batch_test_apps(apps=None,
         print(f"[{idx}/{len(apps)}] 测试: {app_name} ({package_name})")
         print("=" * 80)
         
+        thermal_info = {}
         try:
             # 确定当前App的频率配置
             # 注意：现在频率设置通过eBPF程序实时控制，不通过ADB设置
@@ -395,6 +458,9 @@ def batch_test_apps(apps=None,
                 app_cpu_settings = None
                 app_gpu_setting = None
             
+            # 等待设备降温（替代固定的测试间隔），并记录开始时的温度
+            thermal_info = pacer.wait_until_cool()
+            
             # 运行实验
             # 注意：set_custom_frequencies() 现在不通过ADB设置频率，而是依赖eBPF程序
             # 确保eBPF程序已在手机端运行（通过 run_with_freq 脚本）
@@ -405,7 +471,8 @@ def batch_test_apps(apps=None,
                 config_file=config_file,
                 max_frequency=app_max_freq,
                 cpu_freq_settings=app_cpu_settings,
-                gpu_freq_setting=app_gpu_setting
+                gpu_freq_setting=app_gpu_setting,
+                device=device
             )
             
             if not trace_file:
@@ -414,7 +481,8 @@ def batch_test_apps(apps=None,
                 results[app_name] = {
                     'package_name': package_name,
                     'status': 'failed',
-                    'error': '无法获取trace文件'
+                    'error': '无法获取trace文件',
+                    **thermal_info
                 }
                 continue
             
@@ -429,7 +497,8 @@ def batch_test_apps(apps=None,
                     analysis_results = analyze_cold_start_trace(
                         trace_path=trace_file,
                         package_name=package_name,
-                        output_dir=app_output_dir
+                        output_dir=app_output_dir,
+                        device=device
                     )
                     
                     if analysis_results:
@@ -478,10 +547,7 @@ def batch_test_apps(apps=None,
                     'trace_file': trace_file
                 }
             
-            # 测试间隔，避免设备过热
-            if idx < len(apps):
-                print(f"\n⏳ 等待5秒后继续下一个测试...")
-                time.sleep(5)
+            results[app_name].update(thermal_info)
                 
         except Exception as e:
             print(f"❌ {app_name}: 测试失败 - {e}")
@@ -489,45 +555,16 @@ def batch_test_apps(apps=None,
             results[app_name] = {
                 'package_name': package_name,
                 'status': 'failed',
-                'error': str(e)
+                'error': str(e),
+                **thermal_info
             }
     
-    # 打印总结
-    print("\n" + "=" * 80)
-    print("📊 测试总结")
-    print("=" * 80)
-    
-    successful_apps = [name for name, result in results.items() if result.get('status') == 'success']
-    print(f"✅ 成功: {len(successful_apps)}/{len(apps)}")
-    if failed_apps:
-        print(f"❌ 失败: {len(failed_apps)}/{len(apps)}")
-        print(f"   失败App: {', '.join(failed_apps)}")
+    if device.serial:
+        for result in results.values():
+            result['device'] = device.serial
     
-    if analyze:
-        print("\n📈 启动时长统计:")
-        for app_name in successful_apps:
-            duration_ms = results[app_name].get('cold_start_duration_ms')
-            if duration_ms:
-                print(f"   {app_name}: {duration_ms:.2f} ms")
-        
-        print("\n⚡ 功耗统计（启动区间）:")
-        for app_name in successful_apps:
-            total_power_j = results[app_name].get('total_power_consumption_j')
-            avg_power_mw = results[app_name].get('avg_power_mw')
-            avg_current_ma = results[app_name].get('avg_current_ma')
-            
-            info_parts = []
-            if total_power_j is not None:
-                info_parts.append(f"总功耗: {total_power_j:.3f} J")
-            if avg_power_mw is not None:
-                info_parts.append(f"平均功率: {avg_power_mw:.1f} mW")
-            if avg_current_ma is not None:
-                info_parts.append(f"平均电流: {avg_current_ma:.1f} mA")
-            
-            if info_parts:
-                print(f"   {app_name}: {', '.join(info_parts)}")
-            else:
-                print(f"   {app_name}: 无功耗数据")
+    # 打印总结
+    print_batch_summary(results, len(apps), analyze)
     
     # 保存结果到JSON文件
     if output_dir:
@@ -550,6 +587,7 @@ def batch_test_apps(apps=None,
                 'timestamp': timestamp,
                 'frequency_mode': '最大频率' if max_frequency else '个性化配置',
                 'max_frequency': max_frequency,
+                'device': device.serial,
                 'results': save_results
             }, f, indent=2, ensure_ascii=False)
         
@@ -558,6 +596,98 @@ def batch_test_apps(apps=None,
     return results
 
 
+def batch_test_apps_parallel(devices,
+                            apps=None,
+                            experiment_name="BatchTest",
+                            trace_duration=30,
+                            config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
+                            max_frequency=False,
+                            analyze=True,
+                            output_dir=None,
+                            thermal_threshold_c=45.0,
+                            max_pacing_wait_s=180.0):
+    """
+    在多台同型号设备上并行批量测试
+    
+    App列表按轮转方式分片到各设备，每台设备的结果保存在 {output_dir}/{设备序列号}/ 下，
+    全部完成后合并为一份总结果
+    
+    Args:
+        devices: Device列表
+        其余参数同 batch_test_apps
+    
+    Returns:
+        dict: 合并后的测试结果，每个App的结果中包含 device 字段
+    """
+    if apps is None:
+        apps = APPS
+    
+    print("=" * 80)
+    print(f"📱 多设备并行批量测试（{len(devices)} 台设备）")
+    print("=" * 80)
+    
+    def _worker(device, shard):
+        device_output_dir = os.path.join(output_dir, device.label) if output_dir else None
+        return batch_test_apps(
+            apps=shard,
+            experiment_name=experiment_name,
+            trace_duration=trace_duration,
+            config_file=config_file,
+            max_frequency=max_frequency,
+            analyze=analyze,
+            output_dir=device_output_dir,
+            device=device,
+            thermal_threshold_c=thermal_threshold_c,
+            max_pacing_wait_s=max_pacing_wait_s
+        )
+    
+    device_results = run_sharded(devices, apps, _worker)
+    
+    # 合并各设备结果
+    results = {}
+    for device, shard_results in device_results.items():
+        if shard_results is None:
+            continue
+        results.update(shard_results)
+    # 整个分片失败的设备，其App记为失败
+    for app_name, package_name in apps.items():
+        if app_name not in results:
+            results[app_name] = {
+                'package_name': package_name,
+                'status': 'failed',
+                'error': '设备执行失败'
+            }
+    
+    print("\n" + "=" * 80)
+    print("📊 合并结果")
+    print_batch_summary(results, len(apps), analyze)
+    
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        results_file = os.path.join(output_dir, f"batch_test_results_merged_{timestamp}.json")
+        save_results = {}
+        for app_name, result in results.items():
+            save_result = result.copy()
+            if 'trace_file' in save_result:
+                save_result['trace_file'] = str(save_result['trace_file'])
+            save_results[app_name] = save_result
+        
+        with open(results_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'experiment_name': experiment_name,
+                'timestamp': timestamp,
+                'frequency_mode': '最大频率' if max_frequency else '个性化配置',
+                'max_frequency': max_frequency,
+                'devices': [d.serial for d in devices],
+                'results': save_results
+            }, f, indent=2, ensure_ascii=False)
+        
+        print(f"\n💾 合并结果已保存到: {results_file}")
+    
+    return results
+
+
 if __name__ == "__main__":
     import argparse
     
@@ -582,6 +712,12 @@ if __name__ == "__main__":
                        help='设置所有App的CPU/GPU到最大频率（会覆盖个性化配置）')
     parser.add_argument('--no-analyze', action='store_true', help='不自动分析trace文件，只生成trace文件')
     parser.add_argument('--output-dir', help='输出目录（默认: Perfetto/trace/traceAnalysis/results/{experiment_name}）')
+    parser.add_argument('--devices', nargs='*', metavar='SERIAL',
+                       help='多设备并行测试：指定设备序列号列表；只写 --devices 不带参数则使用所有已连接设备')
+    parser.add_argument('--thermal-threshold', type=float, default=45.0,
+                       help='每次启动前等待设备降温到该温度以下（摄氏度，默认: 45）')
+    parser.add_argument('--max-pacing-wait', type=float, default=180.0,
+                       help='等待降温的最长时间（秒，默认: 180）')
     
     args = parser.parse_args()
     
@@ -608,15 +744,33 @@ if __name__ == "__main__":
     max_freq = args.max_frequency  # 是否使用最大频率模式
     
     # 运行批量测试
-    results = batch_test_apps(
-        apps=apps_to_test,
-        experiment_name=args.experiment_name,
-        trace_duration=args.duration,
-        config_file=args.config,
-        max_frequency=max_freq,
-        analyze=not args.no_analyze,
-        output_dir=args.output_dir
-    )
+    devices = resolve_parallel_devices(args.devices)
+    if devices and len(devices) > 1:
+        results = batch_test_apps_parallel(
+            devices,
+            apps=apps_to_test,
+            experiment_name=args.experiment_name,
+            trace_duration=args.duration,
+            config_file=args.config,
+            max_frequency=max_freq,
+            analyze=not args.no_analyze,
+            output_dir=args.output_dir,
+            thermal_threshold_c=args.thermal_threshold,
+            max_pacing_wait_s=args.max_pacing_wait
+        )
+    else:
+        results = batch_test_apps(
+            apps=apps_to_test,
+            experiment_name=args.experiment_name,
+            trace_duration=args.duration,
+            config_file=args.config,
+            max_frequency=max_freq,
+            analyze=not args.no_analyze,
+            output_dir=args.output_dir,
+            device=devices[0] if devices else None,
+            thermal_threshold_c=args.thermal_threshold,
+            max_pacing_wait_s=args.max_pacing_wait
+        )
     
     print("\n✅ 批量测试完成!")
 
@@ -0,0 +1,171 @@
+"""
+频率控制路径基准测试（离线）
+在模拟sysfs设备（见 experiments/device/fake_sysfs.py）上检查频率控制逻辑的正确性，
+并测量批量频率计划的吞吐量，不需要连接手机。也可以用 --serial 指定真机对比。
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import FakeDevice, FakeSysfsRules, resolve_device
+from experiments.device.fake_sysfs import FAKE_POLICIES, FAKE_DEVFREQ
+from experiments.device.topology import probe_topology
+from experiments.cold_start.frequency_plan import FrequencyPlan
+from experiments.cold_start.frequency_state import capture_frequency_state, restore_frequency_state
+from experiments.cold_start.control_backends import GovernorTuningBackend, UclampBoostBackend
+
+
+def _extreme_plan(topology, use_max):
+    """所有CPU policy、GPU和devfreq域都设置为最高（或最低）频率的计划"""
+    pick = max if use_max else min
+    cpu = {pid: pick(p['available_freqs']) for pid, p in topology.policies.items() if p['available_freqs']}
+    gpu = pick(topology.gpu['available_freqs']) if topology.gpu and topology.gpu['available_freqs'] else None
+    devfreq = {name: pick(d['available_freqs']) for name, d in topology.devfreq.items() if d['available_freqs']}
+    return FrequencyPlan(cpu, gpu, devfreq)
+
+
+def check_topology(device):
+    topology = probe_topology(device)
+    if isinstance(device, FakeDevice):
+        ok = (sorted(topology.policies) == sorted(FAKE_POLICIES) and topology.gpu is not None
+              and sorted(topology.devfreq) == sorted(FAKE_DEVFREQ))
+    else:
+        ok = bool(topology.policies)
+    return ok, f"{len(topology.policies)}个policy，GPU={'有' if topology.gpu else '无'}，{len(topology.devfreq)}个devfreq域"
+
+
+def check_range_ordering(device):
+    """升频、降频、区间交叉切换都不应被 min > max 规则拒绝"""
+    topology = probe_topology(device)
+    failures = []
+    for label, plan in (("最高频率", _extreme_plan(topology, True)),
+                        ("最低频率", _extreme_plan(topology, False)),
+                        ("最高频率", _extreme_plan(topology, True))):
+        result = plan.apply(device, verbose=False)
+        if not result['success']:
+            failures.append(label)
+    return not failures, "全部成功" if not failures else f"失败: {', '.join(failures)}"
+
+
+def check_rejection_reported(device):
+    """内核拒绝写入（非OPP频率）时计划必须报告失败"""
+    if not isinstance(device, FakeDevice):
+        return True, "真机跳过"
+    previous = device.rules
+    device.rules = FakeSysfsRules(reject_unlisted_freqs=True)
+    try:
+        result = FrequencyPlan({"7": 1234567}).apply(device, verbose=False)
+    finally:
+        device.rules = previous
+    return not result['success'], "已报告失败" if not result['success'] else "拒绝写入未被发现"
+
+
+def check_state_roundtrip(device):
+    """修改频率、调度器参数和cgroup后，快照恢复必须逐节点一致"""
+    state = capture_frequency_state(device)
+    topology = probe_topology(device)
+    _extreme_plan(topology, True).apply(device, verbose=False)
+    UclampBoostBackend(device).apply_period({"uclamp_min": 80, "cpuset": "4-7"})
+    GovernorTuningBackend(device, periods=[{"tunables": {"up_rate_limit_us": 0}}]).apply_period(
+        {"tunables": {"up_rate_limit_us": 0}})
+    mismatches = restore_frequency_state(state, device)
+    node_count = sum(len(nodes) for nodes in state.values())
+    return not mismatches, f"{node_count}个节点" + (f"，{len(mismatches)}个未恢复" if mismatches else "")
+
+
+CHECKS = (
+    ("拓扑探测", check_topology),
+    ("min/max写入顺序", check_range_ordering),
+    ("拒绝写入上报", check_rejection_reported),
+    ("快照恢复", check_state_roundtrip),
+)
+
+
+def bench_plan_throughput(device, iterations=20):
+    """
+    交替应用最高/最低频率计划，测量每个计划的往返耗时
+
+    Returns:
+        dict: {'targets': 每个计划的目标数, 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'writes_per_s', 'failures'}
+    """
+    topology = probe_topology(device)
+    plans = (_extreme_plan(topology, True), _extreme_plan(topology, False))
+    samples = []
+    failures = 0
+    for i in range(iterations):
+        start = time.perf_counter()
+        result = plans[i % 2].apply(device, verbose=False)
+        samples.append((time.perf_counter() - start) * 1000.0)
+        failures += 0 if result['success'] else 1
+    ordered = sorted(samples)
+    targets = len(plans[0].targets)
+    return {
+        'targets': targets,
+        'mean_ms': statistics.mean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max_ms': ordered[-1],
+        # 每个目标写入min和max两个节点
+        'writes_per_s': 2 * targets * 1000.0 / statistics.mean(ordered),
+        'failures': failures
+    }
+
+
+def bench_control_path(device=None, iterations=20, rules=None):
+    """
+    运行正确性检查和吞吐量测试
+
+    Args:
+        device: 目标设备，None时新建模拟设备
+        iterations: 吞吐量测试的计划次数
+        rules: 新建模拟设备时使用的 FakeSysfsRules
+
+    Returns:
+        dict: {'checks': {检查名: (是否通过, 说明)}, 'throughput': bench_plan_throughput() 的结果}
+    """
+    created = device is None
+    device = FakeDevice("bench", rules=rules) if created else resolve_device(device)
+    print(f"📱 设备: {device!r}")
+    try:
+        checks = {}
+        for name, check in CHECKS:
+            checks[name] = check(device)
+        throughput = bench_plan_throughput(device, iterations)
+    finally:
+        if created:
+            device.cleanup()
+
+    print(f"\n{'检查':<20} {'结果':<6} 说明")
+    for name, (ok, detail) in checks.items():
+        print(f"{name:<20} {'✅' if ok else '❌':<6} {detail}")
+
+    t = throughput
+    print(f"\n⏱️  批量频率计划（{t['targets']}个目标，{iterations}次）: 平均 {t['mean_ms']:.1f} ms，"
+          f"P50 {t['p50_ms']:.1f} ms，P95 {t['p95_ms']:.1f} ms，最大 {t['max_ms']:.1f} ms")
+    print(f"🚀 写入吞吐量: {t['writes_per_s']:.0f} 节点/秒，失败 {t['failures']} 次")
+    return {'checks': checks, 'throughput': throughput}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='频率控制路径基准测试（默认使用模拟sysfs设备）')
+    parser.add_argument('-n', '--iterations', type=int, default=20, help='吞吐量测试的计划次数（默认: 20）')
+    parser.add_argument('--write-latency-ms', type=float, default=0.0, help='模拟每次写入的延迟（毫秒）')
+    parser.add_argument('--actuation-delay-ms', type=float, default=0.0, help='模拟写入到频率生效的延迟（毫秒）')
+    parser.add_argument('--reject-unlisted', action='store_true', help='模拟内核拒绝非OPP频率')
+    parser.add_argument('--serial', default=None, help='在真机（或 local / fake:<名称>）上运行，默认新建模拟设备')
+    args = parser.parse_args()
+
+    rules = FakeSysfsRules(write_latency_s=args.write_latency_ms / 1000.0,
+                           actuation_delay_s=args.actuation_delay_ms / 1000.0,
+                           reject_unlisted_freqs=args.reject_unlisted)
+    results = bench_control_path(args.serial, args.iterations, rules)
+    if not all(ok for ok, _ in results['checks'].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
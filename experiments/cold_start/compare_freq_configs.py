@@ -1,26 +1,155 @@
 """
 频率配置对比测试脚本
 比较三种频率配置方式：默认调度、最大频率、自定义频率
+可选：uclamp加速（抬高top-app的uclamp.min）和调速器调参（调整schedutil等调度器参数），
+代替固定频率执行同一张时间段表，见 control_backends.py
 对比指标：启动时长、平均功耗
 """
 import os
 import sys
 import json
-import time
+import random
 from datetime import datetime
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from experiments.cold_start.run_experiment import run_cold_start_experiment
 from experiments.cold_start.analyze_trace import analyze_cold_start_trace
-from experiments.cold_start.batch_test import APPS, APP_FREQ_CONFIGS
+from experiments.cold_start.batch_test import APPS, APP_FREQ_CONFIGS, CPU_AVAILABLE_FREQUENCIES
+from experiments.cold_start.control_backends import backend_name, derive_uclamp_config, derive_governor_config
+from experiments.cold_start.parallel_runner import run_sharded, resolve_parallel_devices
+from experiments.cold_start.thermal_pacing import ThermalPacer
+from experiments.device import resolve_device
+
+
+# 写入配置结果的指标字段（trace模式和快速模式共用）
+RESULT_FIELDS = (
+    "cold_start_duration_ms",
+    "cold_start_duration_s",
+    "avg_power_mw",
+    "max_power_mw",
+    "min_power_mw",
+    "total_power_consumption_j",
+    "avg_current_ma",
+    "avg_voltage_v",
+)
+
+# 默认测试的配置（"uclamp加速"、"调速器调参" 需要通过 modes 显式选择）
+DEFAULT_MODES = ("默认调度", "最大频率", "自定义频率")
+# 与固定频率（自定义频率）做A/B对比的其他控制后端配置
+ALTERNATIVE_BACKEND_MODES = ("uclamp加速", "调速器调参")
+
+
+def derive_boost_configs(freq_configs, boost_cpuset=None):
+    """
+    由时间段频率配置生成等价的uclamp加速配置（见 control_backends.derive_uclamp_config）
+
+    Args:
+        freq_configs: 格式同 APP_FREQ_CONFIGS
+        boost_cpuset: 启动加速阶段使用的cpuset（例如 "4-7"），None表示不限制
+
+    Returns:
+        dict: {app_name: uclamp配置}，非时间段配置的App不包含在内
+    """
+    max_freqs = {policy_id: max(freqs) for policy_id, freqs in CPU_AVAILABLE_FREQUENCIES.items()}
+    boost_configs = {}
+    for app_name, freq_config in freq_configs.items():
+        boost_config = derive_uclamp_config(freq_config, max_freqs, boost_cpuset)
+        if boost_config:
+            boost_configs[app_name] = boost_config
+    return boost_configs
+
+
+def derive_governor_configs(freq_configs):
+    """
+    由时间段频率配置生成调度器参数配置（见 control_backends.derive_governor_config）
+
+    Returns:
+        dict: {app_name: governor配置}，非时间段配置的App不包含在内
+    """
+    governor_configs = {}
+    for app_name, freq_config in freq_configs.items():
+        governor_config = derive_governor_config(freq_config)
+        if governor_config:
+            governor_configs[app_name] = governor_config
+    return governor_configs
+
+
+def _run_fast_config(package_name, exp_name, run_kwargs, device, pacer,
+                     verify, app_output_dir):
+    """
+    快速测量一种配置，可选地再用完整trace验证一次
+
+    Returns:
+        dict: 配置结果（字段与trace模式相同，额外包含 measure_mode、wait_time_ms 和可选的 verification）
+    """
+    fast_results = run_cold_start_experiment(
+        package_name=package_name,
+        experiment_name=exp_name,
+        device=device,
+        measure_mode="fast",
+        **run_kwargs
+    )
+    if not fast_results:
+        return {"status": "failed", "measure_mode": "fast", "error": "快速测量失败"}
+
+    config_result = {"status": "success", "measure_mode": "fast"}
+    config_result.update({field: fast_results.get(field) for field in RESULT_FIELDS})
+    config_result["wait_time_ms"] = fast_results.get("wait_time_ms")
+    print(f"✅ 快速测量: 启动时长 = {config_result['cold_start_duration_ms']:.0f} ms")
+
+    if not verify:
+        return config_result
+
+    # 抽样验证：用完整trace再测一次，记录两种测量方式的差异
+    print("🔎 抽样验证：使用完整trace重新测量...")
+    pacer.wait_until_cool()
+    trace_file = run_cold_start_experiment(
+        package_name=package_name,
+        experiment_name=f"{exp_name}_verify",
+        device=device,
+        **run_kwargs
+    )
+    analysis_results = None
+    if trace_file:
+        os.makedirs(app_output_dir, exist_ok=True)
+        analysis_results = analyze_cold_start_trace(
+            trace_path=trace_file,
+            package_name=package_name,
+            output_dir=app_output_dir,
+            device=device
+        )
+    if not analysis_results:
+        config_result["verification"] = {"status": "failed"}
+        return config_result
+
+    verification = {"status": "success", "trace_file": str(trace_file)}
+    verification.update({field: analysis_results.get(field) for field in RESULT_FIELDS})
+    if verification["cold_start_duration_ms"] is not None:
+        verification["duration_delta_ms"] = config_result["cold_start_duration_ms"] - verification["cold_start_duration_ms"]
+    if verification["total_power_consumption_j"] is not None and config_result["total_power_consumption_j"] is not None:
+        verification["energy_delta_j"] = config_result["total_power_consumption_j"] - verification["total_power_consumption_j"]
+    config_result["verification"] = verification
+    print(f"🔎 验证: trace启动时长 = {verification['cold_start_duration_ms']} ms，"
+          f"差值 = {verification.get('duration_delta_ms')} ms")
+    return config_result
 
 
 def compare_freq_configs_for_apps(apps=None,
                                    experiment_name="FreqCompare",
                                    trace_duration=30,
                                    config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
-                                   output_dir=None):
+                                   output_dir=None,
+                                   device=None,
+                                   thermal_threshold_c=45.0,
+                                   max_pacing_wait_s=180.0,
+                                   modes=None,
+                                   freq_configs=None,
+                                   measure_mode="trace",
+                                   verify_fraction=0.0,
+                                   boost_configs=None,
+                                   boost_cpuset=None,
+                                   governor_configs=None):
     """
     对比测试：比较三种频率配置的性能
     
@@ -30,19 +159,32 @@ def compare_freq_configs_for_apps(apps=None,
         trace_duration: 追踪时长(秒)
         config_file: perfetto配置文件路径
         output_dir: 输出目录
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        thermal_threshold_c: 每次启动前要求的最高温度（摄氏度），替代固定的测试间隔
+        max_pacing_wait_s: 等待降温的最长时间（秒）
+        modes: 要测试的配置名称列表（"默认调度"、"最大频率"、"自定义频率"、"uclamp加速"、
+               "调速器调参" 的子集），None表示 DEFAULT_MODES
+        freq_configs: "自定义频率" 使用的配置，格式同 APP_FREQ_CONFIGS，None时使用 APP_FREQ_CONFIGS
+        measure_mode: "trace"（perfetto完整追踪）或 "fast"（am start -W + 电池采样，见 fast_measure.py）
+        verify_fraction: 快速模式下抽样用完整trace验证的比例（0~1），验证结果记录在 verification 字段
+        boost_configs: "uclamp加速" 使用的配置，None时由 freq_configs 转换（见 derive_boost_configs）
+        boost_cpuset: 由 freq_configs 转换时，启动加速阶段使用的cpuset（例如 "4-7"）
+        governor_configs: "调速器调参" 使用的配置，None时由 freq_configs 转换（见 derive_governor_configs）
     
     Returns:
-        dict: 对比结果，包含每个App在三种配置下的性能指标
+        dict: 对比结果，包含每个App在各配置下的性能指标、时间段配置使用的控制后端 backend，
+              以及每次测试开始时的温度 start_temp_c 和限频标记 throttled_at_start
     """
     if apps is None:
         apps = APPS
-    
-    print("=" * 80)
-    print("📊 频率配置对比测试")
-    print("=" * 80)
-    print(f"📋 测试App数量: {len(apps)}")
-    print(f"🔬 测试配置: 默认调度、最大频率、自定义频率")
-    print("=" * 80)
+    if freq_configs is None:
+        freq_configs = APP_FREQ_CONFIGS
+    if modes is None:
+        modes = DEFAULT_MODES
+    device = resolve_device(device)
+    pacer = ThermalPacer(device, threshold_c=thermal_threshold_c, max_wait_s=max_pacing_wait_s)
+    # 固定种子，重复运行时抽中相同的验证样本
+    verify_rng = random.Random(0)
     
     # 设置默认输出目录
     if not output_dir:
@@ -51,7 +193,7 @@ def compare_freq_configs_for_apps(apps=None,
         output_dir = os.path.join(project_root, "Perfetto", "trace", "traceAnalysis", "results", experiment_name)
     os.makedirs(output_dir, exist_ok=True)
     
-    # 三种配置模式
+    # 配置模式
     config_modes = [
         {
             "name": "默认调度",
@@ -68,10 +210,41 @@ def compare_freq_configs_for_apps(apps=None,
         {
             "name": "自定义频率",
             "max_frequency": False,
-            "cpu_freq_settings": None,  # 从APP_FREQ_CONFIGS获取
-            "gpu_freq_setting": None    # 从APP_FREQ_CONFIGS获取
+            "cpu_freq_settings": None,  # 从freq_configs获取
+            "gpu_freq_setting": None    # 从freq_configs获取
+        },
+        {
+            "name": "uclamp加速",
+            "max_frequency": False,
+            "cpu_freq_settings": None,  # 从boost_configs获取
+            "gpu_freq_setting": None
+        },
+        {
+            "name": "调速器调参",
+            "max_frequency": False,
+            "cpu_freq_settings": None,  # 从governor_configs获取
+            "gpu_freq_setting": None
         }
     ]
+    unknown = set(modes) - {mode["name"] for mode in config_modes}
+    if unknown:
+        raise ValueError(f"未知的配置名称: {', '.join(sorted(unknown))}")
+    config_modes = [mode for mode in config_modes if mode["name"] in modes]
+    # 自定义频率、uclamp加速和调速器调参使用的每App配置
+    app_mode_configs = {"自定义频率": freq_configs}
+    if "uclamp加速" in modes:
+        app_mode_configs["uclamp加速"] = (boost_configs if boost_configs is not None
+                                         else derive_boost_configs(freq_configs, boost_cpuset))
+    if "调速器调参" in modes:
+        app_mode_configs["调速器调参"] = (governor_configs if governor_configs is not None
+                                        else derive_governor_configs(freq_configs))
+    
+    print("=" * 80)
+    print("📊 频率配置对比测试")
+    print("=" * 80)
+    print(f"📋 测试App数量: {len(apps)}")
+    print(f"🔬 测试配置: {'、'.join(mode['name'] for mode in config_modes)}")
+    print("=" * 80)
     
     # 存储所有结果
     all_results = {}
@@ -86,31 +259,57 @@ def compare_freq_configs_for_apps(apps=None,
             "package_name": package_name,
             "configs": {}
         }
+        if device.serial:
+            app_results["device"] = device.serial
         
         # 对每种配置进行测试
         for mode_idx, mode in enumerate(config_modes, 1):
-            print(f"\n--- [{mode_idx}/3] 配置: {mode['name']} ---")
+            print(f"\n--- [{mode_idx}/{len(config_modes)}] 配置: {mode['name']} ---")
             
             # 获取配置参数
-            if mode["name"] == "自定义频率":
-                if app_name in APP_FREQ_CONFIGS:
-                    app_config = APP_FREQ_CONFIGS[app_name]
+            if mode["name"] in app_mode_configs:
+                mode_configs = app_mode_configs[mode["name"]]
+                if mode_configs.get(app_name):
+                    app_config = mode_configs[app_name]
                     cpu_settings = app_config.get("cpu_freq_settings")
                     gpu_setting = app_config.get("gpu_freq_setting")
                 else:
-                    print(f"⚠️  {app_name} 未配置自定义频率，跳过")
+                    print(f"⚠️  {app_name} 未配置{mode['name']}，跳过")
                     app_results["configs"][mode["name"]] = {
                         "status": "skipped",
-                        "reason": "未配置自定义频率"
+                        "reason": f"未配置{mode['name']}"
                     }
                     continue
             else:
                 cpu_settings = mode["cpu_freq_settings"]
                 gpu_setting = mode["gpu_freq_setting"]
             
+            thermal_info = {}
             try:
+                # 等待设备降温（替代固定的测试间隔），避免不同配置在不同温度下比较
+                thermal_info = pacer.wait_until_cool()
+                
                 # 运行实验
                 exp_name = f"{experiment_name}_{app_name}_{mode['name']}"
+                if measure_mode == "fast":
+                    app_results["configs"][mode["name"]] = _run_fast_config(
+                        package_name, exp_name,
+                        {
+                            "trace_duration": trace_duration,
+                            "config_file": config_file,
+                            "max_frequency": mode["max_frequency"],
+                            "cpu_freq_settings": cpu_settings,
+                            "gpu_freq_setting": gpu_setting,
+                        },
+                        device, pacer,
+                        verify=verify_rng.random() < verify_fraction,
+                        app_output_dir=os.path.join(output_dir, app_name, mode["name"])
+                    )
+                    app_results["configs"][mode["name"]].update(thermal_info)
+                    if backend_name(cpu_settings):
+                        app_results["configs"][mode["name"]]["backend"] = backend_name(cpu_settings)
+                    continue
+                
                 trace_file = run_cold_start_experiment(
                     package_name=package_name,
                     experiment_name=exp_name,
@@ -118,14 +317,16 @@ def compare_freq_configs_for_apps(apps=None,
                     config_file=config_file,
                     max_frequency=mode["max_frequency"],
                     cpu_freq_settings=cpu_settings,
-                    gpu_freq_setting=gpu_setting
+                    gpu_freq_setting=gpu_setting,
+                    device=device
                 )
                 
                 if not trace_file:
                     print(f"❌ {mode['name']}: 实验失败（无法获取trace文件）")
                     app_results["configs"][mode["name"]] = {
                         "status": "failed",
-                        "error": "无法获取trace文件"
+                        "error": "无法获取trace文件",
+                        **thermal_info
                     }
                     continue
                 
@@ -138,7 +339,8 @@ def compare_freq_configs_for_apps(apps=None,
                     analysis_results = analyze_cold_start_trace(
                         trace_path=trace_file,
                         package_name=package_name,
-                        output_dir=app_output_dir
+                        output_dir=app_output_dir,
+                        device=device
                     )
                     
                     if analysis_results:
@@ -157,7 +359,7 @@ def compare_freq_configs_for_apps(apps=None,
                         
                         duration_ms = analysis_results.get('cold_start_duration_ms', 0)
                         avg_power = analysis_results.get('avg_power_mw', 0)
-                        print(f"✅ {mode['name']}: 启动时长 = {duration_ms:.2f} ms, 平均功耗 = {avg_power:.1f} mW")
+                        print(f"✅ {mode['name']}: 启动时长 = {duration_ms:.2f} ms, 平均功耗 = {_fmt_value(avg_power, '.1f')} mW")
                     else:
                         app_results["configs"][mode["name"]] = {
                             "status": "failed",
@@ -173,11 +375,6 @@ def compare_freq_configs_for_apps(apps=None,
                         "trace_file": str(trace_file),
                         "error": f"分析出错: {str(e)}"
                     }
-                
-                # 测试间隔，避免设备过热
-                if mode_idx < len(config_modes):
-                    print(f"⏳ 等待3秒后测试下一个配置...")
-                    time.sleep(3)
                     
             except Exception as e:
                 print(f"❌ {mode['name']}: 测试失败 - {e}")
@@ -185,13 +382,26 @@ def compare_freq_configs_for_apps(apps=None,
                     "status": "failed",
                     "error": str(e)
                 }
+            
+            app_results["configs"][mode["name"]].update(thermal_info)
+            if backend_name(cpu_settings):
+                app_results["configs"][mode["name"]]["backend"] = backend_name(cpu_settings)
         
         all_results[app_name] = app_results
-        
-        # App间隔
-        if idx < len(apps):
-            print(f"\n⏳ 等待5秒后测试下一个App...")
-            time.sleep(5)
+    
+    # 保存结果到JSON文件（先于报告，报告出错时结果不会丢失）
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = os.path.join(output_dir, f"freq_comparison_results_{timestamp}.json")
+    
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'experiment_name': experiment_name,
+            'timestamp': timestamp,
+            'apps': apps,
+            'results': all_results
+        }, f, indent=2, ensure_ascii=False)
+    
+    print(f"\n💾 详细结果已保存到: {results_file}")
     
     # 生成对比报告
     print("\n" + "=" * 80)
@@ -200,23 +410,110 @@ def compare_freq_configs_for_apps(apps=None,
     
     generate_comparison_report(all_results, output_dir)
     
-    # 保存结果到JSON文件
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    results_file = os.path.join(output_dir, f"freq_comparison_results_{timestamp}.json")
+    return all_results
+
+
+def compare_freq_configs_parallel(devices,
+                                  apps=None,
+                                  experiment_name="FreqCompare",
+                                  trace_duration=30,
+                                  config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
+                                  output_dir=None,
+                                  thermal_threshold_c=45.0,
+                                  max_pacing_wait_s=180.0,
+                                  measure_mode="trace",
+                                  verify_fraction=0.0,
+                                  modes=None,
+                                  boost_cpuset=None):
+    """
+    在多台同型号设备上并行执行频率配置对比测试
+    
+    App列表按轮转方式分片到各设备（同一App的所有配置始终在同一台设备上测试，保证可比性），
+    每台设备的结果保存在 {output_dir}/{设备序列号}/ 下，全部完成后生成合并报告
+    
+    Args:
+        devices: Device列表
+        其余参数同 compare_freq_configs_for_apps
+    
+    Returns:
+        dict: 合并后的对比结果
+    """
+    if apps is None:
+        apps = APPS
+    
+    if not output_dir:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        project_root = os.path.dirname(os.path.dirname(script_dir))
+        output_dir = os.path.join(project_root, "Perfetto", "trace", "traceAnalysis", "results", experiment_name)
+    os.makedirs(output_dir, exist_ok=True)
     
+    print("=" * 80)
+    print(f"📱 多设备并行频率配置对比测试（{len(devices)} 台设备）")
+    print("=" * 80)
+    
+    def _worker(device, shard):
+        return compare_freq_configs_for_apps(
+            apps=shard,
+            experiment_name=experiment_name,
+            trace_duration=trace_duration,
+            config_file=config_file,
+            output_dir=os.path.join(output_dir, device.label),
+            device=device,
+            thermal_threshold_c=thermal_threshold_c,
+            max_pacing_wait_s=max_pacing_wait_s,
+            measure_mode=measure_mode,
+            verify_fraction=verify_fraction,
+            modes=modes,
+            boost_cpuset=boost_cpuset
+        )
+    
+    device_results = run_sharded(devices, apps, _worker)
+    
+    # 合并各设备结果（保持原App顺序）
+    merged = {}
+    for shard_results in device_results.values():
+        if shard_results:
+            merged.update(shard_results)
+    all_results = {name: merged[name] for name in apps if name in merged}
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = os.path.join(output_dir, f"freq_comparison_results_merged_{timestamp}.json")
     with open(results_file, 'w', encoding='utf-8') as f:
         json.dump({
             'experiment_name': experiment_name,
             'timestamp': timestamp,
             'apps': apps,
+            'devices': [d.serial for d in devices],
             'results': all_results
         }, f, indent=2, ensure_ascii=False)
     
-    print(f"\n💾 详细结果已保存到: {results_file}")
+    print(f"\n💾 合并结果已保存到: {results_file}")
+    
+    print("\n" + "=" * 80)
+    print("📊 合并对比报告")
+    print("=" * 80)
+    generate_comparison_report(all_results, output_dir)
     
     return all_results
 
 
+def _fmt_value(value, spec):
+    """格式化可能缺失的测量值（快速模式没有电池采样时功耗为None），缺失时为 N/A"""
+    return "N/A" if value is None else format(value, spec)
+
+
+def _pct(a, b, base):
+    """
+    (a - b) / base 的百分比字符串
+
+    Returns:
+        str: 如 "+12.3%"；任一值缺失时为 "N/A"
+    """
+    if a is None or b is None or base is None:
+        return "N/A"
+    return f"{((a - b) / base * 100) if base > 0 else 0:+.1f}%"
+
+
 def generate_comparison_report(results, output_dir):
     """
     生成对比报告（控制台输出和文本文件）
@@ -249,8 +546,13 @@ def generate_comparison_report(results, output_dir):
                 avg_power_mw = config_data.get("avg_power_mw", 0)
                 total_power_j = config_data.get("total_power_consumption_j", 0)
                 
-                line = f"{app_name:<15} {config_name:<12} {duration_ms:>14.2f} {avg_power_mw:>14.1f} {total_power_j:>14.3f} {'✅':<10}"
+                # 开始时处于限频/高温状态的测试结果不可靠，单独标记
+                status_mark = "✅⚠️" if config_data.get("throttled_at_start") else "✅"
+                line = (f"{app_name:<15} {config_name:<12} {duration_ms:>14.2f} {_fmt_value(avg_power_mw, '.1f'):>14} "
+                        f"{_fmt_value(total_power_j, '.3f'):>14} {status_mark:<10}")
                 report_lines.append(line)
+                if config_data.get("throttled_at_start"):
+                    report_lines.append(f"  └─ 开始时处于限频状态（{config_data.get('start_temp_c')}°C）")
                 
                 comparison_summary[app_name][config_name] = {
                     "duration_ms": duration_ms,
@@ -291,21 +593,21 @@ def generate_comparison_report(results, output_dir):
         # 默认调度
         if "默认调度" in app_configs:
             default = app_configs["默认调度"]
-            line += f"{default['duration_ms']:>10.2f} {default['avg_power_mw']:>14.1f} | "
+            line += f"{default['duration_ms']:>10.2f} {_fmt_value(default['avg_power_mw'], '.1f'):>14} | "
         else:
             line += f"{'N/A':>10} {'N/A':>14} | "
         
         # 最大频率
         if "最大频率" in app_configs:
             max_freq = app_configs["最大频率"]
-            line += f"{max_freq['duration_ms']:>10.2f} {max_freq['avg_power_mw']:>14.1f} | "
+            line += f"{max_freq['duration_ms']:>10.2f} {_fmt_value(max_freq['avg_power_mw'], '.1f'):>14} | "
         else:
             line += f"{'N/A':>10} {'N/A':>14} | "
         
         # 自定义频率
         if "自定义频率" in app_configs:
             custom = app_configs["自定义频率"]
-            line += f"{custom['duration_ms']:>10.2f} {custom['avg_power_mw']:>14.1f}"
+            line += f"{custom['duration_ms']:>10.2f} {_fmt_value(custom['avg_power_mw'], '.1f'):>14}"
         else:
             line += f"{'N/A':>10} {'N/A':>14}"
         
@@ -336,33 +638,54 @@ def generate_comparison_report(results, output_dir):
         if "最大频率" in app_configs:
             max_freq = app_configs["最大频率"]
             duration_improve = ((default_duration - max_freq["duration_ms"]) / default_duration * 100) if default_duration > 0 else 0
-            power_increase = ((max_freq["avg_power_mw"] - default_power) / default_power * 100) if default_power > 0 else 0
+            power_increase = _pct(max_freq["avg_power_mw"], default_power, default_power)
             
             report_lines.append(f"  最大频率 vs 默认调度:")
             report_lines.append(f"    启动时长: {max_freq['duration_ms']:.2f} ms ({duration_improve:+.1f}%)")
-            report_lines.append(f"    平均功耗: {max_freq['avg_power_mw']:.1f} mW ({power_increase:+.1f}%)")
+            report_lines.append(f"    平均功耗: {_fmt_value(max_freq['avg_power_mw'], '.1f')} mW ({power_increase})")
         
         # 自定义频率对比
         if "自定义频率" in app_configs:
             custom = app_configs["自定义频率"]
             duration_improve = ((default_duration - custom["duration_ms"]) / default_duration * 100) if default_duration > 0 else 0
-            power_change = ((custom["avg_power_mw"] - default_power) / default_power * 100) if default_power > 0 else 0
+            power_change = _pct(custom["avg_power_mw"], default_power, default_power)
             
             report_lines.append(f"  自定义频率 vs 默认调度:")
             report_lines.append(f"    启动时长: {custom['duration_ms']:.2f} ms ({duration_improve:+.1f}%)")
-            report_lines.append(f"    平均功耗: {custom['avg_power_mw']:.1f} mW ({power_change:+.1f}%)")
+            report_lines.append(f"    平均功耗: {_fmt_value(custom['avg_power_mw'], '.1f')} mW ({power_change})")
         
         # 自定义 vs 最大频率
         if "自定义频率" in app_configs and "最大频率" in app_configs:
             custom = app_configs["自定义频率"]
             max_freq = app_configs["最大频率"]
             duration_diff = ((max_freq["duration_ms"] - custom["duration_ms"]) / max_freq["duration_ms"] * 100) if max_freq["duration_ms"] > 0 else 0
-            power_save = ((max_freq["avg_power_mw"] - custom["avg_power_mw"]) / max_freq["avg_power_mw"] * 100) if max_freq["avg_power_mw"] > 0 else 0
+            power_save = _pct(max_freq["avg_power_mw"], custom["avg_power_mw"], max_freq["avg_power_mw"])
             
             report_lines.append(f"  自定义频率 vs 最大频率:")
             report_lines.append(f"    启动时长差异: {duration_diff:+.1f}%")
-            report_lines.append(f"    功耗节省: {power_save:+.1f}%")
-        
+            report_lines.append(f"    功耗节省: {power_save}")
+
+        # 其他控制后端对比（相对默认调度，以及与固定频率方式的A/B）
+        for alt_name in ALTERNATIVE_BACKEND_MODES:
+            if alt_name not in app_configs:
+                continue
+            alt = app_configs[alt_name]
+            duration_improve = ((default_duration - alt["duration_ms"]) / default_duration * 100) if default_duration > 0 else 0
+            power_change = _pct(alt["avg_power_mw"], default_power, default_power)
+
+            report_lines.append(f"  {alt_name} vs 默认调度:")
+            report_lines.append(f"    启动时长: {alt['duration_ms']:.2f} ms ({duration_improve:+.1f}%)")
+            report_lines.append(f"    平均功耗: {_fmt_value(alt['avg_power_mw'], '.1f')} mW ({power_change})")
+
+            if "自定义频率" in app_configs:
+                custom = app_configs["自定义频率"]
+                duration_diff = ((custom["duration_ms"] - alt["duration_ms"]) / custom["duration_ms"] * 100) if custom["duration_ms"] > 0 else 0
+                energy_save = _pct(custom["total_power_j"], alt["total_power_j"], custom["total_power_j"])
+
+                report_lines.append(f"  {alt_name} vs 自定义频率:")
+                report_lines.append(f"    启动时长差异: {duration_diff:+.1f}%")
+                report_lines.append(f"    能耗节省: {energy_save}")
+
         report_lines.append("")
     
     # 输出到控制台
@@ -394,6 +717,12 @@ if __name__ == "__main__":
   
   # 指定输出目录
   python experiments/cold_start/compare_freq_configs.py --output-dir ./comparison_results
+  
+  # uclamp加速与固定频率A/B对比（启动阶段把top-app限制到大核）
+  python experiments/cold_start/compare_freq_configs.py --modes 自定义频率 uclamp加速 --boost-cpuset 4-7
+  
+  # 调度器参数调整与固定频率A/B对比
+  python experiments/cold_start/compare_freq_configs.py --modes 自定义频率 调速器调参
         """
     )
     parser.add_argument('--apps', nargs='+', help='要测试的App名称列表（空格分隔），例如: --apps 微信 QQ。如果不指定则测试所有App')
@@ -402,6 +731,21 @@ if __name__ == "__main__":
     parser.add_argument('--config', default='/data/misc/perfetto-configs/HardwareInfo.pbtx',
                        help='Perfetto配置文件路径')
     parser.add_argument('--output-dir', help='输出目录（默认: Perfetto/trace/traceAnalysis/results/{experiment_name}）')
+    parser.add_argument('--devices', nargs='*', metavar='SERIAL',
+                       help='多设备并行测试：指定设备序列号列表；只写 --devices 不带参数则使用所有已连接设备')
+    parser.add_argument('--thermal-threshold', type=float, default=45.0,
+                       help='每次启动前等待设备降温到该温度以下（摄氏度，默认: 45）')
+    parser.add_argument('--max-pacing-wait', type=float, default=180.0,
+                       help='等待降温的最长时间（秒，默认: 180）')
+    parser.add_argument('--fast', action='store_true',
+                       help='快速测量：不启动perfetto，使用 am start -W 和电池采样')
+    parser.add_argument('--verify-fraction', type=float, default=0.0,
+                       help='快速测量时抽样用完整trace验证的比例（0~1，默认: 0）')
+    parser.add_argument('--modes', nargs='+', default=None,
+                       help=f'要测试的配置（默认: {" ".join(DEFAULT_MODES)}；'
+                            f'可选: {" ".join(ALTERNATIVE_BACKEND_MODES)}）')
+    parser.add_argument('--boost-cpuset', default=None,
+                       help='uclamp加速的启动阶段使用的cpuset，例如 4-7（默认: 不限制）')
     
     args = parser.parse_args()
     
@@ -419,13 +763,37 @@ if __name__ == "__main__":
             sys.exit(1)
     
     # 运行对比测试
-    results = compare_freq_configs_for_apps(
-        apps=apps_to_test,
-        experiment_name=args.experiment_name,
-        trace_duration=args.duration,
-        config_file=args.config,
-        output_dir=args.output_dir
-    )
+    devices = resolve_parallel_devices(args.devices)
+    if devices and len(devices) > 1:
+        results = compare_freq_configs_parallel(
+            devices,
+            apps=apps_to_test,
+            experiment_name=args.experiment_name,
+            trace_duration=args.duration,
+            config_file=args.config,
+            output_dir=args.output_dir,
+            thermal_threshold_c=args.thermal_threshold,
+            max_pacing_wait_s=args.max_pacing_wait,
+            measure_mode="fast" if args.fast else "trace",
+            verify_fraction=args.verify_fraction,
+            modes=args.modes,
+            boost_cpuset=args.boost_cpuset
+        )
+    else:
+        results = compare_freq_configs_for_apps(
+            apps=apps_to_test,
+            experiment_name=args.experiment_name,
+            trace_duration=args.duration,
+            config_file=args.config,
+            output_dir=args.output_dir,
+            device=devices[0] if devices else None,
+            thermal_threshold_c=args.thermal_threshold,
+            max_pacing_wait_s=args.max_pacing_wait,
+            measure_mode="fast" if args.fast else "trace",
+            verify_fraction=args.verify_fraction,
+            modes=args.modes,
+            boost_cpuset=args.boost_cpuset
+        )
     
     print("\n✅ 对比测试完成!")
 
@@ -0,0 +1,389 @@
+"""
+频率控制后端
+时间段频率表（APP_FREQ_CONFIGS 中的 periods）由控制后端逐段执行，后端通过
+cpu_freq_settings 中的 "backend" 字段选择：
+
+- "freq_pin"（默认）: 写 scaling_min/max_freq 固定频率（FrequencyPlan），时间段可包含
+  cpu_freq / gpu_freq / devfreq（DDR、总线、缓存等，如 {"ddr": 3172000}）
+- "uclamp": 设置App所在cgroup（默认 top-app）的 cpu.uclamp.min / cpu.uclamp.max，
+  可选地把该cgroup的cpuset限制到大核；频率仍由schedutil选择，只是利用率下限被抬高
+- "governor": 修改调度器参数（schedutil的 up/down_rate_limit_us、厂商调度器的
+  hispeed_freq / hispeed_load 等），让调度器在启动阶段更快升频
+
+uclamp时间段格式：
+    {"start": 0, "end": 1.5, "uclamp_min": 80, "uclamp_max": 100, "cpuset": "4-7"}
+uclamp_min / uclamp_max 为百分比（0~100），缺省时分别为 0 和 100；
+没有 cpuset 字段的时间段会把cpuset恢复为实验开始前的值。
+
+governor时间段格式：
+    {"start": 0, "end": 1.5, "tunables": {"up_rate_limit_us": 0, "hispeed_load": 50},
+     "policy_tunables": {"7": {"hispeed_freq": 2802000}}}
+tunables 对所有policy生效，policy_tunables 按policy覆盖；设备上不存在的参数会被跳过，
+某个时间段没有设置的参数恢复为实验开始前的值。
+"""
+import os
+import sys
+import time
+import shlex
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+from experiments.cold_start.frequency_plan import PLAN_SCRIPT_PRELUDE
+from experiments.cold_start.frequency_manager import apply_frequency_plan
+
+
+CPUCTL_ROOT = "/dev/cpuctl"
+CPUSET_ROOT = "/dev/cpuset"
+# 前台App启动时所在的cgroup（ActivityManager在启动过程中会把App线程移入该组）
+DEFAULT_BOOST_CGROUP = "top-app"
+DEFAULT_BACKEND = "freq_pin"
+
+
+def cgroup_nodes(cgroup=DEFAULT_BOOST_CGROUP):
+    """
+    返回cgroup的uclamp和cpuset节点路径
+
+    Returns:
+        dict: {'uclamp_max': 路径, 'uclamp_min': 路径, 'cpuset': 路径}（按恢复时的写入顺序）
+    """
+    return {
+        'uclamp_max': f"{CPUCTL_ROOT}/{cgroup}/cpu.uclamp.max",
+        'uclamp_min': f"{CPUCTL_ROOT}/{cgroup}/cpu.uclamp.min",
+        'cpuset': f"{CPUSET_ROOT}/{cgroup}/cpus",
+    }
+
+
+def _format_uclamp(percent):
+    """把百分比转换为cgroup接受的格式（100为 "max"）"""
+    percent = float(percent)
+    if not 0 <= percent <= 100:
+        raise ValueError(f"uclamp值必须在0~100之间: {percent}")
+    return "max" if percent >= 100 else f"{percent:.2f}"
+
+
+class FrequencyPinBackend:
+    """固定频率后端：每个时间段写一次 min/max频率（CPU、GPU和devfreq合并为一个计划）"""
+
+    name = "freq_pin"
+
+    def __init__(self, device=None):
+        self.device = resolve_device(device)
+
+    def apply_period(self, period):
+        """
+        应用一个时间段（字段 cpu_freq / gpu_freq / devfreq，格式同 APP_FREQ_CONFIGS）
+
+        Returns:
+            bool: 回读值是否与目标一致
+        """
+        result = apply_frequency_plan(period.get('cpu_freq'), period.get('gpu_freq'), device=self.device,
+                                      devfreq_settings=period.get('devfreq'))
+        return bool(result and result['success'])
+
+
+class UclampBoostBackend:
+    """
+    uclamp加速后端：抬高App所在cgroup的利用率下限，让调度器自己选频率和核心
+
+    cgroup原值由 frequency_state() 的快照负责恢复；这里在第一次编译时段（写入任何节点之前）
+    读取一次cpuset原值，用于所有没有 cpuset 字段的时间段
+    """
+
+    name = "uclamp"
+
+    def __init__(self, device=None, cgroup=DEFAULT_BOOST_CGROUP):
+        self.device = resolve_device(device)
+        self.cgroup = cgroup
+        self.nodes = cgroup_nodes(cgroup)
+        self._original_cpuset = None
+
+    def _read_original_cpuset(self):
+        if self._original_cpuset is None:
+            self._original_cpuset = self.device.shell(f"cat {self.nodes['cpuset']}", need_root=True)
+        return self._original_cpuset
+
+    def compile(self, period):
+        """
+        把一个时间段编译为设备端脚本（先写max再写min，最后写cpuset）
+
+        脚本输出格式（每个节点一行）：U <节点> <写入rc> <回读值>
+        """
+        # 无论本时间段是否设置cpuset都先读取原值，避免之后读到加速时段写入的值
+        original_cpuset = self._read_original_cpuset()
+        cpuset = period.get('cpuset') or original_cpuset
+        writes = (
+            (self.nodes['uclamp_max'], _format_uclamp(period.get('uclamp_max', 100))),
+            (self.nodes['uclamp_min'], _format_uclamp(period.get('uclamp_min', 0))),
+            (self.nodes['cpuset'], cpuset),
+        )
+        lines = [PLAN_SCRIPT_PRELUDE]
+        for path, value in writes:
+            node = shlex.quote(path)
+            lines.append(f"sysfs_write {node} {shlex.quote(value)}; echo \"U {node} $? $(read_node {node})\"\n")
+        lines.append("true\n")
+        return "".join(lines), dict(writes)
+
+    def apply_period(self, period):
+        """
+        应用一个时间段（字段 uclamp_min / uclamp_max / cpuset）
+
+        Returns:
+            bool: 所有节点是否写入成功
+        """
+        start = time.perf_counter()
+        try:
+            script, expected = self.compile(period)
+            output = self.device.run_script(script, need_root=True)
+        except (AdbError, ValueError) as e:
+            print(f"❌ 应用uclamp设置失败: {e}")
+            return False
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        ok = True
+        for line in output.splitlines():
+            parts = line.split(" ", 3)
+            if len(parts) != 4 or parts[0] != "U":
+                continue
+            node, rc, value = parts[1], parts[2], parts[3].strip()
+            if rc != "0":
+                ok = False
+                print(f"⚠️  写入失败: {node} = {expected.get(node)}（当前 {value}）")
+        print(f"{'✅' if ok else '⚠️ '} {self.cgroup}: uclamp {expected[self.nodes['uclamp_min']]}"
+              f"~{expected[self.nodes['uclamp_max']]}，cpuset {expected[self.nodes['cpuset']]}"
+              f"（往返 {elapsed_ms:.1f} ms）")
+        return ok
+
+
+class GovernorTuningBackend:
+    """
+    调度器参数后端：不固定频率，只调整调度器的响应速度
+
+    第一次应用时通过频率状态快照（见 frequency_state.py）找到每个policy当前调度器的参数节点
+    并记录原值；调度器参数同样由 frequency_state() 在实验结束后恢复
+    """
+
+    name = "governor"
+
+    def __init__(self, device=None, periods=None):
+        self.device = resolve_device(device)
+        self.periods = periods or []
+        # {policy_id: {参数名: (节点路径, 原值)}}
+        self._tunables = None
+
+    def _load_tunables(self):
+        # frequency_state 导入本模块的 cgroup_nodes，这里延迟导入避免循环依赖
+        from experiments.cold_start.frequency_state import capture_frequency_state
+
+        if self._tunables is None:
+            self._tunables = {}
+            for scope, nodes in capture_frequency_state(self.device).items():
+                if not scope.startswith("policy"):
+                    continue
+                policy_id = scope[len("policy"):]
+                self._tunables[policy_id] = {
+                    os.path.basename(path): (path, value)
+                    for path, value in nodes.items()
+                    if os.path.basename(os.path.dirname(path)) not in ("cpufreq", f"policy{policy_id}")
+                }
+        return self._tunables
+
+    def _touched_names(self):
+        """所有时间段涉及的参数名（每个时间段都要写这些参数，未设置的写回原值）"""
+        names = set()
+        for period in self.periods:
+            names.update(period.get('tunables', {}))
+            for overrides in period.get('policy_tunables', {}).values():
+                names.update(overrides)
+        return names
+
+    def compile(self, period):
+        """
+        把一个时间段编译为设备端脚本
+
+        Returns:
+            tuple: (脚本, {节点路径: 目标值})；脚本输出格式同uclamp后端：U <节点> <写入rc> <回读值>
+        """
+        tunables = self._load_tunables()
+        names = self._touched_names() | set(period.get('tunables', {}))
+        writes = {}
+        for policy_id, nodes in sorted(tunables.items(), key=lambda kv: int(kv[0])):
+            wanted = dict(period.get('tunables', {}))
+            wanted.update(period.get('policy_tunables', {}).get(policy_id, {}))
+            for name in sorted(names):
+                if name not in nodes:
+                    continue
+                path, original = nodes[name]
+                writes[path] = str(wanted[name]) if name in wanted else original
+
+        lines = [PLAN_SCRIPT_PRELUDE]
+        for path, value in writes.items():
+            node = shlex.quote(path)
+            lines.append(f"sysfs_write {node} {shlex.quote(value)}; echo \"U {node} $? $(read_node {node})\"\n")
+        lines.append("true\n")
+        return "".join(lines), writes
+
+    def apply_period(self, period):
+        """
+        应用一个时间段（字段 tunables / policy_tunables）
+
+        Returns:
+            bool: 所有存在的参数是否写入成功
+        """
+        start = time.perf_counter()
+        try:
+            script, expected = self.compile(period)
+            if not expected:
+                print("⚠️  当前调度器没有可调整的参数，跳过")
+                return False
+            output = self.device.run_script(script, need_root=True)
+        except AdbError as e:
+            print(f"❌ 应用调度器参数失败: {e}")
+            return False
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        ok = True
+        for line in output.splitlines():
+            parts = line.split(" ", 3)
+            if len(parts) != 4 or parts[0] != "U":
+                continue
+            if parts[2] != "0":
+                ok = False
+                print(f"⚠️  写入失败: {parts[1]} = {expected.get(parts[1])}（当前 {parts[3].strip()}）")
+        print(f"{'✅' if ok else '⚠️ '} 调度器参数: 写入 {len(expected)} 个节点（往返 {elapsed_ms:.1f} ms）")
+        return ok
+
+
+CONTROL_BACKENDS = {
+    FrequencyPinBackend.name: FrequencyPinBackend,
+    UclampBoostBackend.name: UclampBoostBackend,
+    GovernorTuningBackend.name: GovernorTuningBackend,
+}
+
+
+def backend_name(cpu_freq_settings):
+    """
+    配置使用的控制后端名称（用于给结果打标签）
+
+    Returns:
+        str: 时间段配置返回其后端名称，其他配置返回None
+    """
+    if cpu_freq_settings and isinstance(cpu_freq_settings, dict) and cpu_freq_settings.get("time_based"):
+        return cpu_freq_settings.get("backend", DEFAULT_BACKEND)
+    return None
+
+
+def get_backend(cpu_freq_settings=None, device=None):
+    """
+    根据时间段配置创建控制后端
+
+    Args:
+        cpu_freq_settings: {"time_based": True, "backend": ..., "periods": [...]}，
+                           uclamp后端可额外指定 "cgroup"
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+
+    Returns:
+        FrequencyPinBackend、UclampBoostBackend 或 GovernorTuningBackend
+
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    settings = cpu_freq_settings or {}
+    name = backend_name(settings) or DEFAULT_BACKEND
+    if name not in CONTROL_BACKENDS:
+        raise ValueError(f"未知的频率控制后端: {name}（可选: {', '.join(CONTROL_BACKENDS)}）")
+    if name == UclampBoostBackend.name:
+        return UclampBoostBackend(device, cgroup=settings.get("cgroup", DEFAULT_BOOST_CGROUP))
+    if name == GovernorTuningBackend.name:
+        return GovernorTuningBackend(device, periods=settings.get("periods"))
+    return CONTROL_BACKENDS[name](device)
+
+
+def derive_uclamp_config(freq_config, max_freqs, boost_cpuset=None):
+    """
+    把固定频率的时间段配置转换为等价的uclamp配置，便于与频率固定方式A/B对比
+
+    每个时间段的 uclamp_min 取各policy目标频率（范围取min）占该policy最高频率的最大比例；
+    GPU没有对应的uclamp，会被忽略。
+
+    Args:
+        freq_config: APP_FREQ_CONFIGS 中单个App的配置
+        max_freqs: {policy_id: 最高频率KHz}
+        boost_cpuset: 第一个时间段（启动加速阶段）使用的cpuset，例如 "4-7"，None表示不限制
+
+    Returns:
+        dict: 格式同 APP_FREQ_CONFIGS 的uclamp配置；输入不是时间段配置时返回None
+    """
+    cpu_settings = (freq_config or {}).get("cpu_freq_settings") or {}
+    if not cpu_settings.get("time_based"):
+        return None
+
+    periods = []
+    for idx, period in enumerate(cpu_settings.get("periods", [])):
+        ratio = 0.0
+        for policy_id, freq_setting in (period.get("cpu_freq") or {}).items():
+            max_freq = max_freqs.get(str(policy_id))
+            if not max_freq:
+                continue
+            target = freq_setting.get("min", freq_setting.get("min_freq")) if isinstance(freq_setting, dict) else freq_setting
+            ratio = max(ratio, float(target) / max_freq)
+        boost_period = {
+            "start": period.get("start", 0),
+            "end": period.get("end", float("inf")),
+            "uclamp_min": round(min(ratio, 1.0) * 100, 2),
+            "uclamp_max": 100,
+        }
+        if idx == 0 and boost_cpuset:
+            boost_period["cpuset"] = boost_cpuset
+        periods.append(boost_period)
+
+    return {
+        "cpu_freq_settings": {"time_based": True, "backend": UclampBoostBackend.name, "periods": periods},
+        "gpu_freq_setting": None
+    }
+
+
+# 启动加速阶段的调度器参数：立即升频、延迟降频、低负载即跳到hispeed_freq
+# （rate_limit_us 是合并了up/down的新版schedutil参数，不存在的参数会被跳过）
+BOOST_GOVERNOR_TUNABLES = {
+    "up_rate_limit_us": 0,
+    "down_rate_limit_us": 20000,
+    "rate_limit_us": 0,
+    "hispeed_load": 50,
+}
+
+
+def derive_governor_config(freq_config, tunables=None):
+    """
+    把固定频率的时间段配置转换为调度器参数配置
+
+    第一个时间段（启动加速阶段）使用 tunables，并把每个policy的 hispeed_freq 设为该时间段的目标频率
+    （范围取min）；之后的时间段恢复原参数。
+
+    Args:
+        freq_config: APP_FREQ_CONFIGS 中单个App的配置
+        tunables: 加速阶段的参数，None时使用 BOOST_GOVERNOR_TUNABLES
+
+    Returns:
+        dict: 格式同 APP_FREQ_CONFIGS 的governor配置；输入不是时间段配置时返回None
+    """
+    cpu_settings = (freq_config or {}).get("cpu_freq_settings") or {}
+    if not cpu_settings.get("time_based"):
+        return None
+
+    periods = []
+    for idx, period in enumerate(cpu_settings.get("periods", [])):
+        governor_period = {"start": period.get("start", 0), "end": period.get("end", float("inf"))}
+        if idx == 0:
+            governor_period["tunables"] = dict(BOOST_GOVERNOR_TUNABLES if tunables is None else tunables)
+            governor_period["policy_tunables"] = {
+                str(policy_id): {"hispeed_freq": freq_setting.get("min", freq_setting.get("min_freq"))
+                                 if isinstance(freq_setting, dict) else freq_setting}
+                for policy_id, freq_setting in (period.get("cpu_freq") or {}).items()
+            }
+        periods.append(governor_period)
+
+    return {
+        "cpu_freq_settings": {"time_based": True, "backend": GovernorTuningBackend.name, "periods": periods},
+        "gpu_freq_setting": None
+    }
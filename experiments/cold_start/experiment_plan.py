@@ -0,0 +1,455 @@
+"""
+声明式实验计划
+用一个JSON/YAML计划文件描述要测试的App、频率配置、重复次数、trace配置和测试间隔，
+规划器将其展开为去重后的运行列表，跳过结果库中已有数据的单元格，并在开始前估算设备占用时间
+
+计划文件示例（JSON，注释仅为说明）：
+{
+    "name": "FreqMatrix",
+    "apps": ["微信", "QQ"],                  // 或 "all"
+    "configs": [
+        "默认调度",                           // 内置配置：默认调度 / 最大频率 / 自定义频率
+        "自定义频率",
+        {"name": "小核限频", "cpu_freq_settings": {"0": 1328000}}
+    ],
+    "trials": 3,
+    "trace": {"duration": 30, "config_file": "/data/misc/perfetto-configs/HardwareInfo.pbtx"},
+    "pacing": {"thermal_threshold_c": 45, "max_wait_s": 180},
+    "measure": {"mode": "fast", "verify_fraction": 0.1},  // 可选，默认为完整trace
+    "result_store": "results/freq_matrix.jsonl"
+}
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+from datetime import datetime
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.cold_start.run_experiment import run_cold_start_experiment
+from experiments.cold_start.analyze_trace import analyze_cold_start_trace
+from experiments.cold_start.batch_test import APPS, APP_FREQ_CONFIGS
+from experiments.cold_start.thermal_pacing import ThermalPacer
+from experiments.device import resolve_device
+
+try:
+    import yaml
+    _YAML_AVAILABLE = True
+except ImportError:
+    _YAML_AVAILABLE = False
+
+
+# 内置配置（与 compare_freq_configs 中的三种配置一致）
+BUILTIN_CONFIGS = {
+    "默认调度": {"max_frequency": False, "cpu_freq_settings": None, "gpu_freq_setting": None},
+    "最大频率": {"max_frequency": True, "cpu_freq_settings": None, "gpu_freq_setting": None},
+    # 自定义频率：按App从 APP_FREQ_CONFIGS 展开
+    "自定义频率": None,
+}
+
+# 没有历史数据时，单次运行的设备占用时间估算（秒）
+# run_cold_start_experiment 的固定等待：设置频率2 + 停止应用1+2 + 启动perfetto2 + 启动等待5 + 停止perfetto3，
+# 加上拉取trace、关闭应用和adb往返，约20秒
+DEFAULT_RUN_SECONDS = 20.0
+# 快速测量：停止应用1+2 + 采样窗口5，约10秒
+DEFAULT_FAST_RUN_SECONDS = 10.0
+
+DEFAULT_TRACE = {
+    "duration": 30,
+    "config_file": "/data/misc/perfetto-configs/HardwareInfo.pbtx"
+}
+
+DEFAULT_PACING = {
+    "thermal_threshold_c": 45.0,
+    "max_wait_s": 180.0
+}
+
+# 测量方式：trace（perfetto完整追踪）/ fast（am start -W + 电池采样）
+DEFAULT_MEASURE = {
+    "mode": "trace",
+    "verify_fraction": 0.0
+}
+
+
+def load_plan(plan_file):
+    """
+    读取计划文件（.json / .yaml / .yml）
+
+    Returns:
+        dict: 计划内容
+    """
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        if plan_file.endswith(('.yaml', '.yml')):
+            if not _YAML_AVAILABLE:
+                raise ImportError("读取YAML计划需要安装PyYAML: pip install pyyaml")
+            plan = yaml.safe_load(f)
+        else:
+            plan = json.load(f)
+    if not isinstance(plan, dict):
+        raise ValueError(f"计划文件格式错误: {plan_file}")
+    plan.setdefault("name", os.path.splitext(os.path.basename(plan_file))[0])
+    return plan
+
+
+def config_hash(config):
+    """配置内容的短哈希，配置内容改变后旧结果不会被误认为同一单元格"""
+    payload = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:10]
+
+
+def cell_key(run):
+    """运行单元格的唯一标识：App包名 + 配置名 + 配置哈希 + trace配置 + 测量方式 + 第几次重复"""
+    return "|".join([
+        run["package_name"],
+        run["config_name"],
+        run["config_hash"],
+        run["trace_config_file"],
+        run["measure_mode"],
+        str(run["trial"])
+    ])
+
+
+def _resolve_apps(apps):
+    """将计划中的apps字段解析为 {app_name: package_name}"""
+    if apps in (None, "all"):
+        return dict(APPS)
+    if isinstance(apps, dict):
+        return dict(apps)
+    resolved = {}
+    for name in apps:
+        if name in APPS:
+            resolved[name] = APPS[name]
+        elif "." in name:
+            # 直接写包名
+            resolved[name] = name
+        else:
+            print(f"⚠️  警告: 未知App名称 '{name}'，跳过")
+    return resolved
+
+
+def _resolve_config(entry, app_name):
+    """
+    将计划中的一个配置条目解析为 (配置名, run_cold_start_experiment参数)
+
+    Returns:
+        tuple 或 None（该App没有此配置，例如未配置自定义频率）
+    """
+    if isinstance(entry, str):
+        if entry not in BUILTIN_CONFIGS:
+            raise ValueError(f"未知的内置配置: {entry}")
+        if entry == "自定义频率":
+            app_config = APP_FREQ_CONFIGS.get(app_name)
+            if not app_config:
+                return None
+            return entry, {
+                "max_frequency": False,
+                "cpu_freq_settings": app_config.get("cpu_freq_settings"),
+                "gpu_freq_setting": app_config.get("gpu_freq_setting")
+            }
+        return entry, dict(BUILTIN_CONFIGS[entry])
+
+    if not isinstance(entry, dict) or "name" not in entry:
+        raise ValueError(f"配置条目必须是内置配置名或带name字段的dict: {entry!r}")
+    # 按App覆盖：{"name": ..., "per_app": {app_name: {...}}}
+    params = entry.get("per_app", {}).get(app_name, entry)
+    return entry["name"], {
+        "max_frequency": bool(params.get("max_frequency", False)),
+        "cpu_freq_settings": params.get("cpu_freq_settings"),
+        "gpu_freq_setting": params.get("gpu_freq_setting")
+    }
+
+
+def expand_plan(plan):
+    """
+    将计划展开为去重后的运行列表
+
+    快速测量模式下，按 verify_fraction 抽样的单元格会额外加入一次完整trace测量（measure_mode为trace），
+    抽样使用固定种子，同一计划每次展开的结果相同，已验证过的单元格不会重复测量
+
+    Returns:
+        list[dict]: 每个元素为一次运行，包含 app_name、package_name、config_name、config_hash、
+                    trial、params（run_cold_start_experiment参数）、trace_duration、trace_config_file、
+                    measure_mode、key
+    """
+    apps = _resolve_apps(plan.get("apps"))
+    configs = plan.get("configs") or list(BUILTIN_CONFIGS.keys())
+    trials = int(plan.get("trials", 1))
+    trace = {**DEFAULT_TRACE, **(plan.get("trace") or {})}
+    measure = {**DEFAULT_MEASURE, **(plan.get("measure") or {})}
+    if measure["mode"] not in ("trace", "fast"):
+        raise ValueError(f"未知的测量方式: {measure['mode']}")
+    verify_rng = random.Random(0)
+
+    runs = []
+    seen = set()
+    # 按重复次数在外层循环，同一轮内各配置交替进行，避免温度漂移集中影响某一个配置
+    for trial in range(trials):
+        for app_name, package_name in apps.items():
+            for entry in configs:
+                resolved = _resolve_config(entry, app_name)
+                if resolved is None:
+                    continue
+                config_name, params = resolved
+                run = {
+                    "app_name": app_name,
+                    "package_name": package_name,
+                    "config_name": config_name,
+                    "config_hash": config_hash(params),
+                    "trial": trial,
+                    "params": params,
+                    "trace_duration": trace["duration"],
+                    "trace_config_file": trace["config_file"],
+                    "measure_mode": measure["mode"]
+                }
+                variants = [run]
+                if measure["mode"] == "fast" and verify_rng.random() < measure["verify_fraction"]:
+                    variants.append({**run, "measure_mode": "trace"})
+                for variant in variants:
+                    variant["key"] = cell_key(variant)
+                    if variant["key"] in seen:
+                        continue
+                    seen.add(variant["key"])
+                    runs.append(variant)
+    return runs
+
+
+class ResultStore:
+    """
+    JSONL结果库
+    每行一条运行记录，字段包含 key、status、启动时长和功耗等指标
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    # 同一单元格有多条记录时，以最后一条为准
+                    self.records[record.get("key")] = record
+
+    def has_result(self, key):
+        """该单元格是否已有测量结果（成功分析，或以 --no-analyze 方式生成了trace）"""
+        record = self.records.get(key)
+        return record is not None and record.get("status") in ("success", "trace_only")
+
+    def append(self, record):
+        """追加一条记录（立即落盘，中断后已完成的单元格不会丢失）"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records[record["key"]] = record
+
+    def mean_elapsed_s(self, config_name=None, measure_mode=None):
+        """历史记录中单次运行的平均耗时（秒），用于估算设备占用时间"""
+        elapsed = [
+            r["elapsed_s"] for r in self.records.values()
+            if r.get("elapsed_s") is not None
+            and (config_name is None or r.get("config_name") == config_name)
+            and (measure_mode is None or r.get("measure_mode", "trace") == measure_mode)
+        ]
+        return sum(elapsed) / len(elapsed) if elapsed else None
+
+
+def estimate_device_time(runs, store=None):
+    """
+    估算运行列表的设备占用时间
+
+    优先使用结果库中同名配置、同测量方式的历史平均耗时，否则使用默认估算值
+
+    Returns:
+        float: 估算总时长（秒）
+    """
+    total = 0.0
+    for run in runs:
+        per_run = None
+        if store is not None:
+            per_run = store.mean_elapsed_s(run["config_name"], run["measure_mode"]) or store.mean_elapsed_s()
+        if per_run is None:
+            per_run = DEFAULT_FAST_RUN_SECONDS if run["measure_mode"] == "fast" else DEFAULT_RUN_SECONDS
+        total += per_run
+    return total
+
+
+def _format_duration(seconds):
+    """将秒数格式化为 x小时y分z秒"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}小时{minutes}分{secs}秒"
+    if minutes:
+        return f"{minutes}分{secs}秒"
+    return f"{secs}秒"
+
+
+def _default_store_path(plan):
+    """计划未指定result_store时的默认结果库路径"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(script_dir))
+    return os.path.join(project_root, "Perfetto", "trace", "traceAnalysis", "results",
+                        plan["name"], "result_store.jsonl")
+
+
+def run_plan(plan, store_path=None, analyze=True, dry_run=False, device=None):
+    """
+    执行实验计划
+
+    Args:
+        plan: load_plan 返回的计划
+        store_path: 结果库路径，None时使用计划中的 result_store 或默认路径
+        analyze: 是否分析trace（不分析时只记录trace文件路径）
+        dry_run: 只打印运行列表和时间估算，不执行
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+
+    Returns:
+        list[dict]: 本次执行产生的记录
+    """
+    store_path = store_path or plan.get("result_store") or _default_store_path(plan)
+    store = ResultStore(store_path)
+
+    runs = expand_plan(plan)
+    pending = [run for run in runs if not store.has_result(run["key"])]
+
+    print("=" * 80)
+    print(f"📋 实验计划: {plan['name']}")
+    print("=" * 80)
+    print(f"🔢 单元格总数: {len(runs)}（已去重）")
+    print(f"✅ 已有结果（跳过）: {len(runs) - len(pending)}")
+    print(f"⏳ 待执行: {len(pending)}")
+    print(f"💾 结果库: {store_path}")
+    print(f"⏱️  预计设备占用时间: {_format_duration(estimate_device_time(pending, store))}")
+    print("=" * 80)
+
+    if dry_run:
+        for run in pending:
+            print(f"   {run['app_name']:<12} {run['config_name']:<12} {run['measure_mode']:<6} "
+                  f"trial={run['trial']}  [{run['config_hash']}]")
+        return []
+
+    device = resolve_device(device)
+    pacing = {**DEFAULT_PACING, **(plan.get("pacing") or {})}
+    pacer = ThermalPacer(device, threshold_c=pacing["thermal_threshold_c"], max_wait_s=pacing["max_wait_s"])
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(store_path)), "traces")
+
+    new_records = []
+    for idx, run in enumerate(pending, 1):
+        print("\n" + "=" * 80)
+        print(f"[{idx}/{len(pending)}] {run['app_name']} / {run['config_name']} / trial {run['trial']}")
+        print("=" * 80)
+
+        record = {
+            "key": run["key"],
+            "plan": plan["name"],
+            "app_name": run["app_name"],
+            "package_name": run["package_name"],
+            "config_name": run["config_name"],
+            "config_hash": run["config_hash"],
+            "measure_mode": run["measure_mode"],
+            "trial": run["trial"],
+            "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        }
+        if device.serial:
+            record["device"] = device.serial
+
+        run_start = time.time()
+        try:
+            record.update(pacer.wait_until_cool())
+            outcome = run_cold_start_experiment(
+                package_name=run["package_name"],
+                experiment_name=f"{plan['name']}_{run['app_name']}_{run['config_name']}",
+                trace_duration=run["trace_duration"],
+                config_file=run["trace_config_file"],
+                device=device,
+                measure_mode=run["measure_mode"],
+                **run["params"]
+            )
+            if run["measure_mode"] == "fast":
+                # 快速模式直接返回结果dict
+                if outcome:
+                    record.update({
+                        "status": "success",
+                        "cold_start_duration_ms": outcome.get('cold_start_duration_ms'),
+                        "wait_time_ms": outcome.get('wait_time_ms'),
+                        "avg_power_mw": outcome.get('avg_power_mw'),
+                        "total_power_consumption_j": outcome.get('total_power_consumption_j'),
+                        "avg_current_ma": outcome.get('avg_current_ma'),
+                    })
+                else:
+                    record.update({"status": "failed", "error": "快速测量失败"})
+            elif not outcome:
+                record.update({"status": "failed", "error": "无法获取trace文件"})
+            elif not analyze:
+                record.update({"status": "trace_only", "trace_file": str(outcome)})
+            else:
+                trace_file = outcome
+                cell_dir = os.path.join(output_dir, run["app_name"], run["config_name"], f"trial{run['trial']}")
+                os.makedirs(cell_dir, exist_ok=True)
+                analysis = analyze_cold_start_trace(
+                    trace_path=trace_file,
+                    package_name=run["package_name"],
+                    output_dir=cell_dir,
+                    device=device
+                )
+                if analysis:
+                    record.update({
+                        "status": "success",
+                        "trace_file": str(trace_file),
+                        "cold_start_duration_ms": analysis.get('cold_start_duration_ms'),
+                        "avg_power_mw": analysis.get('avg_power_mw'),
+                        "total_power_consumption_j": analysis.get('total_power_consumption_j'),
+                        "avg_current_ma": analysis.get('avg_current_ma'),
+                    })
+                else:
+                    record.update({"status": "failed", "trace_file": str(trace_file), "error": "分析失败"})
+        except Exception as e:
+            print(f"❌ 运行失败: {e}")
+            record.update({"status": "failed", "error": str(e)})
+
+        # 耗时不含等待降温的时间，等待时间单独记录在 pacing_wait_s
+        record["elapsed_s"] = round(time.time() - run_start - record.get("pacing_wait_s", 0), 2)
+        store.append(record)
+        new_records.append(record)
+
+        status_icon = "✅" if record["status"] == "success" else "❌"
+        print(f"{status_icon} {run['app_name']} / {run['config_name']} / trial {run['trial']}: {record['status']}")
+
+    succeeded = sum(1 for r in new_records if r["status"] == "success")
+    print("\n" + "=" * 80)
+    print(f"📊 计划执行完成: 成功 {succeeded}/{len(new_records)}")
+    print(f"💾 结果库: {store_path}")
+    print("=" * 80)
+    return new_records
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='按计划文件执行冷启动实验（自动跳过已有结果的单元格）')
+    parser.add_argument('plan_file', help='计划文件路径（.json / .yaml）')
+    parser.add_argument('--store', help='结果库路径（JSONL，默认使用计划中的 result_store）')
+    parser.add_argument('--dry-run', action='store_true', help='只打印待执行的运行列表和时间估算')
+    parser.add_argument('--no-analyze', action='store_true', help='不分析trace文件，只生成trace文件')
+    parser.add_argument('--serial', help='目标设备序列号（多台设备连接时必须指定）')
+
+    args = parser.parse_args()
+
+    run_plan(
+        load_plan(args.plan_file),
+        store_path=args.store,
+        analyze=not args.no_analyze,
+        dry_run=args.dry_run,
+        device=args.serial
+    )
@@ -0,0 +1,251 @@
+"""
+快速启动测量
+不启动perfetto，使用 `am start -W` 的 TotalTime/WaitTime 作为启动时长，
+同时在设备端用一个shell循环采样电池电流/电压，计算启动区间的功耗。
+用于大范围配置筛选，单次测量的成本远低于 perfetto追踪 + 拉取 + trace_processor分析
+"""
+import os
+import re
+import sys
+import time
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+
+
+BATTERY_PATH = "/sys/class/power_supply/battery"
+
+# 设备端测量脚本（一次adb shell调用完成采样和启动）
+# 输出格式：
+#   S <时间戳ns> <current_now(uA)> <voltage_now(uV)>   采样点
+#   L <时间戳ns>                                       am start 开始时间
+#   am start -W 的原始输出（TotalTime / WaitTime 等）
+# 采样循环放到后台后立即启动App（不额外等待），主线程的时间段时钟以启动时刻为起点
+FAST_MEASURE_SCRIPT = (
+    "P={battery}; "
+    "end=$(( $(date +%s%N) + {window_ns} )); "
+    "( while [ $(date +%s%N) -lt $end ]; do "
+    "echo \"S $(date +%s%N) $(cat $P/current_now) $(cat $P/voltage_now)\"; "
+    "sleep {interval_s}; "
+    "done ) & "
+    "echo \"L $(date +%s%N)\"; "
+    "am start -W -n {component}; "
+    "wait"
+)
+
+_AM_FIELD_RE = re.compile(r"^(TotalTime|WaitTime|ThisTime|LaunchState|Status):\s*(\S+)", re.MULTILINE)
+
+
+def resolve_launch_activity(package_name, device=None):
+    """
+    查询App的启动Activity
+
+    Returns:
+        str: "包名/Activity"，失败返回None
+    """
+    device = resolve_device(device)
+    try:
+        output = device.shell(
+            f"cmd package resolve-activity --brief -c android.intent.category.LAUNCHER {package_name}"
+        )
+    except AdbError:
+        return None
+    # 输出最后一行形如 com.tencent.mm/.ui.LauncherUI
+    lines = [line.strip() for line in output.splitlines() if "/" in line]
+    return lines[-1] if lines else None
+
+
+def parse_fast_output(output):
+    """
+    解析 FAST_MEASURE_SCRIPT 的输出
+
+    Returns:
+        tuple: (am_fields, launch_ns, samples)
+            am_fields: {'TotalTime': '523', 'WaitTime': '530', ...}
+            launch_ns: am start 开始时间（设备时钟，ns）
+            samples: [(timestamp_ns, current_ua, voltage_uv)]
+    """
+    am_fields = dict(_AM_FIELD_RE.findall(output))
+    launch_ns = None
+    samples = []
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == "L":
+            try:
+                launch_ns = int(parts[1])
+            except ValueError:
+                pass
+        elif len(parts) == 4 and parts[0] == "S":
+            try:
+                samples.append((int(parts[1]), int(parts[2]), int(parts[3])))
+            except ValueError:
+                continue
+    return am_fields, launch_ns, samples
+
+
+def summarize_power(samples, start_ns, end_ns):
+    """
+    计算启动区间 [start_ns, end_ns] 的功耗统计
+
+    区间内没有采样点时，使用区间前后最近的两个采样点。
+    总功耗 = 平均功率 × 区间长度（采样间隔较大，不做梯形积分以免丢掉区间两端）
+
+    Returns:
+        dict: 与 analyze_cold_start_trace 相同字段名的功耗统计，没有采样数据时为空dict
+    """
+    if not samples:
+        return {}
+    window = [s for s in samples if start_ns <= s[0] <= end_ns]
+    if not window:
+        before = [s for s in samples if s[0] < start_ns]
+        after = [s for s in samples if s[0] > end_ns]
+        window = ([before[-1]] if before else []) + ([after[0]] if after else [])
+    if not window:
+        return {}
+
+    # 电流符号因设备而异（放电时可能为负），统一取绝对值
+    currents_ma = [abs(s[1]) / 1000.0 for s in window]
+    voltages_v = [s[2] / 1000000.0 for s in window]
+    powers_mw = [i * v for i, v in zip(currents_ma, voltages_v)]
+
+    avg_power_mw = sum(powers_mw) / len(powers_mw)
+    duration_s = (end_ns - start_ns) / 1e9
+    total_power_consumption_mj = avg_power_mw * duration_s
+    return {
+        'avg_power_mw': avg_power_mw,
+        'max_power_mw': max(powers_mw),
+        'min_power_mw': min(powers_mw),
+        'avg_current_ma': sum(currents_ma) / len(currents_ma),
+        'max_current_ma': max(currents_ma),
+        'min_current_ma': min(currents_ma),
+        'avg_voltage_v': sum(voltages_v) / len(voltages_v),
+        'max_voltage_v': max(voltages_v),
+        'min_voltage_v': min(voltages_v),
+        'total_power_consumption_mj': total_power_consumption_mj,
+        'total_power_consumption_j': total_power_consumption_mj / 1000.0,
+        'power_sample_count': len(window)
+    }
+
+
+class FastStartupMeasurement:
+    """
+    在后台线程中执行一次快速测量
+
+    用法：
+        m = FastStartupMeasurement(package_name, device=device)
+        m.start()      # 立即返回，am start 在后台执行
+        ...            # 主线程可以同时按时间段切换频率
+        results = m.join()
+    """
+
+    def __init__(self, package_name, activity_name=None, device=None,
+                 window_s=5.0, interval_s=0.02):
+        """
+        Args:
+            package_name: 应用包名
+            activity_name: 启动Activity（可选，不指定时自动查询）
+            device: 目标设备（序列号或Device对象，None为adb默认设备）
+            window_s: 功耗采样总时长（秒），需覆盖整个启动过程
+            interval_s: 采样间隔（秒），采样循环本身也占用CPU，不宜过小
+        """
+        self.package_name = package_name
+        self.activity_name = activity_name
+        self.device = resolve_device(device)
+        self.window_s = window_s
+        self.interval_s = interval_s
+        self._thread = None
+        self._output = None
+        self._error = None
+        # 估计的 am start 开始时间（本机 time.time_ns()），start() 成功后设置，作为时间段的起点
+        self.launch_time_ns = None
+
+    def _component(self):
+        if self.activity_name:
+            return f"{self.package_name}/{self.activity_name}"
+        return resolve_launch_activity(self.package_name, self.device)
+
+    def _run(self, component):
+        script = FAST_MEASURE_SCRIPT.format(
+            battery=BATTERY_PATH,
+            window_ns=int(self.window_s * 1e9),
+            interval_s=self.interval_s,
+            component=component
+        )
+        try:
+            # 脚本会阻塞数秒，不占用共享会话（主线程需要同时切换频率）
+            self._output = self.device.shell(script, use_session=False)
+        except AdbError as e:
+            self._error = e
+
+    def _spawn_delay_ns(self):
+        """
+        估计从启动非会话adb shell到设备端开始执行脚本的时间：空命令往返时间的一半
+        （在解析启动Activity之后、记录启动时间之前测量）
+        """
+        start = time.perf_counter()
+        try:
+            self.device.shell("true", use_session=False)
+        except AdbError:
+            return 0
+        return int((time.perf_counter() - start) * 1e9 / 2)
+
+    def start(self):
+        """
+        开始测量，返回是否成功启动
+
+        启动Activity在记录启动时间之前解析，launch_time_ns 为脚本开始执行（随即 am start）的估计时间
+        """
+        component = self._component()
+        if not component:
+            print(f"❌ 无法确定 {self.package_name} 的启动Activity")
+            return False
+        spawn_delay_ns = self._spawn_delay_ns()
+        self._thread = threading.Thread(target=self._run, args=(component,), daemon=True)
+        self.launch_time_ns = time.time_ns() + spawn_delay_ns
+        self._thread.start()
+        print(f"✅ 已启动应用（快速测量）: {component}")
+        return True
+
+    def join(self):
+        """
+        等待测量结束并解析结果
+
+        Returns:
+            dict: 与 analyze_cold_start_trace 结果同名的字段（cold_start_duration_ms、avg_power_mw、
+                  total_power_consumption_j 等），以及 wait_time_ms、measure_mode；失败返回None
+        """
+        if self._thread is None:
+            return None
+        self._thread.join(timeout=self.window_s + 30)
+        if self._error is not None:
+            print(f"❌ 快速测量失败: {self._error}")
+            return None
+        if not self._output:
+            print("❌ 快速测量没有输出")
+            return None
+
+        am_fields, launch_ns, samples = parse_fast_output(self._output)
+        if "TotalTime" not in am_fields:
+            print(f"❌ am start 没有返回TotalTime（Status: {am_fields.get('Status', 'unknown')}）")
+            return None
+
+        total_time_ms = float(am_fields["TotalTime"])
+        results = {
+            'measure_mode': 'fast',
+            'cold_start_duration_ms': total_time_ms,
+            'cold_start_duration_s': total_time_ms / 1000.0,
+            'wait_time_ms': float(am_fields["WaitTime"]) if "WaitTime" in am_fields else None,
+            'launch_state': am_fields.get("LaunchState"),
+        }
+        if launch_ns is not None:
+            results.update(summarize_power(samples, launch_ns, launch_ns + int(total_time_ms * 1e6)))
+        if results.get('avg_power_mw') is None:
+            print("⚠️  未采集到电池电流/电压数据，只记录启动时长")
+
+        print(f"⏱️  TotalTime: {total_time_ms:.0f} ms, WaitTime: {results['wait_time_ms']} ms")
+        if results.get('avg_power_mw') is not None:
+            print(f"⚡ 平均功率: {results['avg_power_mw']:.1f} mW, "
+                  f"总功耗: {results['total_power_consumption_j']:.3f} J（{results['power_sample_count']}个采样点）")
+        return results
@@ -14,7 +14,6 @@ try:
     from experiments.cpu.set_cpu_max_freq import (
         set_all_policies_to_max as cpu_set_all_policies_to_max,
         restore_all_policies_frequency as cpu_restore_all_policies_frequency,
-        list_cpu_domains,
         adb_shell as cpu_adb_shell
     )
     _CPU_MODULE_AVAILABLE = True
@@ -29,21 +28,26 @@ try:
     # 导入GPU模块
     from experiments.gpu.set_gpu_max_freq import (
         set_gpu_to_max as gpu_set_gpu_to_max,
-        restore_gpu_frequency as gpu_restore_gpu_frequency,
-        get_gpu_info
+        restore_gpu_frequency as gpu_restore_gpu_frequency
     )
     _GPU_MODULE_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️  无法导入GPU频率管理模块: {e}")
     _GPU_MODULE_AVAILABLE = False
 
+from experiments.cold_start.frequency_plan import FrequencyPlan
+from experiments.device.topology import get_topology
 
-def set_all_frequencies_to_max():
+
+def set_all_frequencies_to_max(device=None):
     """
     设置所有CPU和GPU到最大频率
     
     注意：最大频率模式仍然通过ADB设置（不使用eBPF）
     
+    Args:
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+    
     Returns:
         dict: 包含原始频率设置，用于恢复
     """
@@ -55,7 +59,7 @@ def set_all_frequencies_to_max():
     # 设置CPU（使用experiments.cpu模块）
     if _CPU_MODULE_AVAILABLE:
         try:
-            original_settings['cpu_freqs'] = cpu_set_all_policies_to_max()
+            original_settings['cpu_freqs'] = cpu_set_all_policies_to_max(device)
         except Exception as e:
             print(f"⚠️  设置CPU频率失败: {e}")
             original_settings['cpu_freqs'] = None
@@ -65,7 +69,7 @@ def set_all_frequencies_to_max():
     # 设置GPU（使用experiments.gpu模块）
     if _GPU_MODULE_AVAILABLE:
         try:
-            original_settings['gpu_freq'] = gpu_set_gpu_to_max(save_original=True)
+            original_settings['gpu_freq'] = gpu_set_gpu_to_max(save_original=True, device=device)
         except Exception as e:
             print(f"⚠️  设置GPU频率失败: {e}")
             original_settings['gpu_freq'] = None
@@ -76,7 +80,7 @@ def set_all_frequencies_to_max():
     return original_settings
 
 
-def restore_all_frequencies(original_settings=None):
+def restore_all_frequencies(original_settings=None, device=None):
     """
     恢复所有频率设置
     
@@ -86,6 +90,7 @@ def restore_all_frequencies(original_settings=None):
     
     Args:
         original_settings: 原始频率设置（用于ADB方式恢复），如果为None则从设备读取
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
     """
     # 只有当original_settings不为None时，说明是通过ADB设置的最大频率，需要恢复
     # 如果original_settings为None，说明是使用eBPF方式，eBPF程序会自动处理，这里不需要恢复
@@ -96,7 +101,7 @@ def restore_all_frequencies(original_settings=None):
     # 恢复CPU频率（使用experiments.cpu模块）
     if _CPU_MODULE_AVAILABLE:
         try:
-            cpu_restore_all_policies_frequency()
+            cpu_restore_all_policies_frequency(device)
         except Exception as e:
             print(f"⚠️  恢复CPU频率失败: {e}")
     else:
@@ -105,7 +110,7 @@ def restore_all_frequencies(original_settings=None):
     # 恢复GPU频率（使用experiments.gpu模块）
     if _GPU_MODULE_AVAILABLE:
         try:
-            gpu_restore_gpu_frequency()
+            gpu_restore_gpu_frequency(device)
         except Exception as e:
             print(f"⚠️  恢复GPU频率失败: {e}")
     else:
@@ -114,215 +119,153 @@ def restore_all_frequencies(original_settings=None):
     print("✅ 频率设置已恢复（ADB方式）")
 
 
-def get_available_cpu_frequencies(cpu_id):
+def get_available_cpu_frequencies(cpu_id, device=None):
     """
     获取指定CPU的可用频率列表（KHz）
     
     Args:
         cpu_id: CPU核心ID
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
         
     Returns:
         list: 可用频率列表（KHz），如果失败返回None
+              （设备不提供scaling_available_frequencies时只有硬件最小和最大频率）
     """
-    if not _CPU_MODULE_AVAILABLE:
-        print(f"⚠️  CPU频率管理模块不可用")
-        return None
-    
     try:
-        # 获取所有CPU policy域
-        domains = list_cpu_domains()
-        
-        # 找到包含指定CPU的policy域
-        for domain in domains:
-            if domain.get("policy") == "N/A":
-                continue
-            
-            # 获取该policy域关联的CPU列表
-            cpus_str = domain.get("cpus", "")
-            if cpus_str == "unknown":
-                continue
-            
-            cpus = [int(c.strip()) for c in cpus_str.split() if c.strip().isdigit()]
-            
-            # 如果该policy域包含指定的CPU
-            if cpu_id in cpus:
-                policy_id = domain.get("policy")
-                policy_path = domain.get("path")
-                
-                # 读取可用频率列表
-                try:
-                    freqs_str = adb_shell(f"cat {policy_path}/scaling_available_frequencies 2>/dev/null", need_root=True).strip()
-                    if freqs_str:
-                        freqs = [int(f) for f in freqs_str.split() if f.isdigit()]
-                        if freqs:
-                            return freqs
-                except:
-                    pass
-                
-                # 如果scaling_available_frequencies不可用，尝试使用cpuinfo_min_freq和cpuinfo_max_freq的范围
-                try:
-                    min_freq_str = domain.get("min_freq", "")
-                    max_freq_str = domain.get("max_freq", "")
-                    if min_freq_str.isdigit() and max_freq_str.isdigit():
-                        # 返回最小和最大频率（虽然这不是完整的列表，但至少提供了范围）
-                        return [int(min_freq_str), int(max_freq_str)]
-                except:
-                    pass
-        
-        print(f"⚠️  无法找到CPU {cpu_id}的频率信息")
-        return None
+        policy_id, policy = get_topology(device).policy_for_cpu(cpu_id)
     except Exception as e:
         print(f"⚠️  获取CPU {cpu_id}可用频率失败: {e}")
         return None
+    
+    if policy is None or not policy['available_freqs']:
+        print(f"⚠️  无法找到CPU {cpu_id}的频率信息")
+        return None
+    return list(policy['available_freqs'])
 
 
-def get_available_gpu_frequencies():
+def get_available_gpu_frequencies(device=None):
     """
     获取GPU的可用频率列表（Hz）
     
+    Args:
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+    
     Returns:
         list: 可用频率列表（Hz），如果失败返回None
     """
-    if not _GPU_MODULE_AVAILABLE:
-        print("⚠️  GPU频率管理模块不可用")
+    try:
+        gpu = get_topology(device).gpu
+    except Exception as e:
+        print(f"⚠️  获取GPU可用频率失败: {e}")
+        return None
+    
+    if not gpu or not gpu['available_freqs']:
+        print("⚠️  无法获取GPU可用频率列表")
         return None
+    return list(gpu['available_freqs'])
+
+
+def get_available_devfreq_frequencies(domain, device=None):
+    """
+    获取devfreq域（DDR、总线、缓存等）的可用频率列表
     
+    Args:
+        domain: 域名、类型（ddr / bus / cache）或域名的一部分，见 DeviceTopology.resolve_devfreq
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+    
+    Returns:
+        list: 可用频率列表（单位以驱动为准），如果失败返回None
+    """
     try:
-        info = get_gpu_info()
-        if info and 'available_freqs_hz' in info:
-            return info['available_freqs_hz']
-        else:
-            print("⚠️  无法获取GPU可用频率列表")
-            return None
+        topology = get_topology(device)
+        info = topology.devfreq[topology.resolve_devfreq(domain)]
     except Exception as e:
-        print(f"⚠️  获取GPU可用频率失败: {e}")
+        print(f"⚠️  获取devfreq可用频率失败: {e}")
         return None
+    
+    if not info['available_freqs']:
+        print(f"⚠️  devfreq域 {domain} 没有可用频率列表")
+        return None
+    return list(info['available_freqs'])
 
 
-def set_cpu_frequencies(cpu_freq_settings):
+def apply_frequency_plan(cpu_freq_settings=None, gpu_freq_setting=None, device=None, devfreq_settings=None):
+    """
+    一次adb往返设置一组完整的CPU + GPU + devfreq频率（见 frequency_plan.FrequencyPlan）
+    
+    Args:
+        cpu_freq_settings: dict，格式为 {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
+        gpu_freq_setting: int/float (Hz) 或 dict {'min': min_hz, 'max': max_hz}
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        devfreq_settings: dict，格式为 {域: freq} 或 {域: {'min': ..., 'max': ...}}，
+                          域可以是域名、类型（ddr / bus / cache）或域名的一部分（如 mif）
+    
+    Returns:
+        dict: FrequencyPlan.apply() 的结果（每个目标的回读值、原始值和应用耗时），格式无效时返回None
+    """
+    try:
+        if devfreq_settings:
+            topology = get_topology(device)
+            devfreq_settings = {topology.resolve_devfreq(key): value for key, value in devfreq_settings.items()}
+        plan = FrequencyPlan(cpu_freq_settings, gpu_freq_setting, devfreq_settings)
+    except KeyError as e:
+        print(f"⚠️  无效的devfreq设置: {e}")
+        return None
+    except ValueError as e:
+        print(f"⚠️  无效的频率设置: {e}")
+        return None
+    return plan.apply(device)
+
+
+def set_cpu_frequencies(cpu_freq_settings, device=None):
     """
     设置自定义CPU频率
     
     Args:
         cpu_freq_settings: dict，格式为 {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
                           例如: {'0': 1800000, '4': {'min': 1200000, 'max': 2300000}}
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
     
     Returns:
         dict: 原始频率设置，用于恢复
     """
-    if not _CPU_MODULE_AVAILABLE or adb_shell is None:
-        print("⚠️  CPU频率管理模块不可用")
+    result = apply_frequency_plan(cpu_freq_settings=cpu_freq_settings, device=device)
+    if not result:
         return None
     
     original_settings = {}
-    
-    try:
-        for policy_id, freq_setting in cpu_freq_settings.items():
-            policy_path = f"/sys/devices/system/cpu/cpufreq/policy{policy_id}"
-            
-            # 保存原始设置
-            try:
-                original_min = adb_shell(f"cat {policy_path}/scaling_min_freq", need_root=True).strip()
-                original_max = adb_shell(f"cat {policy_path}/scaling_max_freq", need_root=True).strip()
-                original_settings[policy_id] = {
-                    'min_freq_khz': int(original_min),
-                    'max_freq_khz': int(original_max)
-                }
-            except:
-                pass
-            
-            # 解析频率设置
-            if isinstance(freq_setting, dict):
-                min_freq = freq_setting.get('min', freq_setting.get('min_freq'))
-                max_freq = freq_setting.get('max', freq_setting.get('max_freq'))
-            elif isinstance(freq_setting, (int, float)):
-                # 单个值表示同时设置min和max
-                min_freq = max_freq = int(freq_setting)
-            else:
-                print(f"⚠️  policy{policy_id}: 无效的频率设置格式")
-                continue
-            
-            # 设置频率
-            min_path = f"{policy_path}/scaling_min_freq"
-            max_path = f"{policy_path}/scaling_max_freq"
-            
-            adb_shell(f"sh -c 'echo {min_freq} > {min_path}'", need_root=True)
-            adb_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
-            
-            if min_freq == max_freq:
-                print(f"✅ policy{policy_id}: {min_freq} KHz ({min_freq/1000:.0f} MHz)")
-            else:
-                print(f"✅ policy{policy_id}: {min_freq}-{max_freq} KHz ({min_freq/1000:.0f}-{max_freq/1000:.0f} MHz)")
-        
-        return original_settings if original_settings else None
-    except Exception as e:
-        print(f"⚠️  设置CPU频率失败: {e}")
-        return original_settings if original_settings else None
+    for tag, target in result['targets'].items():
+        if target.get('old_min') is not None and target.get('old_max') is not None:
+            original_settings[tag[len("policy"):]] = {
+                'min_freq_khz': target['old_min'],
+                'max_freq_khz': target['old_max']
+            }
+    return original_settings if original_settings else None
 
 
-def set_gpu_frequency(gpu_freq_setting):
+def set_gpu_frequency(gpu_freq_setting, device=None):
     """
     设置自定义GPU频率
     
     Args:
         gpu_freq_setting: int/float (Hz) 或 dict {'min': min_hz, 'max': max_hz}
                          例如: 150000000 或 {'min': 100000000, 'max': 850000000}
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
     
     Returns:
         dict: 原始频率设置，用于恢复
     """
-    if not _GPU_MODULE_AVAILABLE:
-        print("⚠️  GPU频率管理模块不可用")
+    result = apply_frequency_plan(gpu_freq_setting=gpu_freq_setting, device=device)
+    if not result:
         return None
     
-    try:
-        # 从GPU模块导入adb_shell（如果CPU模块不可用）
-        if adb_shell is None:
-            from experiments.gpu.set_gpu_max_freq import adb_shell as gpu_adb_shell
-            adb_shell_func = gpu_adb_shell
-        else:
-            adb_shell_func = adb_shell
-        
-        GPU_PATH = "/sys/devices/genpd:0:1f000000.mali/consumer:platform:1f000000.mali/consumer"
-        
-        # 保存原始设置
-        try:
-            original_min = adb_shell_func(f"cat {GPU_PATH}/scaling_min_freq", need_root=True).strip()
-            original_max = adb_shell_func(f"cat {GPU_PATH}/scaling_max_freq", need_root=True).strip()
-            original_settings = {
-                'min_freq_hz': int(original_min),
-                'max_freq_hz': int(original_max)
-            }
-        except:
-            original_settings = None
-        
-        # 解析频率设置
-        if isinstance(gpu_freq_setting, dict):
-            min_freq = int(gpu_freq_setting.get('min', gpu_freq_setting.get('min_freq', 0)))
-            max_freq = int(gpu_freq_setting.get('max', gpu_freq_setting.get('max_freq', 0)))
-        elif isinstance(gpu_freq_setting, (int, float)):
-            # 单个值表示同时设置min和max
-            min_freq = max_freq = int(gpu_freq_setting)
-        else:
-            print(f"⚠️  GPU: 无效的频率设置格式")
-            return None
-        
-        # 设置频率
-        min_path = f"{GPU_PATH}/scaling_min_freq"
-        max_path = f"{GPU_PATH}/scaling_max_freq"
-        
-        adb_shell_func(f"sh -c 'echo {min_freq} > {min_path}'", need_root=True)
-        adb_shell_func(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
-        
-        if min_freq == max_freq:
-            print(f"✅ GPU: {min_freq} Hz ({min_freq/1e6:.0f} MHz)")
-        else:
-            print(f"✅ GPU: {min_freq}-{max_freq} Hz ({min_freq/1e6:.0f}-{max_freq/1e6:.0f} MHz)")
-        
-        return original_settings
-    except Exception as e:
-        print(f"⚠️  设置GPU频率失败: {e}")
+    target = result['targets'].get('gpu', {})
+    if target.get('old_min') is None or target.get('old_max') is None:
         return None
+    return {
+        'min_freq_hz': target['old_min'],
+        'max_freq_hz': target['old_max']
+    }
 
 
 def set_custom_frequencies(cpu_freq_settings=None, gpu_freq_setting=None):
@@ -358,14 +301,15 @@ def set_custom_frequencies(cpu_freq_settings=None, gpu_freq_setting=None):
     return None
 
 
-def set_time_based_frequencies(periods, app_start_time_ns, current_time_ns):
+def set_time_based_frequencies(periods, app_start_time_ns, current_time_ns, device=None):
     """
     根据时间段配置设置频率（在App启动过程中动态调用）
     
     Args:
-        periods: 时间段配置列表，每个元素包含 start, end, cpu_freq, gpu_freq
+        periods: 时间段配置列表，每个元素包含 start, end, cpu_freq, gpu_freq（可选 devfreq）
         app_start_time_ns: App启动时间戳（纳秒）
         current_time_ns: 当前时间戳（纳秒）
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
     
     Returns:
         bool: 是否成功设置频率
@@ -383,14 +327,8 @@ def set_time_based_frequencies(periods, app_start_time_ns, current_time_ns):
         
         if start_s <= elapsed_s < end_s:
             # 找到匹配的时间段，设置频率
-            cpu_freq = period.get('cpu_freq')
-            gpu_freq = period.get('gpu_freq')
-            
-            if cpu_freq:
-                set_cpu_frequencies(cpu_freq)
-            if gpu_freq:
-                set_gpu_frequency(gpu_freq)
-            
-            return True
+            result = apply_frequency_plan(period.get('cpu_freq'), period.get('gpu_freq'), device=device,
+                                          devfreq_settings=period.get('devfreq'))
+            return bool(result and result['success'])
     
     return False
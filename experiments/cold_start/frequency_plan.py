@@ -0,0 +1,258 @@
+"""
+批量频率设置
+把一组完整的CPU + GPU + devfreq（DDR、总线、缓存等）频率目标编译成一个shell脚本，
+一次adb往返完成所有写入和回读。
+
+每个policy的min/max写入顺序在设备端按当前值决定：
+新的min高于当前max时（升频）先写max，否则（降频或区间重叠）先写min，
+避免内核因 min > max 拒绝写入。
+"""
+import os
+import sys
+import time
+import shlex
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+from experiments.device.topology import DEVFREQ_CLASS_PATH
+from experiments.gpu.set_gpu_max_freq import GPU_PATH
+
+
+CPUFREQ_PATH = "/sys/devices/system/cpu/cpufreq"
+# devfreq目标的标签前缀（标签形如 devfreq:17000010.devfreq_mif）
+DEVFREQ_TAG_PREFIX = "devfreq:"
+
+# 脚本前缀：sysfs_write 是唯一的写入入口，apply_range 负责排序、计时和回读
+# apply_range <标签> <目录> <min> <max> <当前频率文件名> [节点前缀]
+#   节点前缀默认为 scaling_（cpufreq和Mali GPU），标准devfreq的节点为 min_freq / max_freq，传空字符串
+# 输出格式（每个目标一行）：
+#   R <标签> <第一次写入rc> <第二次写入rc> <原min> <原max> <回读min> <回读max> <当前频率> <耗时ns>
+PLAN_SCRIPT_PRELUDE = """\
+sysfs_write() { echo "$2" > "$1" 2>/dev/null; }
+read_node() { cat "$1" 2>/dev/null || echo '?'; }
+apply_range() {
+  t0=$(date +%s%N)
+  pre=${6-scaling_}
+  old_min=$(read_node "$2/${pre}min_freq")
+  old_max=$(read_node "$2/${pre}max_freq")
+  if [ "$3" -gt "$old_max" ] 2>/dev/null; then
+    sysfs_write "$2/${pre}max_freq" "$4"; r1=$?
+    sysfs_write "$2/${pre}min_freq" "$3"; r2=$?
+  else
+    sysfs_write "$2/${pre}min_freq" "$3"; r1=$?
+    sysfs_write "$2/${pre}max_freq" "$4"; r2=$?
+  fi
+  t1=$(date +%s%N)
+  echo "R $1 $r1 $r2 $old_min $old_max $(read_node "$2/${pre}min_freq") $(read_node "$2/${pre}max_freq") $(read_node "$2/$5") $((t1 - t0))"
+}
+"""
+
+
+def parse_freq_range(freq_setting):
+    """
+    解析单个频率设置（与 APP_FREQ_CONFIGS 格式相同）
+
+    Args:
+        freq_setting: 单个值（min=max）或 {'min': ..., 'max': ...} / {'min_freq': ..., 'max_freq': ...}
+
+    Returns:
+        tuple: (min_freq, max_freq)
+
+    Raises:
+        ValueError: 格式无效
+    """
+    if isinstance(freq_setting, dict):
+        min_freq = freq_setting.get('min', freq_setting.get('min_freq'))
+        max_freq = freq_setting.get('max', freq_setting.get('max_freq'))
+        if min_freq is None or max_freq is None:
+            raise ValueError(f"频率设置缺少min或max: {freq_setting}")
+        min_freq, max_freq = int(min_freq), int(max_freq)
+    elif isinstance(freq_setting, (int, float)):
+        min_freq = max_freq = int(freq_setting)
+    else:
+        raise ValueError(f"无效的频率设置格式: {freq_setting!r}")
+    if min_freq > max_freq:
+        raise ValueError(f"min ({min_freq}) 大于 max ({max_freq})")
+    return min_freq, max_freq
+
+
+def range_node_prefix(tag):
+    """apply_range 使用的节点前缀：devfreq为空，cpufreq和GPU为 scaling_"""
+    return "" if tag.startswith(DEVFREQ_TAG_PREFIX) else "scaling_"
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class FrequencyPlan:
+    """
+    一组完整的CPU + GPU + devfreq频率目标
+
+    用法：
+        plan = FrequencyPlan({"0": 1696000, "4": 2130000, "7": 2687000}, 848000000,
+                             {"17000010.devfreq_mif": 3172000})
+        result = plan.apply(device)
+        ...
+        FrequencyPlan.restore_plan(result).apply(device)
+    """
+
+    def __init__(self, cpu_freq_settings=None, gpu_freq_setting=None, devfreq_settings=None):
+        """
+        Args:
+            cpu_freq_settings: {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
+            gpu_freq_setting: int (Hz) 或 {'min': min_hz, 'max': max_hz}
+            devfreq_settings: {devfreq域名: freq 或 {'min': ..., 'max': ...}}（单位以驱动为准，
+                              域名见 DeviceTopology.devfreq）
+
+        Raises:
+            ValueError: 频率格式无效，或传入了时间段配置（时间段配置需逐段生成计划）
+        """
+        if cpu_freq_settings and cpu_freq_settings.get("time_based"):
+            raise ValueError("时间段频率配置需要按时间段分别生成FrequencyPlan")
+        # [(标签, sysfs目录, min, max, 当前频率文件名)]
+        self.targets = []
+        for policy_id, freq_setting in sorted((cpu_freq_settings or {}).items(), key=lambda kv: int(kv[0])):
+            min_freq, max_freq = parse_freq_range(freq_setting)
+            self.targets.append((f"policy{policy_id}", f"{CPUFREQ_PATH}/policy{policy_id}",
+                                 min_freq, max_freq, "scaling_cur_freq"))
+        if gpu_freq_setting is not None:
+            min_freq, max_freq = parse_freq_range(gpu_freq_setting)
+            self.targets.append(("gpu", GPU_PATH, min_freq, max_freq, "cur_freq"))
+        for name, freq_setting in sorted((devfreq_settings or {}).items()):
+            min_freq, max_freq = parse_freq_range(freq_setting)
+            self.targets.append((f"{DEVFREQ_TAG_PREFIX}{name}", f"{DEVFREQ_CLASS_PATH}/{name}",
+                                 min_freq, max_freq, "cur_freq"))
+
+    def __repr__(self):
+        parts = [f"{tag}={lo}-{hi}" if lo != hi else f"{tag}={lo}" for tag, _, lo, hi, _ in self.targets]
+        return f"FrequencyPlan({', '.join(parts)})"
+
+    def __bool__(self):
+        return bool(self.targets)
+
+    @classmethod
+    def from_config(cls, config):
+        """从 APP_FREQ_CONFIGS 格式的配置创建（使用 cpu_freq_settings / gpu_freq_setting / devfreq_settings 字段）"""
+        return cls(config.get("cpu_freq_settings"), config.get("gpu_freq_setting"), config.get("devfreq_settings"))
+
+    @classmethod
+    def restore_plan(cls, result):
+        """
+        根据 apply() 的结果生成恢复原始频率范围的计划
+
+        Args:
+            result: apply() 的返回值
+
+        Returns:
+            FrequencyPlan: 原值无法读取的目标会被跳过
+        """
+        plan = cls()
+        for tag, target in result.get('targets', {}).items():
+            old_min, old_max = target.get('old_min'), target.get('old_max')
+            if old_min is not None and old_max is not None:
+                plan.targets.append((tag, target['path'], old_min, old_max, target['cur_file']))
+        return plan
+
+    def compile(self):
+        """
+        编译为设备端shell脚本
+
+        Returns:
+            str: 脚本内容（脚本本身总是以返回码0结束，单个目标的失败通过输出行报告）
+        """
+        lines = [PLAN_SCRIPT_PRELUDE]
+        for tag, path, min_freq, max_freq, cur_file in self.targets:
+            prefix = range_node_prefix(tag)
+            extra = f" {shlex.quote(prefix)}" if prefix != "scaling_" else ""
+            lines.append(f"apply_range {shlex.quote(tag)} {shlex.quote(path)} {min_freq} {max_freq} {cur_file}{extra}\n")
+        lines.append("true\n")
+        return "".join(lines)
+
+    def _parse(self, output):
+        """解析脚本输出为每个目标的结果"""
+        targets = {}
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) != 10 or parts[0] != "R":
+                continue
+            tag = parts[1]
+            targets[tag] = {
+                'write_rc': (_to_int(parts[2]), _to_int(parts[3])),
+                'old_min': _to_int(parts[4]),
+                'old_max': _to_int(parts[5]),
+                'min': _to_int(parts[6]),
+                'max': _to_int(parts[7]),
+                'cur': _to_int(parts[8]),
+                'apply_us': (_to_int(parts[9]) or 0) / 1000.0
+            }
+
+        for tag, path, min_freq, max_freq, cur_file in self.targets:
+            target = targets.setdefault(tag, {'error': '脚本没有输出该目标的结果'})
+            target['path'] = path
+            target['cur_file'] = cur_file
+            target['target_min'] = min_freq
+            target['target_max'] = max_freq
+            target['ok'] = target.get('min') == min_freq and target.get('max') == max_freq
+        return targets
+
+    def apply(self, device=None, verbose=True):
+        """
+        在设备上一次性应用整个计划
+
+        Args:
+            device: 目标设备（序列号或Device对象，None为adb默认设备）
+            verbose: 是否打印每个目标的结果
+
+        Returns:
+            dict: {
+                'success': 所有目标回读值都与目标一致,
+                'round_trip_ms': 主机侧往返耗时,
+                'targets': {标签: {ok, target_min, target_max, old_min, old_max, min, max, cur,
+                                   apply_us, write_rc, path, cur_file}}
+            }
+        """
+        device = resolve_device(device)
+        result = {'success': True, 'round_trip_ms': 0.0, 'targets': {}}
+        if not self.targets:
+            return result
+
+        start = time.perf_counter()
+        try:
+            output = device.run_script(self.compile(), need_root=True)
+        except AdbError as e:
+            print(f"❌ 应用频率计划失败: {e}")
+            result['success'] = False
+            result['error'] = str(e)
+            return result
+        result['round_trip_ms'] = (time.perf_counter() - start) * 1000.0
+        result['targets'] = self._parse(output)
+        result['success'] = all(t['ok'] for t in result['targets'].values())
+
+        if verbose:
+            for tag, _, _, _, _ in self.targets:
+                self._print_target(tag, result['targets'][tag])
+            print(f"⏱️  频率计划已应用（{len(self.targets)}个目标，往返 {result['round_trip_ms']:.1f} ms）")
+        return result
+
+    @staticmethod
+    def _print_target(tag, target):
+        lo, hi = target['target_min'], target['target_max']
+        if tag.startswith(DEVFREQ_TAG_PREFIX):
+            # devfreq的频率单位因驱动而异（Hz或KHz），按原值显示
+            scale, unit, label = 1, "", tag[len(DEVFREQ_TAG_PREFIX):]
+        else:
+            scale, unit = (1e6 if tag == "gpu" else 1e3), " MHz"
+            label = "GPU" if tag == "gpu" else tag
+        wanted = f"{lo/scale:.0f}{unit}" if lo == hi else f"{lo/scale:.0f}-{hi/scale:.0f}{unit}"
+        if 'error' in target:
+            print(f"❌ {label}: {wanted}（{target['error']}）")
+        elif target['ok']:
+            cur = f"{target['cur']/scale:.0f}{unit}" if target['cur'] is not None else "未知"
+            print(f"✅ {label}: {wanted}，当前 {cur}（{target['apply_us']:.0f} us）")
+        else:
+            print(f"⚠️  {label}: 目标 {wanted}，回读 {target['min']}-{target['max']}（写入返回码 {target['write_rc']}）")
@@ -0,0 +1,239 @@
+"""
+频率状态快照与恢复
+一次批量读取所有cpufreq policy和GPU devfreq的可写设置（调度器、scaling min/max、
+调度器参数如schedutil的rate_limit_us、厂商调参节点）、/sys/class/devfreq 下所有devfreq域
+（DDR、总线、缓存等）的调度器和min/max，以及加速用cgroup的uclamp/cpuset设置，
+退出时按原值精确恢复，
+而不是像 restore_policy_frequency 那样重置为 cpuinfo_* 硬件范围。
+
+用法：
+    with frequency_state(device):
+        set_all_frequencies_to_max(device)
+        ...   # 异常或Ctrl-C时同样会恢复
+"""
+import os
+import re
+import sys
+import time
+import shlex
+import signal
+import threading
+from contextlib import contextmanager
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+from experiments.device.topology import DEVFREQ_CLASS_PATH
+from experiments.cold_start.frequency_plan import CPUFREQ_PATH, PLAN_SCRIPT_PRELUDE, range_node_prefix
+from experiments.cold_start.control_backends import cgroup_nodes
+from experiments.gpu.set_gpu_max_freq import GPU_PATH
+
+
+# 需要保存的policy节点（调度器参数目录单独遍历）
+POLICY_NODES = ("scaling_governor", "scaling_min_freq", "scaling_max_freq")
+# 需要保存的GPU devfreq节点（不存在的节点会被跳过）
+GPU_NODES = ("governor", "scaling_min_freq", "scaling_max_freq", "power_policy", "dvfs_period")
+# 读取时列出全部选项、用方括号标出当前值的节点（如 "[coarse_demand] always_on"），只保存和恢复当前值
+CHOICE_NODES = ("power_policy",)
+_ACTIVE_CHOICE_RE = re.compile(r"\[([^\]]+)\]")
+# 需要保存的devfreq节点
+DEVFREQ_NODES = ("governor", "min_freq", "max_freq")
+# uclamp加速后端会修改的cgroup节点（见 control_backends.py）
+CGROUP_NODES = tuple(cgroup_nodes().values())
+
+# 快照脚本，输出格式：<范围>\t<节点路径>\t<值>
+# 调度器参数优先取per-policy目录（policyN/<governor>/），没有时取全局目录（cpufreq/<governor>/）
+SNAPSHOT_SCRIPT = """\
+dump_node() {{ [ -f "$2" ] && [ -r "$2" ] && printf '%s\\t%s\\t%s\\n' "$1" "$2" "$(cat "$2" 2>/dev/null)"; }}
+for p in {cpufreq}/policy*; do
+  [ -d "$p" ] || continue
+  scope=policy${{p##*policy}}
+  for a in {policy_nodes}; do dump_node $scope "$p/$a"; done
+  gov=$(cat "$p/scaling_governor" 2>/dev/null)
+  if [ -n "$gov" ] && [ -d "$p/$gov" ]; then tdir="$p/$gov"; else tdir="{cpufreq}/$gov"; fi
+  if [ -n "$gov" ] && [ -d "$tdir" ]; then
+    for t in "$tdir"/*; do dump_node $scope "$t"; done
+  fi
+done
+for a in {gpu_nodes}; do dump_node gpu "{gpu}/$a"; done
+for d in {devfreq}/*; do
+  [ -d "$d" ] || continue
+  for a in {devfreq_nodes}; do dump_node "devfreq:${{d##*/}}" "$d/$a"; done
+done
+for f in {cgroup_nodes}; do dump_node cgroup "$f"; done
+true
+"""
+
+
+def _is_governor_node(path):
+    return path.endswith("governor")
+
+
+def _active_choice(value):
+    """从 "[当前值] 其他选项" 中取出当前值，没有方括号时原样返回"""
+    match = _ACTIVE_CHOICE_RE.search(value)
+    return match.group(1) if match else value
+
+
+def _is_range_node(path):
+    return path.endswith(("/scaling_min_freq", "/scaling_max_freq", "/min_freq", "/max_freq"))
+
+
+def capture_frequency_state(device=None):
+    """
+    一次adb调用读取所有频率相关设置
+
+    Returns:
+        dict: {范围: {节点路径: 值}}，范围为 policyN、gpu、devfreq:<域名> 或 cgroup（保持读取顺序）；
+              CHOICE_NODES 只保存方括号中的当前值
+
+    Raises:
+        AdbError: 读取失败（例如设备未root）
+    """
+    device = resolve_device(device)
+    script = SNAPSHOT_SCRIPT.format(
+        cpufreq=CPUFREQ_PATH,
+        policy_nodes=" ".join(POLICY_NODES),
+        gpu=GPU_PATH,
+        gpu_nodes=" ".join(GPU_NODES),
+        devfreq=DEVFREQ_CLASS_PATH,
+        devfreq_nodes=" ".join(DEVFREQ_NODES),
+        cgroup_nodes=" ".join(CGROUP_NODES)
+    )
+    output = device.run_script(script, need_root=True)
+    state = {}
+    for line in output.splitlines():
+        parts = line.split("\t", 2)
+        if len(parts) != 3:
+            continue
+        scope, path, value = parts
+        value = value.strip()
+        if os.path.basename(path) in CHOICE_NODES:
+            value = _active_choice(value)
+        state.setdefault(scope, {})[path] = value
+    return state
+
+
+def compile_restore_script(state):
+    """
+    生成恢复脚本
+
+    每个范围内的写入顺序：调度器 → 调度器参数 → scaling min/max（按升降方向排序）。
+    切换调度器会重置其参数，所以参数必须在调度器之后写入；值未变化的节点（包括选项节点中方括号标出的当前值）不写入。
+    写入失败的节点输出为 "F <路径>"
+    """
+    lines = [
+        PLAN_SCRIPT_PRELUDE,
+        "restore_node() { case \"$(cat \"$1\" 2>/dev/null)\" in \"$2\"|*\"[$2]\"*) return 0;; esac; "
+        "sysfs_write \"$1\" \"$2\" || echo \"F $1\"; }\n"
+    ]
+    for scope, nodes in state.items():
+        ordered = ([p for p in nodes if _is_governor_node(p)] +
+                   [p for p in nodes if not _is_governor_node(p) and not _is_range_node(p)])
+        for path in ordered:
+            lines.append(f"restore_node {shlex.quote(path)} {shlex.quote(nodes[path])}\n")
+
+        base = os.path.dirname(next(iter(nodes)))
+        prefix = range_node_prefix(scope)
+        min_value = nodes.get(f"{base}/{prefix}min_freq")
+        max_value = nodes.get(f"{base}/{prefix}max_freq")
+        if min_value and max_value and min_value.isdigit() and max_value.isdigit():
+            cur_file = "scaling_cur_freq" if scope.startswith("policy") else "cur_freq"
+            extra = f" {shlex.quote(prefix)}" if prefix != "scaling_" else ""
+            lines.append(f"apply_range {shlex.quote(scope)} {shlex.quote(base)} {min_value} {max_value} {cur_file}{extra}\n")
+    lines.append("true\n")
+    return "".join(lines)
+
+
+def diff_frequency_state(expected, actual):
+    """
+    比较两个快照
+
+    Returns:
+        list: [(节点路径, 期望值, 实际值)]
+    """
+    mismatches = []
+    for scope, nodes in expected.items():
+        actual_nodes = actual.get(scope, {})
+        for path, value in nodes.items():
+            if actual_nodes.get(path) != value:
+                mismatches.append((path, value, actual_nodes.get(path)))
+    return mismatches
+
+
+def restore_frequency_state(state, device=None, verify=True):
+    """
+    把设备恢复到快照中的设置
+
+    Args:
+        state: capture_frequency_state() 的返回值
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        verify: 恢复后是否重新读取并比较
+
+    Returns:
+        list: 未能恢复的节点 [(节点路径, 期望值, 实际值)]，verify=False时只包含写入失败的节点
+    """
+    device = resolve_device(device)
+    if not state:
+        return []
+
+    start = time.perf_counter()
+    output = device.run_script(compile_restore_script(state), need_root=True)
+    failed = [line[2:].strip() for line in output.splitlines() if line.startswith("F ")]
+    if not verify:
+        return [(path, None, None) for path in failed]
+
+    mismatches = diff_frequency_state(state, capture_frequency_state(device))
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    if mismatches:
+        print(f"⚠️  {len(mismatches)}个频率节点未能恢复:")
+        for path, expected, actual in mismatches:
+            print(f"   {path}: 期望 {expected}，实际 {actual}")
+    else:
+        node_count = sum(len(nodes) for nodes in state.values())
+        print(f"✅ 频率状态已精确恢复（{node_count}个节点，{elapsed_ms:.0f} ms）")
+    return mismatches
+
+
+@contextmanager
+def frequency_state(device=None):
+    """
+    保存进入时的频率状态，退出时（包括异常和Ctrl-C）精确恢复
+
+    在主线程中使用时，恢复期间会暂时忽略Ctrl-C，SIGTERM也会触发恢复；
+    在工作线程中（多设备并行）只依赖 try/finally。
+    快照失败（例如设备未root）时打印警告并继续，不做恢复。
+
+    Yields:
+        dict: 进入时的快照，快照失败时为None
+    """
+    device = resolve_device(device)
+    try:
+        state = capture_frequency_state(device)
+        node_count = sum(len(nodes) for nodes in state.values())
+        print(f"📸 已保存频率状态（{len(state)}个频率域，{node_count}个节点）")
+    except AdbError as e:
+        print(f"⚠️  读取频率状态失败，退出时不会恢复: {e}")
+        state = None
+
+    in_main_thread = threading.current_thread() is threading.main_thread()
+    previous_sigterm = None
+    if in_main_thread and state:
+        def _on_sigterm(signum, frame):
+            raise KeyboardInterrupt("SIGTERM")
+        previous_sigterm = signal.signal(signal.SIGTERM, _on_sigterm)
+
+    try:
+        yield state
+    finally:
+        if state:
+            previous_sigint = signal.signal(signal.SIGINT, signal.SIG_IGN) if in_main_thread else None
+            try:
+                print("\n[恢复] 恢复进入实验前的频率状态...")
+                restore_frequency_state(state, device)
+            except AdbError as e:
+                print(f"❌ 恢复频率状态失败: {e}")
+            finally:
+                if in_main_thread:
+                    signal.signal(signal.SIGINT, previous_sigint)
+                    signal.signal(signal.SIGTERM, previous_sigterm)
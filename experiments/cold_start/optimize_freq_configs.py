@@ -0,0 +1,540 @@
+"""
+频率配置自动搜索
+在 CPU_AVAILABLE_FREQUENCIES / GPU_AVAILABLE_FREQUENCIES 的真实频点上搜索每个App的时间段频率表，
+目标：在启动时长不超过 默认调度×(1+时延预算) 的前提下，最小化启动区间能耗
+
+搜索策略为逐次减半（successive halving）：
+1. 随机生成一批候选配置（包含当前 APP_FREQ_CONFIGS 中的手工配置作为种子），每个测1次
+2. 按目标排序，保留前 1/eta，剩余候选的测试次数乘以 eta
+3. 重复直到只剩一个候选
+测试本身通过 compare_freq_configs_for_apps 完成，每次只跑"自定义频率"一种配置
+
+输出：
+- 可直接部署到 eBPF 目录的 freq_config.py
+- 每个App的帕累托前沿报告（启动时长 vs 能耗）
+"""
+import os
+import sys
+import json
+import math
+import random
+import statistics
+from datetime import datetime
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.cold_start.batch_test import (
+    APPS,
+    APP_FREQ_CONFIGS,
+    CPU_AVAILABLE_FREQUENCIES,
+    GPU_AVAILABLE_FREQUENCIES
+)
+from experiments.cold_start.compare_freq_configs import compare_freq_configs_for_apps
+from experiments.device import resolve_device
+
+
+# 时间段分界点候选（秒），覆盖现有手工配置使用的 0.1/0.25/0.3/0.35/0.4
+BOUNDARY_CHOICES = [0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5]
+
+# 第二个时间段的结束时间，与现有配置保持一致
+STEADY_END_S = 10.0
+
+# 频率表（升序），键为policy id，GPU使用 "gpu"
+OPP_TABLES = {policy: sorted(freqs) for policy, freqs in CPU_AVAILABLE_FREQUENCIES.items()}
+OPP_TABLES["gpu"] = sorted(GPU_AVAILABLE_FREQUENCIES['freqs'])
+
+
+def _nearest_level(table, freq):
+    """返回频率表中与freq最接近的频点下标"""
+    return min(range(len(table)), key=lambda i: abs(table[i] - freq))
+
+
+def candidate_key(candidate):
+    """候选配置的唯一标识，用于去重"""
+    return (
+        candidate["boundary"],
+        tuple(sorted(candidate["boost"].items())),
+        tuple(sorted(candidate["steady"].items()))
+    )
+
+
+def candidate_to_config(candidate):
+    """
+    将候选（频点下标形式）转换为 APP_FREQ_CONFIGS 格式的时间段配置
+
+    Args:
+        candidate: {"boundary": 秒, "boost": {policy: 下标}, "steady": {policy: 下标}}
+
+    Returns:
+        dict: {"cpu_freq_settings": {"time_based": True, "periods": [...]}, "gpu_freq_setting": None}
+    """
+    periods = []
+    for start, end, levels in ((0.0, candidate["boundary"], candidate["boost"]),
+                               (candidate["boundary"], STEADY_END_S, candidate["steady"])):
+        periods.append({
+            "start": start,
+            "end": end,
+            "cpu_freq": {
+                policy: OPP_TABLES[policy][level]
+                for policy, level in levels.items() if policy != "gpu"
+            },
+            "gpu_freq": OPP_TABLES["gpu"][levels["gpu"]]
+        })
+    return {
+        "cpu_freq_settings": {"time_based": True, "periods": periods},
+        "gpu_freq_setting": None
+    }
+
+
+def config_to_candidate(config):
+    """
+    将现有的两段式时间段配置转换为候选（频率取最接近的频点）
+
+    Returns:
+        dict 或 None（配置不是两段式时间段配置时）
+    """
+    cpu_cfg = (config or {}).get("cpu_freq_settings") or {}
+    periods = cpu_cfg.get("periods") or []
+    if not cpu_cfg.get("time_based") or len(periods) != 2:
+        return None
+
+    def _levels(period):
+        levels = {
+            policy: _nearest_level(OPP_TABLES[policy], freq)
+            for policy, freq in period.get("cpu_freq", {}).items() if policy in OPP_TABLES
+        }
+        levels["gpu"] = _nearest_level(OPP_TABLES["gpu"], period.get("gpu_freq") or OPP_TABLES["gpu"][-1])
+        return levels
+
+    return {
+        "boundary": periods[0].get("end", BOUNDARY_CHOICES[0]),
+        "boost": _levels(periods[0]),
+        "steady": _levels(periods[1])
+    }
+
+
+def sample_candidates(num_candidates, rng, seed_config=None):
+    """
+    生成候选配置
+
+    启动阶段的频点从频率表上半部分采样，稳定阶段的频点不高于启动阶段
+
+    Args:
+        num_candidates: 候选数量
+        rng: random.Random 实例
+        seed_config: 作为种子加入的现有配置（APP_FREQ_CONFIGS中的条目）
+
+    Returns:
+        list[dict]: 候选列表（已去重）
+    """
+    candidates = []
+    seen = set()
+
+    seed = config_to_candidate(seed_config) if seed_config else None
+    if seed:
+        candidates.append(seed)
+        seen.add(candidate_key(seed))
+
+    attempts = 0
+    while len(candidates) < num_candidates and attempts < num_candidates * 50:
+        attempts += 1
+        boost = {}
+        steady = {}
+        for policy, table in OPP_TABLES.items():
+            boost[policy] = rng.randrange(len(table) // 2, len(table))
+            steady[policy] = rng.randrange(0, boost[policy] + 1)
+        candidate = {
+            "boundary": rng.choice(BOUNDARY_CHOICES),
+            "boost": boost,
+            "steady": steady
+        }
+        key = candidate_key(candidate)
+        if key in seen:
+            continue
+        seen.add(key)
+        candidates.append(candidate)
+    return candidates
+
+
+def _measure(app_name, package_name, mode_name, freq_config, repeats, output_dir, device, **kwargs):
+    """
+    通过 compare_freq_configs_for_apps 测量一种配置repeats次
+
+    Returns:
+        list[dict]: 每次成功测量的 {"duration_ms", "energy_j", "throttled"}
+    """
+    samples = []
+    for _ in range(repeats):
+        results = compare_freq_configs_for_apps(
+            apps={app_name: package_name},
+            experiment_name=f"Optimize_{app_name}",
+            output_dir=output_dir,
+            device=device,
+            modes=[mode_name],
+            freq_configs={app_name: freq_config} if freq_config else {},
+            **kwargs
+        )
+        data = results.get(app_name, {}).get("configs", {}).get(mode_name, {})
+        if data.get("status") != "success":
+            continue
+        if data.get("cold_start_duration_ms") is None or data.get("total_power_consumption_j") is None:
+            continue
+        samples.append({
+            "duration_ms": data["cold_start_duration_ms"],
+            "energy_j": data["total_power_consumption_j"],
+            "throttled": bool(data.get("throttled_at_start"))
+        })
+    return samples
+
+
+def _summarize(samples):
+    """取中位数，降低单次测量噪声的影响"""
+    if not samples:
+        return None, None
+    return (statistics.median(s["duration_ms"] for s in samples),
+            statistics.median(s["energy_j"] for s in samples))
+
+
+def _rank_key(entry, latency_limit_ms):
+    """
+    排序键：满足时延预算的候选按能耗升序排在前面，
+    不满足的按启动时长升序排在后面，没有有效数据的排在最后
+    """
+    if entry["duration_ms"] is None:
+        return (2, 0.0)
+    if entry["duration_ms"] <= latency_limit_ms:
+        return (0, entry["energy_j"])
+    return (1, entry["duration_ms"])
+
+
+def pareto_front(entries):
+    """
+    计算帕累托前沿（启动时长和能耗都越小越好）
+
+    Args:
+        entries: [{"duration_ms", "energy_j", ...}]
+
+    Returns:
+        list: 前沿上的条目，按启动时长升序
+    """
+    valid = [e for e in entries if e.get("duration_ms") is not None]
+    front = []
+    for e in valid:
+        dominated = any(
+            o is not e
+            and o["duration_ms"] <= e["duration_ms"] and o["energy_j"] <= e["energy_j"]
+            and (o["duration_ms"] < e["duration_ms"] or o["energy_j"] < e["energy_j"])
+            for o in valid
+        )
+        if not dominated:
+            front.append(e)
+    return sorted(front, key=lambda e: e["duration_ms"])
+
+
+def optimize_app(app_name, package_name,
+                 num_candidates=16,
+                 eta=2,
+                 latency_budget=0.05,
+                 baseline_repeats=3,
+                 seed=0,
+                 output_dir=None,
+                 device=None,
+                 **measure_kwargs):
+    """
+    对单个App执行逐次减半搜索
+
+    Args:
+        app_name: App名称
+        package_name: 包名
+        num_candidates: 初始候选数量
+        eta: 每轮保留 1/eta 的候选，测试次数乘以eta
+        latency_budget: 时延预算（相对默认调度的比例，0.05表示最多慢5%）
+        baseline_repeats: 默认调度基线的测试次数
+        seed: 随机种子
+        output_dir: 输出目录
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        measure_kwargs: 透传给 compare_freq_configs_for_apps 的其他参数（trace_duration等）
+
+    Returns:
+        dict: 搜索结果，包含 baseline、best、entries（全部候选）、pareto_front
+    """
+    rng = random.Random(seed)
+
+    print("\n" + "=" * 80)
+    print(f"🔍 搜索频率配置: {app_name} ({package_name})")
+    print("=" * 80)
+
+    # 1. 默认调度基线
+    print(f"\n📏 测量默认调度基线（{baseline_repeats}次）...")
+    baseline_samples = _measure(app_name, package_name, "默认调度", None, baseline_repeats,
+                                os.path.join(output_dir, "baseline"), device, **measure_kwargs)
+    baseline_duration, baseline_energy = _summarize(baseline_samples)
+    if baseline_duration is None:
+        print(f"❌ {app_name}: 默认调度基线测量失败，跳过")
+        return None
+    latency_limit_ms = baseline_duration * (1 + latency_budget)
+    print(f"✅ 基线: 启动时长 {baseline_duration:.2f} ms, 能耗 {baseline_energy:.3f} J, "
+          f"时延上限 {latency_limit_ms:.2f} ms")
+
+    # 2. 生成候选
+    candidates = sample_candidates(num_candidates, rng, APP_FREQ_CONFIGS.get(app_name))
+    entries = [
+        {"id": idx, "candidate": c, "config": candidate_to_config(c), "samples": [],
+         "duration_ms": None, "energy_j": None}
+        for idx, c in enumerate(candidates)
+    ]
+
+    # 3. 逐次减半
+    survivors = list(entries)
+    repeats = 1
+    round_idx = 0
+    while survivors:
+        round_idx += 1
+        print(f"\n🔁 第{round_idx}轮: {len(survivors)} 个候选，每个补测到 {repeats} 次")
+        for entry in survivors:
+            missing = repeats - len(entry["samples"])
+            if missing <= 0:
+                continue
+            entry["samples"].extend(_measure(
+                app_name, package_name, "自定义频率", entry["config"], missing,
+                os.path.join(output_dir, f"candidate_{entry['id']}"), device, **measure_kwargs
+            ))
+            entry["duration_ms"], entry["energy_j"] = _summarize(entry["samples"])
+
+        survivors.sort(key=lambda e: _rank_key(e, latency_limit_ms))
+        if len(survivors) == 1:
+            break
+        survivors = survivors[:max(1, math.ceil(len(survivors) / eta))]
+        repeats *= eta
+
+    best = survivors[0] if survivors else None
+    if best is None or best["duration_ms"] is None or best["duration_ms"] > latency_limit_ms:
+        print(f"⚠️  {app_name}: 没有候选满足时延预算，保留现有配置")
+        best = None
+    else:
+        saving = (baseline_energy - best["energy_j"]) / baseline_energy * 100 if baseline_energy else 0
+        print(f"🏆 {app_name}: 最优候选 #{best['id']}，启动时长 {best['duration_ms']:.2f} ms, "
+              f"能耗 {best['energy_j']:.3f} J（相对默认调度节能 {saving:.1f}%）")
+
+    baseline_entry = {"id": "baseline", "duration_ms": baseline_duration, "energy_j": baseline_energy,
+                      "samples": baseline_samples}
+    return {
+        "app_name": app_name,
+        "package_name": package_name,
+        "latency_budget": latency_budget,
+        "latency_limit_ms": latency_limit_ms,
+        "baseline": baseline_entry,
+        "best": best,
+        "entries": entries,
+        "pareto_front": pareto_front(entries + [baseline_entry])
+    }
+
+
+def generate_pareto_report(result, output_dir):
+    """
+    生成单个App的帕累托前沿报告（文本 + JSON）
+
+    Returns:
+        str: 报告文件路径
+    """
+    app_name = result["app_name"]
+    baseline = result["baseline"]
+    best_id = result["best"]["id"] if result["best"] else None
+
+    lines = []
+    lines.append("=" * 100)
+    lines.append(f"频率配置搜索报告: {app_name} ({result['package_name']})")
+    lines.append("=" * 100)
+    lines.append(f"默认调度基线: 启动时长 {baseline['duration_ms']:.2f} ms, 能耗 {baseline['energy_j']:.3f} J")
+    lines.append(f"时延预算: +{result['latency_budget'] * 100:.1f}%（上限 {result['latency_limit_ms']:.2f} ms）")
+    lines.append("")
+    lines.append("【帕累托前沿】（启动时长升序）")
+    header = f"{'候选':<10} {'启动时长(ms)':>14} {'能耗(J)':>12} {'测试次数':>10} {'分界(s)':>10}  {'满足预算':<8}"
+    lines.append(header)
+    lines.append("-" * 100)
+    for e in result["pareto_front"]:
+        label = f"#{e['id']}" if e["id"] != "baseline" else "默认调度"
+        if e["id"] == best_id:
+            label += " 🏆"
+        boundary = f"{e['candidate']['boundary']:.2f}" if "candidate" in e else "-"
+        ok = "✅" if e["duration_ms"] <= result["latency_limit_ms"] else "❌"
+        lines.append(f"{label:<10} {e['duration_ms']:>14.2f} {e['energy_j']:>12.3f} "
+                     f"{len(e['samples']):>10} {boundary:>10}  {ok:<8}")
+    lines.append("")
+
+    if result["best"]:
+        lines.append("【最优配置】")
+        for period in result["best"]["config"]["cpu_freq_settings"]["periods"]:
+            cpu = ", ".join(f"policy{p}={f}" for p, f in period["cpu_freq"].items())
+            lines.append(f"  {period['start']:.2f}s - {period['end']:.2f}s: {cpu}, gpu={period['gpu_freq']}")
+    else:
+        lines.append("没有候选满足时延预算，保留现有配置")
+
+    report_text = "\n".join(lines)
+    print("\n" + report_text)
+
+    report_file = os.path.join(output_dir, f"pareto_{app_name}.txt")
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write(report_text)
+
+    with open(os.path.join(output_dir, f"pareto_{app_name}.json"), 'w', encoding='utf-8') as f:
+        json.dump({
+            "app_name": app_name,
+            "baseline": {k: baseline[k] for k in ("duration_ms", "energy_j", "samples")},
+            "latency_limit_ms": result["latency_limit_ms"],
+            "best_id": best_id,
+            "pareto_front": [
+                {k: e.get(k) for k in ("id", "duration_ms", "energy_j", "config")}
+                for e in result["pareto_front"]
+            ],
+            "entries": [
+                {k: e.get(k) for k in ("id", "duration_ms", "energy_j", "samples", "config")}
+                for e in result["entries"]
+            ]
+        }, f, indent=2, ensure_ascii=False)
+
+    print(f"💾 帕累托报告已保存到: {report_file}")
+    return report_file
+
+
+def write_freq_config(app_configs, output_file):
+    """
+    生成 eBPF/freq_config.py 格式的配置文件
+
+    Args:
+        app_configs: {app_name: 配置}，格式同 APP_FREQ_CONFIGS
+        output_file: 输出文件路径
+    """
+    def _literal(value):
+        # json格式与Python字面量只在 true/false/null 上不同
+        return (json.dumps(value, indent=4, ensure_ascii=False)
+                .replace(": true", ": True").replace(": false", ": False").replace(": null", ": None"))
+
+    content = (
+        '"""\n'
+        '频率配置文件\n'
+        f'由 experiments/cold_start/optimize_freq_configs.py 自动搜索生成（{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}）\n'
+        '"""\n\n'
+        '# App包名映射\n'
+        f'APPS = {_literal(APPS)}\n\n'
+        '# 每个App的个性化频率配置\n'
+        f'APP_FREQ_CONFIGS = {_literal(app_configs)}\n'
+    )
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(content)
+    print(f"💾 freq_config.py 已生成: {output_file}")
+
+
+def optimize_freq_configs(apps=None,
+                          num_candidates=16,
+                          eta=2,
+                          latency_budget=0.05,
+                          baseline_repeats=3,
+                          seed=0,
+                          output_dir=None,
+                          output_config=None,
+                          device=None,
+                          **measure_kwargs):
+    """
+    对多个App执行频率配置搜索，生成 freq_config.py 和帕累托报告
+
+    Args:
+        apps: 要搜索的App列表，格式为 {app_name: package_name}，None表示所有App
+        output_config: 生成的freq_config.py路径，None时写入 {output_dir}/freq_config.py
+        其余参数同 optimize_app
+
+    Returns:
+        dict: {app_name: optimize_app的结果}
+    """
+    if apps is None:
+        apps = APPS
+    device = resolve_device(device)
+
+    if not output_dir:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        project_root = os.path.dirname(os.path.dirname(script_dir))
+        output_dir = os.path.join(project_root, "Perfetto", "trace", "traceAnalysis", "results",
+                                  f"FreqOptimize_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = {}
+    # 未搜索或搜索失败的App保留现有配置
+    app_configs = dict(APP_FREQ_CONFIGS)
+    for app_name, package_name in apps.items():
+        result = optimize_app(
+            app_name, package_name,
+            num_candidates=num_candidates,
+            eta=eta,
+            latency_budget=latency_budget,
+            baseline_repeats=baseline_repeats,
+            seed=seed,
+            output_dir=os.path.join(output_dir, app_name),
+            device=device,
+            **measure_kwargs
+        )
+        results[app_name] = result
+        if result is None:
+            continue
+        generate_pareto_report(result, output_dir)
+        if result["best"]:
+            app_configs[app_name] = result["best"]["config"]
+
+    write_freq_config(app_configs, output_config or os.path.join(output_dir, "freq_config.py"))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='自动搜索每个App的时间段频率配置（逐次减半）')
+    parser.add_argument('--apps', nargs='+', help='要搜索的App名称列表（空格分隔），如果不指定则搜索所有App')
+    parser.add_argument('--candidates', type=int, default=16, help='每个App的初始候选数量（默认: 16）')
+    parser.add_argument('--eta', type=int, default=2, help='每轮保留 1/eta 的候选（默认: 2）')
+    parser.add_argument('--latency-budget', type=float, default=0.05,
+                       help='时延预算，相对默认调度的比例（默认: 0.05，即最多慢5%%）')
+    parser.add_argument('--baseline-repeats', type=int, default=3, help='默认调度基线测试次数（默认: 3）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子（默认: 0）')
+    parser.add_argument('--duration', type=int, default=30, help='追踪时长(秒)（默认: 30）')
+    parser.add_argument('--config', default='/data/misc/perfetto-configs/HardwareInfo.pbtx',
+                       help='Perfetto配置文件路径')
+    parser.add_argument('--output-dir', help='输出目录（默认: Perfetto/trace/traceAnalysis/results/FreqOptimize_{时间戳}）')
+    parser.add_argument('--output-config', help='生成的freq_config.py路径（默认: {output_dir}/freq_config.py）')
+    parser.add_argument('--serial', help='目标设备序列号（多台设备连接时必须指定）')
+    parser.add_argument('--fast', action='store_true',
+                       help='快速测量：不启动perfetto，使用 am start -W 和电池采样（适合大量候选的初筛）')
+    parser.add_argument('--verify-fraction', type=float, default=0.0,
+                       help='快速测量时抽样用完整trace验证的比例（0~1，默认: 0）')
+
+    args = parser.parse_args()
+
+    apps_to_optimize = None
+    if args.apps:
+        apps_to_optimize = {}
+        for app_name in args.apps:
+            if app_name in APPS:
+                apps_to_optimize[app_name] = APPS[app_name]
+            else:
+                print(f"⚠️  警告: 未知App名称 '{app_name}'，跳过")
+        if not apps_to_optimize:
+            print("❌ 没有有效的App可搜索")
+            sys.exit(1)
+
+    optimize_freq_configs(
+        apps=apps_to_optimize,
+        num_candidates=args.candidates,
+        eta=args.eta,
+        latency_budget=args.latency_budget,
+        baseline_repeats=args.baseline_repeats,
+        seed=args.seed,
+        output_dir=args.output_dir,
+        output_config=args.output_config,
+        device=args.serial,
+        trace_duration=args.duration,
+        config_file=args.config,
+        measure_mode="fast" if args.fast else "trace",
+        verify_fraction=args.verify_fraction
+    )
+
+    print("\n✅ 频率配置搜索完成!")
+    print("💡 下一步: 检查帕累托报告后，将生成的 freq_config.py 复制到 eBPF/ 目录，")
+    print("   并同步更新 experiments/cold_start/batch_test.py 中的 APP_FREQ_CONFIGS")
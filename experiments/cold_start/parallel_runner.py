@@ -0,0 +1,74 @@
+"""
+多设备并行执行
+将App列表分片到多台同型号设备上并行测试，每台设备内部仍按顺序执行，
+吞吐量随设备数量近似线性增长
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import select_devices
+
+
+def shard_items(items, num_shards):
+    """
+    将 {name: value} 字典按轮转方式切分为num_shards份
+
+    轮转切分保证各分片数量最多相差1，且保持原有顺序
+
+    Returns:
+        list[dict]: 长度为num_shards的分片列表（可能包含空字典）
+    """
+    shards = [{} for _ in range(num_shards)]
+    for idx, (name, value) in enumerate(items.items()):
+        shards[idx % num_shards][name] = value
+    return shards
+
+
+def run_sharded(devices, items, worker):
+    """
+    在多台设备上并行执行分片任务
+
+    Args:
+        devices: Device列表
+        items: 要切分的 {name: value} 字典（通常是 {app_name: package_name}）
+        worker: 回调函数 worker(device, shard) -> result，在每台设备的独立线程中执行
+
+    Returns:
+        dict: {device: result}，执行失败的设备结果为None
+    """
+    shards = shard_items(items, len(devices))
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(devices)) as pool:
+        futures = {}
+        for device, shard in zip(devices, shards):
+            if not shard:
+                continue
+            print(f"📱 {device.label}: 分配 {len(shard)} 个App: {', '.join(shard.keys())}")
+            futures[device] = pool.submit(worker, device, shard)
+
+        for device, future in futures.items():
+            try:
+                results[device] = future.result()
+            except (Exception, SystemExit) as e:
+                # adb_shell 失败时会调用 sys.exit，在工作线程中表现为 SystemExit
+                print(f"❌ 设备 {device.label} 执行失败: {e!r}")
+                results[device] = None
+    return results
+
+
+def resolve_parallel_devices(serials):
+    """
+    解析命令行 --devices 参数
+
+    Args:
+        serials: None（未指定，单设备模式）、空列表（使用所有已连接设备）或序列号列表
+
+    Returns:
+        list[Device] 或 None（单设备模式）
+    """
+    if serials is None:
+        return None
+    return select_devices(serials or None)
@@ -22,7 +22,8 @@ def run_complete_experiment(package_name, activity_name=None,
                            config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
                            output_dir=None,
                            show_plots=True,
-                           max_frequency=False):
+                           max_frequency=False,
+                           device=None):
     """
     运行完整的冷启动实验流程
     
@@ -35,6 +36,7 @@ def run_complete_experiment(package_name, activity_name=None,
         output_dir: 输出目录
         show_plots: 是否显示图表
         max_frequency: 是否设置CPU/GPU到最大频率（默认False，使用系统默认调度）
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
     
     Returns:
         包含所有结果的字典
@@ -51,7 +53,8 @@ def run_complete_experiment(package_name, activity_name=None,
         experiment_name=experiment_name,
         trace_duration=trace_duration,
         config_file=config_file,
-        max_frequency=max_frequency
+        max_frequency=max_frequency,
+        device=device
     )
     
     if not trace_file or not os.path.exists(trace_file):
@@ -69,7 +72,7 @@ def run_complete_experiment(package_name, activity_name=None,
                                  "results", experiment_name)
     
     os.makedirs(output_dir, exist_ok=True)
-    results = analyze_cold_start_trace(trace_file, package_name, output_dir)
+    results = analyze_cold_start_trace(trace_file, package_name, output_dir, device=device)
     
     if not results:
         print("❌ 数据分析失败")
@@ -117,6 +120,7 @@ if __name__ == "__main__":
     parser.add_argument('--no-show', action='store_true', help='不显示图表')
     parser.add_argument('--max-frequency', action='store_true',
                        help='设置CPU/GPU到最大频率（默认使用系统调度）')
+    parser.add_argument('--serial', help='目标设备序列号（多台设备连接时必须指定）')
     
     args = parser.parse_args()
     
@@ -128,5 +132,6 @@ if __name__ == "__main__":
         config_file=args.config,
         output_dir=args.output_dir,
         show_plots=not args.no_show,
-        max_frequency=args.max_frequency
+        max_frequency=args.max_frequency,
+        device=args.serial
     )
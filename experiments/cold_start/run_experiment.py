@@ -11,19 +11,23 @@ import time
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from startPrefetto import start_perfetto, stop_perfetto, get_perfetto
+from experiments.device import resolve_device
+from experiments.cold_start.fast_measure import FastStartupMeasurement
+from experiments.cold_start.frequency_state import frequency_state
+from experiments.cold_start.actuation_latency import get_switch_lead_s
 from experiments.cold_start.frequency_manager import (
     set_all_frequencies_to_max, 
-    restore_all_frequencies,
     set_custom_frequencies,
-    set_cpu_frequencies,
-    set_gpu_frequency
+    apply_frequency_plan
 )
+from experiments.cold_start.control_backends import get_backend
 
 
-def force_stop_app(package_name):
+def force_stop_app(package_name, device=None):
     """强制停止应用，确保冷启动"""
+    device = resolve_device(device)
     try:
-        subprocess.run(["adb", "shell", "am", "force-stop", package_name], 
+        subprocess.run(device.adb_args("shell", "am", "force-stop", package_name), 
                       check=False, capture_output=True)
         time.sleep(1)
         print(f"✅ 已强制停止应用: {package_name}")
@@ -31,14 +35,15 @@ def force_stop_app(package_name):
         print(f"⚠️  停止应用时出错: {e}")
 
 
-def launch_app(package_name, activity_name=None):
+def launch_app(package_name, activity_name=None, device=None):
     """启动应用"""
+    device = resolve_device(device)
     try:
         if activity_name:
-            cmd = ["adb", "shell", "am", "start", "-n", f"{package_name}/{activity_name}"]
+            cmd = device.adb_args("shell", "am", "start", "-n", f"{package_name}/{activity_name}")
         else:
-            cmd = ["adb", "shell", "monkey", "-p", package_name, "-c", 
-                   "android.intent.category.LAUNCHER", "1"]
+            cmd = device.adb_args("shell", "monkey", "-p", package_name, "-c", 
+                                  "android.intent.category.LAUNCHER", "1")
         subprocess.run(cmd, check=True, capture_output=True)
         print(f"✅ 已启动应用: {package_name}")
         return True
@@ -53,10 +58,15 @@ def run_cold_start_experiment(package_name, activity_name=None,
                               config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
                               max_frequency=False,
                               cpu_freq_settings=None,
-                              gpu_freq_setting=None):
+                              gpu_freq_setting=None,
+                              device=None,
+                              measure_mode="trace"):
     """
     运行冷启动实验
     
+    所有频率模式都在 frequency_state() 中执行：进入时保存所有cpufreq policy和GPU devfreq设置，
+    结束时（包括异常和Ctrl-C）精确恢复，避免一次中断的实验影响后续实验
+    
     Args:
         package_name: 应用包名
         activity_name: 主Activity名称(可选)
@@ -66,13 +76,34 @@ def run_cold_start_experiment(package_name, activity_name=None,
         max_frequency: 是否设置CPU/GPU到最大频率（默认False，使用系统默认调度）
         cpu_freq_settings: 自定义CPU频率设置，dict格式 {policy_id: freq_khz} 或 {policy_id: {'min': min_khz, 'max': max_khz}}
         gpu_freq_setting: 自定义GPU频率设置，int/float (Hz) 或 dict {'min': min_hz, 'max': max_hz}
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        measure_mode: 测量模式
+            - "trace"（默认）: perfetto完整追踪，返回trace文件路径
+            - "fast": 不启动perfetto，使用 am start -W 的TotalTime和设备端电池电流/电压采样，
+                      直接返回与 analyze_cold_start_trace 同名字段的结果dict
     
     Returns:
-        trace文件路径，如果失败返回None
+        trace模式: trace文件路径；fast模式: 结果dict；失败返回None
     """
+    if measure_mode not in ("trace", "fast"):
+        raise ValueError(f"未知的测量模式: {measure_mode}")
+    device = resolve_device(device)
+    with frequency_state(device):
+        return _run_cold_start_experiment(
+            package_name, activity_name, experiment_name, trace_duration, config_file,
+            max_frequency, cpu_freq_settings, gpu_freq_setting, device, measure_mode
+        )
+
+
+def _run_cold_start_experiment(package_name, activity_name, experiment_name, trace_duration,
+                               config_file, max_frequency, cpu_freq_settings, gpu_freq_setting,
+                               device, measure_mode):
+    """run_cold_start_experiment 的实验流程（参数含义相同，频率状态的保存和恢复由调用方负责）"""
     print("=" * 60)
     print(f"🚀 开始冷启动实验: {experiment_name}")
     print(f"📦 应用包名: {package_name}")
+    if device.serial:
+        print(f"📱 设备: {device.serial}")
     
     # 检查是否是时间段频率配置
     is_time_based_freq = False
@@ -83,7 +114,7 @@ def run_cold_start_experiment(package_name, activity_name=None,
     
     # 确定频率模式
     if is_time_based_freq:
-        freq_mode = "时间段频率"
+        freq_mode = f"时间段频率（{cpu_freq_settings.get('backend', 'freq_pin')}）"
     elif cpu_freq_settings or gpu_freq_setting:
         freq_mode = "自定义频率"
     elif max_frequency:
@@ -91,10 +122,10 @@ def run_cold_start_experiment(package_name, activity_name=None,
     else:
         freq_mode = "默认调度"
     print(f"⚙️  频率模式: {freq_mode}")
+    if measure_mode == "fast":
+        print("⚡ 测量模式: 快速测量（am start -W + 电池采样）")
     print("=" * 60)
     
-    original_freq_settings = None
-    
     # 0. 设置频率
     if is_time_based_freq:
         # 时间段配置，设置初始频率（第一个时间段的频率）
@@ -104,53 +135,54 @@ def run_cold_start_experiment(package_name, activity_name=None,
             initial_gpu_freq = first_period.get('gpu_freq')
             print(f"\n[0/6] 设置初始频率（时间段0-{first_period.get('end', 0)}s）...")
             try:
-                original_freq_settings = set_custom_frequencies(
+                set_custom_frequencies(
                     cpu_freq_settings=initial_cpu_freq,
                     gpu_freq_setting=initial_gpu_freq
                 )
                 time.sleep(2)  # 等待频率设置生效
             except Exception as e:
                 print(f"⚠️  设置初始频率失败: {e}")
-                original_freq_settings = None
     elif cpu_freq_settings or gpu_freq_setting:
+        # 固定频率配置（非时间段）不经过eBPF程序（它只执行时间段配置），在整个实验期间通过ADB固定
         print("\n[0/6] 设置自定义频率...")
         try:
-            original_freq_settings = set_custom_frequencies(
-                cpu_freq_settings=cpu_freq_settings,
-                gpu_freq_setting=gpu_freq_setting
-            )
+            result = apply_frequency_plan(cpu_freq_settings, gpu_freq_setting, device=device)
+            if not result or not result['success']:
+                print("⚠️  自定义频率没有全部生效，继续实验")
             time.sleep(2)  # 等待频率设置生效
         except Exception as e:
             print(f"⚠️  设置频率失败: {e}，继续使用默认频率")
-            original_freq_settings = None
     elif max_frequency:
         print("\n[0/6] 设置CPU/GPU到最大频率...")
         try:
-            original_freq_settings = set_all_frequencies_to_max()
+            set_all_frequencies_to_max(device)
             time.sleep(2)  # 等待频率设置生效
         except Exception as e:
             print(f"⚠️  设置频率失败: {e}，继续使用默认频率")
-            original_freq_settings = None
     
     try:
         # 1. 强制停止应用(确保冷启动)
         print("\n[1/7] 停止应用(确保冷启动)...")
-        force_stop_app(package_name)
+        force_stop_app(package_name, device)
         time.sleep(2)
     
         # 2. 启动perfetto追踪(在后台线程)
-        print("\n[2/7] 启动Perfetto追踪...")
-        
-        def run_perfetto():
-            try:
-                start_perfetto(config_file=config_file, 
-                              outfile="/data/misc/perfetto-traces/trace.perfetto-trace")
-            except Exception as e:
-                print(f"⚠️  Perfetto进程异常: {e}")
-        
-        perfetto_thread = threading.Thread(target=run_perfetto, daemon=True)
-        perfetto_thread.start()
-        time.sleep(2)  # 等待perfetto启动
+        if measure_mode == "fast":
+            print("\n[2/7] 快速测量模式，跳过Perfetto追踪")
+        else:
+            print("\n[2/7] 启动Perfetto追踪...")
+            
+            def run_perfetto():
+                try:
+                    start_perfetto(config_file=config_file, 
+                                  outfile="/data/misc/perfetto-traces/trace.perfetto-trace",
+                                  device=device)
+                except Exception as e:
+                    print(f"⚠️  Perfetto进程异常: {e}")
+            
+            perfetto_thread = threading.Thread(target=run_perfetto, daemon=True)
+            perfetto_thread.start()
+            time.sleep(2)  # 等待perfetto启动
         
         # 3. 启动应用
         print("\n[3/7] 启动应用...")
@@ -161,8 +193,16 @@ def run_cold_start_experiment(package_name, activity_name=None,
             import time as time_module
             app_start_time_ns = int(time_module.time() * 1e9)  # 转换为纳秒
         
-        if not launch_app(package_name, activity_name):
-            stop_perfetto()
+        if measure_mode == "fast":
+            # am start -W 在后台线程中阻塞，主线程继续按时间段切换频率
+            fast_measurement = FastStartupMeasurement(package_name, activity_name, device)
+            if not fast_measurement.start():
+                return None
+            # 时间段以am start开始执行的时刻为起点（解析启动Activity、启动adb shell的时间不计入）
+            if is_time_based_freq:
+                app_start_time_ns = fast_measurement.launch_time_ns
+        elif not launch_app(package_name, activity_name, device):
+            stop_perfetto(device)
             return None
         
         # 4. 等待应用启动完成（如果使用时间段频率配置，在此过程中动态调整频率）
@@ -175,10 +215,17 @@ def run_cold_start_experiment(package_name, activity_name=None,
             total_wait_time = 5.0  # 总等待时间5秒
             elapsed_time = 0.0
             last_period_index = -1
+            # 时间段由配置中 backend 字段指定的控制后端执行（固定频率或uclamp加速，见 control_backends.py）
+            controller = get_backend(cpu_freq_settings, device)
+            # 按设备实测的频率生效延迟提前切换（见 actuation_latency.py，未测量时为0）
+            switch_lead_s = get_switch_lead_s(device)
+            if switch_lead_s > 0:
+                print(f"   ⏩ 频率切换提前 {switch_lead_s * 1000:.1f} ms（设备实测生效延迟）")
             
             while elapsed_time < total_wait_time:
                 current_time_ns = int(time_module.time() * 1e9)
-                elapsed_s = (current_time_ns - app_start_time_ns) / 1e9
+                # 启动前（快速测量的adb shell还在启动）就应用第一个时间段
+                elapsed_s = max((current_time_ns - app_start_time_ns) / 1e9 + switch_lead_s, 0.0)
                 
                 # 检查是否需要切换到下一个时间段
                 for idx, period in enumerate(freq_periods):
@@ -189,12 +236,8 @@ def run_cold_start_experiment(package_name, activity_name=None,
                         # 需要切换到这个时间段
                         print(f"   切换到时间段 {idx+1}/{len(freq_periods)}: {start_s:.2f}s - {end_s:.2f}s")
                         try:
-                            cpu_freq = period.get('cpu_freq')
-                            gpu_freq = period.get('gpu_freq')
-                            if cpu_freq:
-                                set_cpu_frequencies(cpu_freq)
-                            if gpu_freq:
-                                set_gpu_frequency(gpu_freq)
+                            # 每个时间段的所有写入合并为一个脚本，一次往返完成切换
+                            controller.apply_period(period)
                             last_period_index = idx
                         except Exception as e:
                             print(f"   ⚠️  切换频率失败: {e}")
@@ -202,22 +245,30 @@ def run_cold_start_experiment(package_name, activity_name=None,
                 
                 time.sleep(check_interval)
                 elapsed_time += check_interval
-        else:
+        elif measure_mode != "fast":
+            # 快速测量模式下 join() 会等待设备端采样结束，不需要额外等待
             time.sleep(5)
         
+        if measure_mode == "fast":
+            print("\n[5/7] 收集快速测量结果...")
+            results = fast_measurement.join()
+            print("\n[7/7] 关闭应用...")
+            force_stop_app(package_name, device)
+            return results
+        
         # 5. 停止perfetto追踪
         print("\n[5/7] 停止Perfetto追踪...")
-        stop_perfetto()
+        stop_perfetto(device)
         perfetto_thread.join(timeout=5)
         time.sleep(3)  # 等待perfetto完全停止
         
         # 6. 拉取trace文件
         print("\n[6/7] 拉取Trace文件...")
-        trace_filename = get_perfetto(experiment_name)  # 获取实际生成的文件名（带时间戳）
+        trace_filename = get_perfetto(experiment_name, device)  # 获取实际生成的文件名（带时间戳）
         
         # 7. 关闭应用（测试完成后自动关闭）
         print("\n[7/7] 关闭应用...")
-        force_stop_app(package_name)
+        force_stop_app(package_name, device)
         
         print("\n" + "=" * 60)
         print("✅ 实验完成!")
@@ -230,17 +281,10 @@ def run_cold_start_experiment(package_name, activity_name=None,
                                  f"method{experiment_name}", trace_filename)
         return trace_path if os.path.exists(trace_path) else None
     finally:
-        # 恢复频率设置
-        # 注意：只有最大频率模式（通过ADB设置）才需要恢复
-        # 自定义频率模式（通过eBPF设置）不需要恢复，eBPF程序会自动停止
-        if max_frequency and original_freq_settings:
-            print("\n[恢复] 恢复CPU/GPU频率设置（ADB方式）...")
-            try:
-                restore_all_frequencies(original_freq_settings)
-            except Exception as e:
-                print(f"⚠️  恢复频率设置失败: {e}")
-        elif cpu_freq_settings or gpu_freq_setting:
-            print("\n[恢复] 使用eBPF方式，频率由eBPF程序自动管理，无需手动恢复")
+        # 频率设置（包括最大频率和固定自定义频率通过ADB写入的设置）由 run_cold_start_experiment 中的
+        # frequency_state() 精确恢复；时间段配置由eBPF程序控制，eBPF程序停止后频率也会回到调度器控制
+        if is_time_based_freq:
+            print("\n[恢复] 使用eBPF方式，频率由eBPF程序自动管理")
 
 
 if __name__ == "__main__":
@@ -255,16 +299,35 @@ if __name__ == "__main__":
                        help='Perfetto配置文件路径')
     parser.add_argument('--max-frequency', action='store_true',
                        help='设置CPU/GPU到最大频率（默认使用系统调度）')
+    parser.add_argument('--serial', help='目标设备序列号（多台设备连接时必须指定）')
+    parser.add_argument('--fast', action='store_true',
+                       help='快速测量：不启动perfetto，使用 am start -W 和电池采样')
     
     args = parser.parse_args()
     
+    if args.fast:
+        results = run_cold_start_experiment(
+            package_name=args.package_name,
+            activity_name=args.activity,
+            experiment_name=args.experiment_name,
+            max_frequency=args.max_frequency,
+            device=args.serial,
+            measure_mode="fast"
+        )
+        if results:
+            print(f"\n⏱️  冷启动时长: {results['cold_start_duration_ms']:.0f} ms")
+            if results.get('total_power_consumption_j') is not None:
+                print(f"⚡ 启动区间功耗: {results['total_power_consumption_j']:.3f} J")
+        sys.exit(0 if results else 1)
+    
     trace_file = run_cold_start_experiment(
         package_name=args.package_name,
         activity_name=args.activity,
         experiment_name=args.experiment_name,
         trace_duration=args.duration,
         config_file=args.config,
-        max_frequency=args.max_frequency
+        max_frequency=args.max_frequency,
+        device=args.serial
     )
     
     if trace_file:
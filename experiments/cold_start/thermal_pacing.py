@@ -0,0 +1,221 @@
+"""
+温度感知的测试间隔控制
+用一次批量shell读取所有thermal zone温度和cooling device状态，
+只等待到温度降到阈值以下再开始下一次启动，替代固定的5秒/3秒间隔
+"""
+import os
+import re
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+
+
+# 一次shell调用读取全部thermal zone和cooling device
+# 输出格式：
+#   Z <zone名> <type> <temp(毫摄氏度)>
+#   C <cooling device名> <type> <cur_state> <max_state>
+THERMAL_SNAPSHOT_CMD = (
+    "for z in /sys/class/thermal/thermal_zone*; do "
+    "echo \"Z ${z##*/} $(cat $z/type 2>/dev/null) $(cat $z/temp 2>/dev/null)\"; "
+    "done; "
+    "for c in /sys/class/thermal/cooling_device*; do "
+    "echo \"C ${c##*/} $(cat $c/type 2>/dev/null) $(cat $c/cur_state 2>/dev/null) $(cat $c/max_state 2>/dev/null)\"; "
+    "done"
+)
+
+# 判定为"降频中"的cooling device类型（cur_state>0 表示正在限制频率）
+DEFAULT_THROTTLE_COOLING_PATTERN = r"cpu|gpu|devfreq"
+
+# 合理的温度读数范围（摄氏度），超出范围的zone视为无效（部分zone未接传感器会返回-273等值）
+_VALID_TEMP_RANGE_C = (-40.0, 150.0)
+
+
+class ThermalSnapshot:
+    """一次温度/降频状态快照"""
+
+    def __init__(self, zones, cooling_devices, timestamp=None):
+        """
+        Args:
+            zones: {zone名: {'type': str, 'temp_c': float}}
+            cooling_devices: {设备名: {'type': str, 'cur_state': int, 'max_state': int}}
+            timestamp: 读取时间（time.time()）
+        """
+        self.zones = zones
+        self.cooling_devices = cooling_devices
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @classmethod
+    def parse(cls, output):
+        """解析 THERMAL_SNAPSHOT_CMD 的输出"""
+        zones = {}
+        cooling = {}
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) >= 4 and parts[0] == "Z":
+                try:
+                    temp_c = int(parts[3]) / 1000.0
+                except ValueError:
+                    continue
+                if _VALID_TEMP_RANGE_C[0] < temp_c < _VALID_TEMP_RANGE_C[1]:
+                    zones[parts[1]] = {'type': parts[2], 'temp_c': temp_c}
+            elif len(parts) >= 5 and parts[0] == "C":
+                try:
+                    cooling[parts[1]] = {
+                        'type': parts[2],
+                        'cur_state': int(parts[3]),
+                        'max_state': int(parts[4])
+                    }
+                except ValueError:
+                    continue
+        return cls(zones, cooling)
+
+    def max_temp_c(self, zone_pattern=None):
+        """
+        最高温度（摄氏度）
+
+        Args:
+            zone_pattern: 只统计type匹配该正则的zone，None表示所有zone
+        """
+        temps = [
+            z['temp_c'] for z in self.zones.values()
+            if zone_pattern is None or re.search(zone_pattern, z['type'], re.IGNORECASE)
+        ]
+        return max(temps) if temps else None
+
+    def throttling_devices(self, cooling_pattern=DEFAULT_THROTTLE_COOLING_PATTERN):
+        """返回正在限频的cooling device类型列表"""
+        return sorted(
+            c['type'] for c in self.cooling_devices.values()
+            if c['cur_state'] > 0 and re.search(cooling_pattern, c['type'], re.IGNORECASE)
+        )
+
+
+class ThermalPacer:
+    """
+    测试间隔控制器
+
+    每次启动前调用 wait_until_cool()，轮询温度直到：
+    - 最高温度低于阈值，且
+    - 没有CPU/GPU相关的cooling device处于限频状态
+    或者等待超过 max_wait_s。返回开始测试时的温度快照，用于记录到结果中。
+    """
+
+    def __init__(self, device=None,
+                 threshold_c=45.0,
+                 poll_interval_s=2.0,
+                 max_wait_s=180.0,
+                 zone_pattern=None,
+                 cooling_pattern=DEFAULT_THROTTLE_COOLING_PATTERN,
+                 fallback_gap_s=5.0):
+        """
+        Args:
+            device: 目标设备（序列号或Device对象，None为adb默认设备）
+            threshold_c: 温度阈值（摄氏度）
+            poll_interval_s: 轮询间隔（秒）
+            max_wait_s: 最长等待时间（秒），超时后仍开始测试并标记为降频
+            zone_pattern: 参与判定的thermal zone类型正则，None表示所有zone
+            cooling_pattern: 判定限频的cooling device类型正则
+            fallback_gap_s: 无法读取温度时退化为固定间隔（秒）
+        """
+        self.device = resolve_device(device)
+        self.threshold_c = threshold_c
+        self.poll_interval_s = poll_interval_s
+        self.max_wait_s = max_wait_s
+        self.zone_pattern = zone_pattern
+        self.cooling_pattern = cooling_pattern
+        self.fallback_gap_s = fallback_gap_s
+
+    def snapshot(self):
+        """读取一次温度快照，失败时返回None"""
+        try:
+            output = self.device.shell(THERMAL_SNAPSHOT_CMD)
+        except AdbError as e:
+            print(f"⚠️  读取温度失败: {e.stderr}")
+            return None
+        snapshot = ThermalSnapshot.parse(output)
+        if not snapshot.zones:
+            return None
+        return snapshot
+
+    def is_cool(self, snapshot):
+        """快照是否满足开始测试的条件"""
+        max_temp = snapshot.max_temp_c(self.zone_pattern)
+        if max_temp is not None and max_temp >= self.threshold_c:
+            return False
+        return not snapshot.throttling_devices(self.cooling_pattern)
+
+    def wait_until_cool(self):
+        """
+        等待设备降温
+
+        Returns:
+            dict: 开始测试时的温度信息，字段：
+                start_temp_c: 开始时的最高温度（摄氏度）
+                throttled_at_start: 开始时是否仍在限频/超过阈值
+                throttling_devices: 开始时处于限频状态的cooling device
+                pacing_wait_s: 本次等待时长（秒）
+        """
+        wait_start = time.time()
+        snapshot = self.snapshot()
+        if snapshot is None:
+            # 读取不到温度时退化为固定间隔
+            time.sleep(self.fallback_gap_s)
+            return {
+                'start_temp_c': None,
+                'throttled_at_start': None,
+                'throttling_devices': [],
+                'pacing_wait_s': round(time.time() - wait_start, 2)
+            }
+
+        announced = False
+        while not self.is_cool(snapshot):
+            elapsed = time.time() - wait_start
+            if elapsed >= self.max_wait_s:
+                print(f"⚠️  等待降温超时（{self.max_wait_s:.0f}秒），在限频/高温状态下开始测试")
+                break
+            if not announced:
+                print(f"🌡️  设备温度 {snapshot.max_temp_c(self.zone_pattern):.1f}°C"
+                      f"（阈值 {self.threshold_c:.1f}°C），等待降温...")
+                announced = True
+            time.sleep(self.poll_interval_s)
+            snapshot = self.snapshot() or snapshot
+
+        throttling = snapshot.throttling_devices(self.cooling_pattern)
+        max_temp = snapshot.max_temp_c(self.zone_pattern)
+        info = {
+            'start_temp_c': round(max_temp, 1) if max_temp is not None else None,
+            'throttled_at_start': not self.is_cool(snapshot),
+            'throttling_devices': throttling,
+            'pacing_wait_s': round(time.time() - wait_start, 2)
+        }
+        if info['start_temp_c'] is not None:
+            print(f"🌡️  开始温度: {info['start_temp_c']:.1f}°C，等待 {info['pacing_wait_s']:.1f} 秒"
+                  + ("（⚠️ 限频中）" if info['throttled_at_start'] else ""))
+        return info
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='查看设备温度与限频状态')
+    parser.add_argument('--serial', help='目标设备序列号（多台设备连接时必须指定）')
+    parser.add_argument('--wait', action='store_true', help='等待设备降温到阈值以下')
+    parser.add_argument('--threshold', type=float, default=45.0, help='温度阈值（摄氏度，默认: 45）')
+    args = parser.parse_args()
+
+    pacer = ThermalPacer(args.serial, threshold_c=args.threshold)
+    if args.wait:
+        pacer.wait_until_cool()
+    else:
+        snap = pacer.snapshot()
+        if snap is None:
+            print("⚠️  无法读取温度信息")
+            sys.exit(1)
+        for name, z in sorted(snap.zones.items()):
+            print(f"{name:<18} {z['type']:<24} {z['temp_c']:6.1f}°C")
+        throttling = snap.throttling_devices()
+        print(f"\n最高温度: {snap.max_temp_c():.1f}°C")
+        print(f"限频中的cooling device: {', '.join(throttling) if throttling else '无'}")
@@ -1,28 +1,24 @@
 from os import name
-import subprocess
+import os
 import re
 import sys
 import time
 
-def adb_shell(cmd: str, need_root: bool = False) -> str:
-    if need_root:
-        full_cmd = f"su -c \"{cmd}\""
-    else:
-        full_cmd = cmd
-    result = subprocess.run(
-        ["adb", "shell", full_cmd],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    out = result.stdout.decode("utf-8", "ignore").strip()
-    err = result.stderr.decode("utf-8", "ignore").strip()
-    if result.returncode != 0:
-        print(f"[ERROR] ADB 命令失败: {full_cmd}\n{err}", file=sys.stderr)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+from experiments.device.topology import get_topology
+from experiments.cold_start.frequency_plan import FrequencyPlan
+
+
+def adb_shell(cmd: str, need_root: bool = False, device=None) -> str:
+    try:
+        return resolve_device(device).shell(cmd, need_root=need_root)
+    except AdbError as e:
+        print(f"[ERROR] ADB 命令失败: {e.cmd}\n{e.stderr}", file=sys.stderr)
         sys.exit(1)
-    return out
 
 
-def restore_governor_ranges(cluster):
+def restore_governor_ranges(cluster, device=None):
     # cluster 是 "0"、"1"、"2"…这样的字符串
     base = f"/sys/devices/system/cpu/cpu{cluster}/cpufreq"
     info_min_path = f"{base}/cpuinfo_min_freq"
@@ -31,19 +27,35 @@ def restore_governor_ranges(cluster):
     max_path      = f"{base}/scaling_max_freq"
 
     # 1. 先读默认上下限
-    default_min = adb_shell(f"cat {info_min_path}", need_root=True).strip()
-    default_max = adb_shell(f"cat {info_max_path}", need_root=True).strip()
+    default_min = adb_shell(f"cat {info_min_path}", need_root=True, device=device).strip()
+    default_max = adb_shell(f"cat {info_max_path}", need_root=True, device=device).strip()
 
     # 2. 写回 scaling_min_freq 和 scaling_max_freq
-    adb_shell(f"echo {default_min} > {min_path}", need_root=True)
-    adb_shell(f"echo {default_max} > {max_path}", need_root=True)
+    adb_shell(f"echo {default_min} > {min_path}", need_root=True, device=device)
+    adb_shell(f"echo {default_max} > {max_path}", need_root=True, device=device)
 
-def set_cluster_frequency(cluster: str, freq: int):
+def set_cluster_frequency(cluster: str, freq: int, device=None):
     min_path = "/sys/devices/system/cpu/cpu" + cluster + "/cpufreq/scaling_min_freq"
     max_path = "/sys/devices/system/cpu/cpu" + cluster + "/cpufreq/scaling_max_freq"
-    adb_shell(f"echo {freq} > {min_path}", need_root=True)
-    adb_shell(f"echo {freq} > {max_path}", need_root=True)
-def list_cpu_domains() -> list[dict]:
+    adb_shell(f"echo {freq} > {min_path}", need_root=True, device=device)
+    adb_shell(f"echo {freq} > {max_path}", need_root=True, device=device)
+def _read_live_policy_values(device=None) -> dict:
+    """一次adb调用读取所有policy的当前调度器和当前频率：{policy_id: (governor, cur_freq)}"""
+    out = adb_shell(
+        "for p in /sys/devices/system/cpu/cpufreq/policy*; do "
+        "echo \"${p##*policy} $(cat $p/scaling_governor 2>/dev/null || echo unknown) "
+        "$(cat $p/scaling_cur_freq 2>/dev/null || echo unknown)\"; done",
+        device=device
+    )
+    values = {}
+    for line in out.splitlines():
+        parts = line.split()
+        if len(parts) == 3:
+            values[parts[0]] = (parts[1], parts[2])
+    return values
+
+
+def list_cpu_domains(device=None, live=False) -> list[dict]:
     """
     返回 CPU 频率域（cpufreq policy）列表：
     [
@@ -58,49 +70,40 @@ def list_cpu_domains() -> list[dict]:
       },
       ...
     ]
+
+    静态属性来自设备拓扑缓存（experiments.device.topology），不再逐项读取sysfs；
+    调度器和当前频率是运行时状态，不缓存：live=True 时额外用一次adb调用读取，否则 governor 和 cur_freq 为 "unknown"
     """
-    # 优先走 policy（最标准）
-    out = adb_shell("ls -d /sys/devices/system/cpu/cpufreq/policy* 2>/dev/null")
-    policies = [p.strip() for p in out.splitlines() if p.strip()]
+    topology = get_topology(device)
     domains = []
 
-    if policies:
-        for p in policies:
-            m = re.search(r"policy(\d+)$", p)
-            if not m:
-                continue
-            policy_id = m.group(1)
-
-            cpus = adb_shell(
-                f"cat {p}/related_cpus 2>/dev/null || cat {p}/affected_cpus 2>/dev/null || echo unknown"
-            ).strip()
-            governor = adb_shell(f"cat {p}/scaling_governor 2>/dev/null || echo unknown").strip()
-            cur_freq = adb_shell(f"cat {p}/scaling_cur_freq 2>/dev/null || echo unknown").strip()
-            min_freq = adb_shell(f"cat {p}/cpuinfo_min_freq 2>/dev/null || echo unknown").strip()
-            max_freq = adb_shell(f"cat {p}/cpuinfo_max_freq 2>/dev/null || echo unknown").strip()
-
+    if topology.policies:
+        live_values = _read_live_policy_values(device) if live else {}
+        for policy_id in topology.policy_ids:
+            p = topology.policies[policy_id]
+            governor, cur_freq = live_values.get(policy_id, ("unknown", "unknown"))
             domains.append({
                 "policy": policy_id,
-                "path": p,
-                "cpus": cpus,
+                "path": p['path'],
+                "cpus": " ".join(str(c) for c in p['cpus']) or "unknown",
                 "governor": governor,
                 "cur_freq": cur_freq,
-                "min_freq": min_freq,
-                "max_freq": max_freq,
+                "min_freq": str(p['cpuinfo_min_freq'] or "unknown"),
+                "max_freq": str(p['cpuinfo_max_freq'] or "unknown"),
             })
         return domains
 
     # 兜底：老式路径（cpuX/cpufreq）存在时，按 related_cpus 进行归组
-    cpu_list = adb_shell("ls -d /sys/devices/system/cpu/cpu[0-9]* 2>/dev/null | sed 's#.*/cpu##' | sort -n")
+    cpu_list = adb_shell("ls -d /sys/devices/system/cpu/cpu[0-9]* 2>/dev/null | sed 's#.*/cpu##' | sort -n", device=device)
     cpus = [c.strip() for c in cpu_list.splitlines() if c.strip()]
     groups = {}
 
     for cpu in cpus:
         base = f"/sys/devices/system/cpu/cpu{cpu}/cpufreq"
-        exists = adb_shell(f"if [ -d {base} ]; then echo 1; fi").strip()
+        exists = adb_shell(f"if [ -d {base} ]; then echo 1; fi", device=device).strip()
         if exists != "1":
             continue
-        rel = adb_shell(f"cat {base}/related_cpus 2>/dev/null || echo {cpu}").strip()
+        rel = adb_shell(f"cat {base}/related_cpus 2>/dev/null || echo {cpu}", device=device).strip()
         groups.setdefault(rel, set()).add(cpu)
 
     # 输出成“域”列表（没有 policy id，就用 related_cpus 字符串当 key）
@@ -115,8 +118,8 @@ def list_cpu_domains() -> list[dict]:
     return domains
 
 
-def print_cpu_domains():
-    domains = list_cpu_domains()
+def print_cpu_domains(device=None):
+    domains = list_cpu_domains(device, live=True)
     if not domains:
         print("未发现 cpufreq 域（policy* 或 cpu*/cpufreq 都没有）。")
         return
@@ -133,7 +136,7 @@ def print_cpu_domains():
             print(f"- domain cpus=[{d['cpus']}] members=[{d.get('members', '')}] (fallback)")
 
 
-def get_policy_original_settings(policy_id: str):
+def get_policy_original_settings(policy_id: str, device=None):
     """
     获取policy的原始频率设置（从cpuinfo_min_freq和cpuinfo_max_freq读取默认范围）
     
@@ -145,9 +148,14 @@ def get_policy_original_settings(policy_id: str):
     """
     policy_path = f"/sys/devices/system/cpu/cpufreq/policy{policy_id}"
     
-    # 读取默认的最小和最大频率（硬件支持的范围）
-    min_freq = adb_shell(f"cat {policy_path}/cpuinfo_min_freq", need_root=True).strip()
-    max_freq = adb_shell(f"cat {policy_path}/cpuinfo_max_freq", need_root=True).strip()
+    # 默认的最小和最大频率（硬件支持的范围）来自拓扑缓存
+    policy = get_topology(device).policies.get(str(policy_id))
+    if policy and policy['cpuinfo_min_freq'] and policy['cpuinfo_max_freq']:
+        min_freq = str(policy['cpuinfo_min_freq'])
+        max_freq = str(policy['cpuinfo_max_freq'])
+    else:
+        min_freq = adb_shell(f"cat {policy_path}/cpuinfo_min_freq", need_root=True, device=device).strip()
+        max_freq = adb_shell(f"cat {policy_path}/cpuinfo_max_freq", need_root=True, device=device).strip()
     
     return {
         'policy_id': policy_id,
@@ -157,7 +165,7 @@ def get_policy_original_settings(policy_id: str):
     }
 
 
-def set_policy_to_max(policy_id: str, save_original=True):
+def set_policy_to_max(policy_id: str, save_original=True, device=None):
     """
     设置指定policy到最大频率
     
@@ -173,50 +181,47 @@ def set_policy_to_max(policy_id: str, save_original=True):
     # 保存原始设置
     original_settings = None
     if save_original:
-        original_settings = get_policy_original_settings(policy_id)
+        original_settings = get_policy_original_settings(policy_id, device)
     
     # 读取最大频率
-    max_freq = adb_shell(f"cat {policy_path}/cpuinfo_max_freq", need_root=True).strip()
+    max_freq = get_policy_original_settings(policy_id, device)['max_freq_khz']
     
-    # 设置最小和最大频率都为最大值
-    min_path = f"{policy_path}/scaling_min_freq"
-    max_path = f"{policy_path}/scaling_max_freq"
-    
-    # 使用sh -c来确保重定向正确执行
-    # adb_shell在need_root时会用su -c "cmd"，所以这里用单引号避免嵌套
-    adb_shell(f"sh -c 'echo {max_freq} > {min_path}'", need_root=True)
-    adb_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
+    # 设置最小和最大频率都为最大值；通过FrequencyPlan在设备端按当前max决定写入顺序
+    # （当前max低于最大频率时先写max，否则min会因 min > max 被内核拒绝）
+    result = FrequencyPlan({policy_id: int(max_freq)}).apply(device, verbose=False)
+    if not result['success']:
+        target = result['targets'].get(f"policy{policy_id}", {})
+        print(f"⚠️  policy{policy_id}: 目标 {max_freq} KHz，回读 {target.get('min')}-{target.get('max')}")
+        return original_settings
     
     print(f"✅ policy{policy_id}: {max_freq} KHz ({int(max_freq)/1000:.0f} MHz)")
     return original_settings
 
 
-def restore_policy_frequency(policy_id: str):
+def restore_policy_frequency(policy_id: str, device=None):
     """
     恢复policy频率到默认范围（cpuinfo_min_freq 到 cpuinfo_max_freq）
     
     Args:
         policy_id: policy ID
     """
-    original = get_policy_original_settings(policy_id)
-    policy_path = original['policy_path']
+    original = get_policy_original_settings(policy_id, device)
     min_freq = original['min_freq_khz']
     max_freq = original['max_freq_khz']
     
-    min_path = f"{policy_path}/scaling_min_freq"
-    max_path = f"{policy_path}/scaling_max_freq"
-    
-    # 恢复最小频率到硬件支持的最小值
-    adb_shell(f"sh -c 'echo {min_freq} > {min_path}'", need_root=True)
-    # 恢复最大频率到硬件支持的最大值
-    adb_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
+    # 恢复为硬件支持的范围（写入顺序由FrequencyPlan在设备端决定）
+    result = FrequencyPlan({policy_id: {'min': int(min_freq), 'max': int(max_freq)}}).apply(device, verbose=False)
+    if not result['success']:
+        target = result['targets'].get(f"policy{policy_id}", {})
+        print(f"⚠️  policy{policy_id}: 恢复后回读 {target.get('min')}-{target.get('max')}")
+        return
     
     print(f"✅ policy{policy_id}: 已恢复 (min: {int(min_freq)/1000:.0f} MHz, max: {int(max_freq)/1000:.0f} MHz)")
 
 
-def restore_all_policies_frequency():
+def restore_all_policies_frequency(device=None):
     """恢复所有policy频率到默认范围"""
-    domains = list_cpu_domains()
+    domains = list_cpu_domains(device)
     if not domains:
         print("⚠️  未找到任何CPU policy域")
         return
@@ -227,16 +232,16 @@ def restore_all_policies_frequency():
         policy_id = d.get("policy")
         if policy_id and policy_id != "N/A":
             try:
-                restore_policy_frequency(policy_id)
+                restore_policy_frequency(policy_id, device)
             except Exception as e:
                 print(f"⚠️  policy{policy_id}: 恢复失败 - {e}")
     
     print("\n✅ 所有CPU policy频率已恢复")
 
 
-def set_all_policies_to_max():
+def set_all_policies_to_max(device=None):
     """设置所有policy到最大频率"""
-    domains = list_cpu_domains()
+    domains = list_cpu_domains(device)
     if not domains:
         print("⚠️  未找到任何CPU policy域")
         return []
@@ -248,7 +253,7 @@ def set_all_policies_to_max():
         policy_id = d.get("policy")
         if policy_id and policy_id != "N/A":
             try:
-                original = set_policy_to_max(policy_id, save_original=True)
+                original = set_policy_to_max(policy_id, save_original=True, device=device)
                 if original:
                     original_settings_list.append(original)
             except Exception as e:
@@ -268,23 +273,25 @@ def main():
     parser.add_argument('--all', action='store_true', help='设置所有policy到最大频率')
     parser.add_argument('--restore', type=str, nargs='?', const='all', metavar='POLICY_ID', 
                        help='恢复频率到默认范围。使用 --restore 恢复所有，或 --restore POLICY_ID 恢复指定policy')
+    parser.add_argument('--serial', help='目标设备序列号（多台设备连接时必须指定）')
     
     args = parser.parse_args()
+    device = args.serial
     
     # 如果指定了--list，只列出信息并退出
     if args.list:
-        print_cpu_domains()
+        print_cpu_domains(device)
         return
     
     # 如果指定了--restore，恢复频率
     if args.restore:
         if args.restore == 'all':
             # 恢复所有policy
-            restore_all_policies_frequency()
+            restore_all_policies_frequency(device)
         else:
             # 恢复指定policy
             try:
-                restore_policy_frequency(args.restore)
+                restore_policy_frequency(args.restore, device=device)
             except Exception as e:
                 print(f"❌ 错误：{e}")
                 sys.exit(1)
@@ -293,16 +300,16 @@ def main():
     # 如果指定了--policy，只设置该policy
     if args.policy:
         try:
-            set_policy_to_max(args.policy)
+            set_policy_to_max(args.policy, device=device)
         except Exception as e:
             print(f"❌ 错误：{e}")
             sys.exit(1)
     elif args.all:
         # 设置所有policy到最大频率
-        set_all_policies_to_max()
+        set_all_policies_to_max(device)
     else:
         # 默认设置所有policy
-        set_all_policies_to_max()
+        set_all_policies_to_max(device)
 
 
 if __name__ == "__main__":
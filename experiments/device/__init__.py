@@ -0,0 +1,44 @@
+"""
+设备管理模块
+"""
+from .device import (
+    AdbError,
+    Device,
+    resolve_device,
+    list_devices,
+    select_devices
+)
+from .topology import (
+    DeviceTopology,
+    get_topology,
+    invalidate_topology
+)
+from .shell_session import (
+    ShellSession,
+    get_session,
+    close_all_sessions
+)
+from .local_device import LocalDevice
+from .fake_sysfs import (
+    FakeDevice,
+    FakeSysfsRules,
+    get_fake_device
+)
+
+__all__ = [
+    'AdbError',
+    'Device',
+    'resolve_device',
+    'list_devices',
+    'select_devices',
+    'DeviceTopology',
+    'get_topology',
+    'invalidate_topology',
+    'ShellSession',
+    'get_session',
+    'close_all_sessions',
+    'LocalDevice',
+    'FakeDevice',
+    'FakeSysfsRules',
+    'get_fake_device'
+]
@@ -0,0 +1,96 @@
+"""
+adb shell 单条命令延迟基准测试
+对比 每条命令一个adb进程（adb shell su -c ...）与 持久化会话 的延迟
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import resolve_device, get_session
+
+
+DEFAULT_BENCH_CMD = "cat /sys/devices/system/cpu/cpufreq/policy0/scaling_cur_freq"
+
+
+def _time_calls(fn, iterations):
+    """执行 iterations 次并返回每次耗时（毫秒）"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def _summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'mean_ms': statistics.mean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max_ms': ordered[-1]
+    }
+
+
+def bench_shell_session(device=None, cmd=DEFAULT_BENCH_CMD, iterations=50, need_root=True):
+    """
+    测量单条命令延迟
+
+    Args:
+        device: 目标设备（序列号或Device对象）
+        cmd: 测试命令
+        iterations: 每种方式的执行次数
+        need_root: 是否以root执行
+
+    Returns:
+        dict: {'subprocess': 统计, 'session': 统计, 'session_connect_ms': 会话建立耗时}
+    """
+    device = resolve_device(device)
+
+    print(f"📱 设备: {device.serial or 'default'}，命令: {cmd}，每种方式 {iterations} 次")
+
+    print("⏱️  每条命令一个adb进程...")
+    per_process = _time_calls(lambda: device.shell(cmd, need_root=need_root, use_session=False), iterations)
+
+    session = get_session(device, root=need_root)
+    session.close()
+    start = time.perf_counter()
+    session.run("true")
+    connect_ms = (time.perf_counter() - start) * 1000.0
+
+    print("⏱️  持久化会话...")
+    in_session = _time_calls(lambda: device.shell(cmd, need_root=need_root), iterations)
+
+    results = {
+        'subprocess': _summarize(per_process),
+        'session': _summarize(in_session),
+        'session_connect_ms': connect_ms
+    }
+
+    print(f"\n{'方式':<16} {'平均':>10} {'P50':>10} {'P95':>10} {'最大':>10}")
+    for name, label in (('subprocess', '独立adb进程'), ('session', '持久化会话')):
+        s = results[name]
+        print(f"{label:<16} {s['mean_ms']:>8.1f}ms {s['p50_ms']:>8.1f}ms {s['p95_ms']:>8.1f}ms {s['max_ms']:>8.1f}ms")
+    print(f"\n🔌 会话建立耗时: {connect_ms:.1f} ms（每台设备只发生一次）")
+    speedup = results['subprocess']['mean_ms'] / max(results['session']['mean_ms'], 1e-6)
+    print(f"🚀 平均加速: {speedup:.1f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='adb shell 单条命令延迟基准测试')
+    parser.add_argument('-n', '--iterations', type=int, default=50, help='每种方式的执行次数（默认: 50）')
+    parser.add_argument('--cmd', default=DEFAULT_BENCH_CMD, help='测试命令')
+    parser.add_argument('--no-root', action='store_true', help='不使用su执行')
+    parser.add_argument('--serial', default=None, help='目标设备序列号（默认: adb默认设备）')
+    args = parser.parse_args()
+
+    bench_shell_session(args.serial, args.cmd, args.iterations, need_root=not args.no_root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+设备抽象
+封装ADB序列号，所有adb调用（shell / pull / push）都通过 `adb -s <serial>` 指向确定的设备，
+使一台主机可以同时驱动多台手机。
+不经过adb的设备见 local_device.py（本机shell）和 fake_sysfs.py（模拟sysfs节点树）
+"""
+import subprocess
+
+
+class AdbError(RuntimeError):
+    """adb命令执行失败"""
+
+    def __init__(self, cmd, returncode, stderr):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+        super().__init__(f"ADB 命令失败 (returncode={returncode}): {cmd}\n{stderr}")
+
+
+class Device:
+    """一台通过ADB连接的设备"""
+
+    def __init__(self, serial=None):
+        """
+        Args:
+            serial: 设备序列号（adb devices 中的第一列），为None时使用adb默认设备
+        """
+        self.serial = serial
+
+    def __repr__(self):
+        return f"Device({self.serial!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Device) and other.serial == self.serial
+
+    def __hash__(self):
+        return hash(self.serial)
+
+    @property
+    def label(self):
+        """用于日志和目录名的设备标识"""
+        if not self.serial:
+            return "default"
+        # 无线调试的序列号形如 192.168.1.5:5555，冒号不适合做目录名
+        return self.serial.replace(":", "_")
+
+    def adb_args(self, *args):
+        """构造带 -s 参数的adb命令行"""
+        cmd = ["adb"]
+        if self.serial:
+            cmd += ["-s", self.serial]
+        cmd.extend(args)
+        return cmd
+
+    def run(self, *args, **kwargs):
+        """执行一条adb命令（参数与subprocess.run相同）"""
+        return subprocess.run(self.adb_args(*args), **kwargs)
+
+    def shell(self, cmd: str, need_root: bool = False, use_session: bool = True) -> str:
+        """
+        执行adb shell命令
+
+        默认通过设备的持久化shell会话执行（见 shell_session.py），避免每条命令都启动新的adb和su进程
+
+        Args:
+            cmd: shell命令
+            need_root: 是否需要通过su以root身份执行
+            use_session: 是否使用持久化会话；长时间阻塞的命令（如快速测量脚本）应传False，
+                         以免占住会话阻塞其他线程的频率读写
+
+        Returns:
+            str: 命令标准输出（已去除首尾空白）
+
+        Raises:
+            AdbError: 命令返回码非0
+        """
+        from .shell_session import PERSISTENT_SHELL_ENABLED, get_session
+
+        if use_session and PERSISTENT_SHELL_ENABLED:
+            returncode, out, err = get_session(self, root=need_root).run(cmd)
+            full_cmd = cmd
+        else:
+            if need_root:
+                full_cmd = f"su -c \"{cmd}\""
+            else:
+                full_cmd = cmd
+            result = subprocess.run(
+                self.adb_args("shell", full_cmd),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            returncode = result.returncode
+            out = result.stdout.decode("utf-8", "ignore")
+            err = result.stderr.decode("utf-8", "ignore")
+        out = out.strip()
+        err = err.strip()
+        if returncode != 0:
+            raise AdbError(full_cmd, returncode, err)
+        return out
+
+    def run_script(self, script: str, need_root: bool = False, timeout_s: float = None) -> str:
+        """
+        执行多行shell脚本（一次往返）
+
+        与 shell() 不同，脚本不会被包进 `su -c "..."`，其中的引号和 $ 不需要转义：
+        使用持久化会话时直接写入会话，否则通过stdin交给设备端的 su / sh
+
+        Args:
+            script: 脚本内容
+            need_root: 是否以root执行
+            timeout_s: 超时（秒），None时使用会话默认超时（subprocess方式不限时）
+
+        Returns:
+            str: 脚本标准输出（已去除首尾空白）
+
+        Raises:
+            AdbError: 脚本返回码非0
+        """
+        from .shell_session import PERSISTENT_SHELL_ENABLED, get_session
+
+        if PERSISTENT_SHELL_ENABLED:
+            returncode, out, err = get_session(self, root=need_root).run(script, timeout_s=timeout_s)
+        else:
+            try:
+                result = subprocess.run(
+                    self.adb_args("shell", "su" if need_root else "sh"),
+                    input=script.encode("utf-8"),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=timeout_s
+                )
+            except subprocess.TimeoutExpired:
+                raise AdbError(script, -1, f"脚本超时（{timeout_s}秒）")
+            returncode = result.returncode
+            out = result.stdout.decode("utf-8", "ignore")
+            err = result.stderr.decode("utf-8", "ignore")
+        if returncode != 0:
+            raise AdbError(script, returncode, err.strip())
+        return out.strip()
+
+    def pull(self, remote, local):
+        """从设备拉取文件"""
+        self.run("pull", remote, local, check=True)
+
+    def getprop(self, name):
+        """读取系统属性"""
+        return self.shell(f"getprop {name}").strip()
+
+    @property
+    def model(self):
+        """设备型号（ro.product.model）"""
+        return self.getprop("ro.product.model")
+
+
+def resolve_device(device=None):
+    """
+    将各种形式的设备参数统一为Device对象
+
+    Args:
+        device: None（adb默认设备）、序列号字符串或Device对象；
+                序列号为 "local" 时返回本机shell设备，为 "fake:<名称>" 时返回模拟sysfs设备
+
+    Returns:
+        Device
+    """
+    if isinstance(device, Device):
+        return device
+    if isinstance(device, str):
+        from .local_device import LOCAL_SERIAL, LocalDevice
+        from .fake_sysfs import FAKE_SERIAL_PREFIX, get_fake_device
+
+        if device == LOCAL_SERIAL:
+            return LocalDevice()
+        if device.startswith(FAKE_SERIAL_PREFIX):
+            return get_fake_device(device[len(FAKE_SERIAL_PREFIX):] or "default")
+    return Device(device)
+
+
+def list_devices():
+    """
+    列出当前已连接且处于 device 状态的设备
+
+    Returns:
+        list[Device]
+    """
+    result = subprocess.run(["adb", "devices"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    devices = []
+    for line in result.stdout.decode("utf-8", "ignore").splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == "device":
+            devices.append(Device(parts[0]))
+    return devices
+
+
+def select_devices(serials=None, require_same_model=True):
+    """
+    选择用于并行实验的设备
+
+    Args:
+        serials: 序列号列表，为None时使用所有已连接设备
+        require_same_model: 是否要求所有设备为同一型号（不同型号的结果不可直接合并）
+
+    Returns:
+        list[Device]
+
+    Raises:
+        RuntimeError: 没有可用设备，或设备型号不一致
+    """
+    attached = list_devices()
+    if serials:
+        attached_serials = {d.serial for d in attached}
+        missing = [s for s in serials if s not in attached_serials]
+        if missing:
+            raise RuntimeError(f"以下设备未连接: {', '.join(missing)}")
+        devices = [Device(s) for s in serials]
+    else:
+        devices = attached
+
+    if not devices:
+        raise RuntimeError("未发现已连接的设备")
+
+    if require_same_model and len(devices) > 1:
+        models = {d.serial: d.model for d in devices}
+        if len(set(models.values())) > 1:
+            detail = ", ".join(f"{s}={m}" for s, m in models.items())
+            raise RuntimeError(f"设备型号不一致，无法合并结果: {detail}")
+
+    return devices
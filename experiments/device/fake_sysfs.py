@@ -0,0 +1,251 @@
+"""
+模拟sysfs设备
+在本机临时目录中生成与实验手机相同结构的cpufreq / Mali GPU / devfreq / cgroup / thermal节点树，
+设备端脚本中的 /sys、/dev/cpuctl、/dev/cpuset 路径被映射到该目录，在本机 sh 中执行。
+所有频率写入都经过 sysfs_write（见 frequency_plan.PLAN_SCRIPT_PRELUDE），FakeDevice 把它替换为
+带内核行为模拟的版本：可配置的写入延迟、min > max 拒绝、非OPP频率拒绝、只读节点、频率生效延迟。
+
+用法：
+    device = FakeDevice(rules=FakeSysfsRules(write_latency_s=0.001, reject_unlisted_freqs=True))
+    FrequencyPlan({"7": 3105000}).apply(device)
+也可以在任何接受 --serial 的脚本中传入 fake:<名称>（同名进程内共享同一棵节点树）
+"""
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from .local_device import LocalDevice
+
+
+FAKE_SERIAL_PREFIX = "fake:"
+
+# 模拟的设备（与实验手机相同的policy 0/4/7和Mali OPP表，见 cold_start/batch_test.py 中的频率表）
+FAKE_PROPS = {
+    "ro.product.model": "FakeSysfs",
+    "ro.build.fingerprint": "fake/fake_sysfs/fake:14/FAKE/1:userdebug/test-keys",
+}
+FAKE_POLICIES = {
+    "0": ("0 1 2 3", [820000, 955000, 1098000, 1197000, 1328000, 1425000, 1548000, 1696000, 1849000, 1950000]),
+    "4": ("4 5 6", [357000, 578000, 648000, 787000, 910000, 1065000, 1221000, 1328000, 1418000, 1549000,
+                    1795000, 1945000, 2130000, 2245000, 2367000, 2450000, 2600000]),
+    "7": ("7", [700000, 1164000, 1396000, 1557000, 1745000, 1885000, 1999000, 2147000, 2294000, 2363000,
+                2499000, 2687000, 2802000, 2914000, 2943000, 2970000, 3015000, 3105000]),
+}
+FAKE_GPU_FREQS = [940000, 890000, 850000, 807000, 723000, 649000, 580000, 521000, 467000, 419000,
+                  376000, 337000, 302000, 150000]
+FAKE_DEVFREQ = {
+    "17000010.devfreq_mif": [421000, 546000, 676000, 845000, 1014000, 1352000, 1539000, 1716000,
+                             2028000, 2288000, 2730000, 3172000],
+    "17000020.devfreq_int": [100000, 200000, 332000, 400000, 533000],
+    "17000090.devfreq_dsu": [324000, 610000, 820000, 970000, 1050000, 1220000, 1400000, 1750000, 1950000],
+}
+FAKE_THERMAL_ZONES = (("BIG", 38000), ("MID", 36000), ("LITTLE", 35000), ("G3D", 34000), ("battery", 30000))
+FAKE_COOLING_DEVICES = (("thermal-cpufreq-0", 10), ("thermal-cpufreq-1", 17), ("thermal-cpufreq-2", 18),
+                        ("thermal-gpufreq-0", 14))
+
+# 设备路径 → 节点树中的相对位置
+_MAPPED_ROOTS = re.compile(r"(?<![\w.\-/])(/sys/|/dev/cpuctl\b|/dev/cpuset\b)")
+
+# 默认只读的节点（shell通配符）
+DEFAULT_READ_ONLY = ("*/cpuinfo_*", "*/related_cpus", "*/affected_cpus", "*available_*",
+                     "*/cur_freq", "*/scaling_cur_freq", "*/temp", "*/type")
+
+# 模拟的 sysfs_write：替换脚本中原有的定义
+FAKE_SYSFS_WRITE = """\
+sysfs_write() {{
+  [ -f "$1" ] || return 1
+  case "$1" in {read_only}) return 1;; esac
+  {write_latency}
+  d=${{1%/*}}; n=${{1##*/}}; lo=; hi=
+  case "$n" in
+    scaling_min_freq|min_freq) p=${{n%min_freq}}; lo=$2; hi=$(cat "$d/${{p}}max_freq" 2>/dev/null) ;;
+    scaling_max_freq|max_freq) p=${{n%max_freq}}; lo=$(cat "$d/${{p}}min_freq" 2>/dev/null); hi=$2 ;;
+    *governor) ag="$d/${{n%governor}}available_governors"
+      if {check_governors} [ -f "$ag" ]; then case " $(cat "$ag") " in *" $2 "*) ;; *) return 1;; esac; fi ;;
+  esac
+  if [ -n "$lo" ] && [ -n "$hi" ]; then
+    {min_above_max}
+    av="$d/scaling_available_frequencies"; [ -f "$av" ] || av="$d/available_frequencies"
+    if {reject_unlisted} [ -f "$av" ]; then case " $(cat "$av") " in *" $2 "*) ;; *) return 1;; esac; fi
+  fi
+  echo "$2" > "$1" || return 1
+  if [ -n "$lo" ] && [ -n "$hi" ]; then
+    lo=$(cat "$d/${{p}}min_freq"); hi=$(cat "$d/${{p}}max_freq")
+    cf="$d/${{p}}cur_freq"; [ -f "$cf" ] || cf="$d/cur_freq"
+    cur=$(cat "$cf" 2>/dev/null || echo "$lo")
+    [ "$cur" -lt "$lo" ] && cur=$lo
+    [ "$cur" -gt "$hi" ] && cur=$hi
+    {actuate}
+  fi
+  return 0
+}}
+"""
+
+
+class FakeSysfsRules:
+    """模拟的内核行为"""
+
+    def __init__(self, write_latency_s=0.0, actuation_delay_s=0.0, reject_min_above_max=True,
+                 reject_unlisted_freqs=False, check_governors=True, read_only=DEFAULT_READ_ONLY):
+        """
+        Args:
+            write_latency_s: 每次写入的额外延迟（秒）
+            actuation_delay_s: 写入后到当前频率（cur_freq）变化的延迟（秒），0表示立即生效
+            reject_min_above_max: 写入后 min > max 时拒绝（返回失败，值不变）
+            reject_unlisted_freqs: 拒绝不在可用频率列表中的频率
+            check_governors: 拒绝不在可用调度器列表中的调度器
+            read_only: 拒绝写入的节点（shell通配符）
+        """
+        self.write_latency_s = write_latency_s
+        self.actuation_delay_s = actuation_delay_s
+        self.reject_min_above_max = reject_min_above_max
+        self.reject_unlisted_freqs = reject_unlisted_freqs
+        self.check_governors = check_governors
+        self.read_only = tuple(read_only)
+
+    def compile(self):
+        """生成模拟的 sysfs_write 函数"""
+        # 关闭的检查用 "false &&" 短路掉
+        if self.actuation_delay_s > 0:
+            actuate = f'(sleep {self.actuation_delay_s}; echo "$cur" > "$cf") >/dev/null 2>&1 &'
+        else:
+            actuate = 'echo "$cur" > "$cf"'
+        return FAKE_SYSFS_WRITE.format(
+            read_only="|".join(self.read_only) or "/nonexistent",
+            write_latency=f"sleep {self.write_latency_s}" if self.write_latency_s > 0 else ":",
+            check_governors="" if self.check_governors else "false &&",
+            min_above_max='[ "$lo" -le "$hi" ] || return 1' if self.reject_min_above_max else ":",
+            reject_unlisted="" if self.reject_unlisted_freqs else "false &&",
+            actuate=actuate
+        )
+
+
+def _write(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{value}\n")
+
+
+def build_fake_sysfs(root):
+    """
+    在root下生成模拟节点树（已存在的节点会被覆盖为初始值）
+
+    Args:
+        root: 节点树根目录
+    """
+    from .topology import DEVFREQ_CLASS_PATH, GPU_DEVFREQ_PATH
+
+    cpufreq = os.path.join(root, "sys/devices/system/cpu/cpufreq")
+    for policy_id, (cpus, freqs) in FAKE_POLICIES.items():
+        p = os.path.join(cpufreq, f"policy{policy_id}")
+        for name, value in (
+            ("related_cpus", cpus), ("affected_cpus", cpus),
+            ("cpuinfo_min_freq", freqs[0]), ("cpuinfo_max_freq", freqs[-1]),
+            ("scaling_available_frequencies", " ".join(map(str, freqs))),
+            ("scaling_available_governors", "schedutil performance powersave"),
+            ("scaling_governor", "schedutil"),
+            ("scaling_min_freq", freqs[0]), ("scaling_max_freq", freqs[-1]), ("scaling_cur_freq", freqs[0]),
+            ("schedutil/up_rate_limit_us", 500), ("schedutil/down_rate_limit_us", 20000),
+        ):
+            _write(os.path.join(p, name), value)
+
+    gpu = root + GPU_DEVFREQ_PATH
+    for name, value in (
+        ("available_frequencies", " ".join(map(str, FAKE_GPU_FREQS))),
+        ("cpuinfo_max_freq", max(FAKE_GPU_FREQS)),
+        ("scaling_min_freq", min(FAKE_GPU_FREQS)), ("scaling_max_freq", max(FAKE_GPU_FREQS)),
+        ("cur_freq", min(FAKE_GPU_FREQS)),
+        ("power_policy", "[coarse_demand] always_on"), ("dvfs_period", 100),
+    ):
+        _write(os.path.join(gpu, name), value)
+
+    for name, freqs in FAKE_DEVFREQ.items():
+        d = os.path.join(root + DEVFREQ_CLASS_PATH, name)
+        for node, value in (
+            ("available_frequencies", " ".join(map(str, freqs))),
+            ("available_governors", "interactive userspace powersave performance"),
+            ("governor", "interactive"),
+            ("min_freq", freqs[0]), ("max_freq", freqs[-1]), ("cur_freq", freqs[0]),
+        ):
+            _write(os.path.join(d, node), value)
+
+    for idx, (zone_type, temp) in enumerate(FAKE_THERMAL_ZONES):
+        zone = os.path.join(root, f"sys/class/thermal/thermal_zone{idx}")
+        _write(os.path.join(zone, "type"), zone_type)
+        _write(os.path.join(zone, "temp"), temp)
+    for idx, (cdev_type, max_state) in enumerate(FAKE_COOLING_DEVICES):
+        cdev = os.path.join(root, f"sys/class/thermal/cooling_device{idx}")
+        _write(os.path.join(cdev, "type"), cdev_type)
+        _write(os.path.join(cdev, "cur_state"), 0)
+        _write(os.path.join(cdev, "max_state"), max_state)
+
+    _write(os.path.join(root, "dev/cpuctl/top-app/cpu.uclamp.min"), "0.00")
+    _write(os.path.join(root, "dev/cpuctl/top-app/cpu.uclamp.max"), "max")
+    _write(os.path.join(root, "dev/cpuset/top-app/cpus"), "0-7")
+
+
+class FakeDevice(LocalDevice):
+    """
+    使用模拟节点树的设备
+
+    节点树在临时目录中，进程退出时不会自动删除，可调用 cleanup()
+    """
+
+    def __init__(self, name="default", rules=None, root_dir=None):
+        """
+        Args:
+            name: 设备名（序列号为 fake:<name>）
+            rules: FakeSysfsRules，None时使用默认规则
+            root_dir: 节点树目录，None时新建临时目录
+        """
+        super().__init__(f"{FAKE_SERIAL_PREFIX}{name}")
+        self.rules = rules or FakeSysfsRules()
+        self.root_dir = os.path.realpath(root_dir or tempfile.mkdtemp(prefix="fake_sysfs_"))
+        self.props = dict(FAKE_PROPS)
+        build_fake_sysfs(self.root_dir)
+
+    def __repr__(self):
+        return f"FakeDevice({self.serial!r}, root_dir={self.root_dir!r})"
+
+    def reset(self):
+        """把所有节点恢复为初始值"""
+        build_fake_sysfs(self.root_dir)
+
+    def cleanup(self):
+        """删除节点树"""
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+
+    def to_local(self, text):
+        text = _MAPPED_ROOTS.sub(lambda m: self.root_dir + m.group(1), text)
+        # 脚本自带的 sysfs_write 替换为模拟版本
+        return re.sub(r"^sysfs_write\(\) \{.*\}[ \t]*$", lambda m: self.rules.compile(), text, flags=re.M)
+
+    def from_local(self, text):
+        return text.replace(self.root_dir, "")
+
+    def script_prelude(self):
+        cases = "".join(f"    {name}) echo '{value}' ;;\n" for name, value in self.props.items())
+        return f'getprop() {{\n  case "$1" in\n{cases}  esac\n}}\n'
+
+    def _sh_args(self, need_root):
+        # 模拟节点树属于当前用户，不需要su
+        return ["sh"]
+
+
+_FAKE_DEVICES = {}
+_FAKE_DEVICES_LOCK = threading.Lock()
+
+
+def get_fake_device(name="default"):
+    """
+    获取指定名称的模拟设备（同一进程中同名设备共享节点树）
+
+    Returns:
+        FakeDevice
+    """
+    with _FAKE_DEVICES_LOCK:
+        if name not in _FAKE_DEVICES:
+            _FAKE_DEVICES[name] = FakeDevice(name)
+        return _FAKE_DEVICES[name]
@@ -0,0 +1,73 @@
+"""
+本机shell设备
+不经过adb，直接在本机的 sh 中执行命令和脚本。用于在手机上（如Termux）直接运行实验，
+或在有cpufreq的Linux主机上调试控制逻辑；也是 fake_sysfs.FakeDevice 的基类。
+"""
+import os
+import shutil
+import subprocess
+
+from .device import AdbError, Device
+
+
+LOCAL_SERIAL = "local"
+
+
+class LocalDevice(Device):
+    """在本机shell中执行命令的设备（接口与Device相同）"""
+
+    def __init__(self, serial=LOCAL_SERIAL):
+        super().__init__(serial)
+
+    def __repr__(self):
+        return f"LocalDevice({self.serial!r})"
+
+    def to_local(self, text):
+        """把命令中的设备路径转换为本机路径（子类可重写）"""
+        return text
+
+    def from_local(self, text):
+        """把输出中的本机路径转换回设备路径（子类可重写）"""
+        return text
+
+    def script_prelude(self):
+        """每条命令和脚本前插入的shell代码（子类可重写）"""
+        return ""
+
+    def _sh_args(self, need_root):
+        # 已经是root（或不需要root）时直接用sh，否则通过su
+        if need_root and hasattr(os, "geteuid") and os.geteuid() != 0:
+            return ["su"]
+        return ["sh"]
+
+    def _execute(self, script, need_root, timeout_s=None):
+        try:
+            result = subprocess.run(
+                self._sh_args(need_root),
+                input=(self.script_prelude() + self.to_local(script)).encode("utf-8"),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout_s
+            )
+        except subprocess.TimeoutExpired:
+            raise AdbError(script, -1, f"脚本超时（{timeout_s}秒）")
+        out = self.from_local(result.stdout.decode("utf-8", "ignore"))
+        err = self.from_local(result.stderr.decode("utf-8", "ignore"))
+        if result.returncode != 0:
+            raise AdbError(script, result.returncode, err.strip())
+        return out.strip()
+
+    def shell(self, cmd: str, need_root: bool = False, use_session: bool = True) -> str:
+        """执行shell命令（use_session参数只为与Device兼容，本机执行没有会话）"""
+        return self._execute(cmd, need_root)
+
+    def run_script(self, script: str, need_root: bool = False, timeout_s: float = None) -> str:
+        """执行多行shell脚本"""
+        return self._execute(script, need_root, timeout_s)
+
+    def pull(self, remote, local):
+        """复制本机文件"""
+        shutil.copyfile(self.to_local(remote), local)
+
+    def run(self, *args, **kwargs):
+        raise AdbError(" ".join(args), -1, "本机设备不支持adb命令")
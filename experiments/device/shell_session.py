@@ -0,0 +1,211 @@
+"""
+持久化ADB shell会话
+每条命令启动一个新的 `adb shell`（以及新的 `su`）需要几十毫秒，频率控制时每个policy要读写多次sysfs，
+开销很快累积。这里为每台设备维护一个长期运行的 `adb shell`（root会话中再启动一次 `su`），
+命令通过stdin依次写入，输出以哨兵行分隔，会话断开时自动重连。
+
+所有模块通过 Device.shell() 共享同一个会话（按 序列号 + 是否root 区分）
+"""
+import os
+import time
+import atexit
+import queue
+import threading
+import subprocess
+import uuid
+
+from .device import AdbError
+
+
+# 设置环境变量 ADB_PERSISTENT_SHELL=0 可退回到每条命令一个adb进程的方式（用于排查问题）
+PERSISTENT_SHELL_ENABLED = os.environ.get("ADB_PERSISTENT_SHELL", "1") != "0"
+
+# 单条命令的默认超时（秒）
+DEFAULT_TIMEOUT_S = 30.0
+
+
+class ShellSession:
+    """一个长期运行的adb shell会话"""
+
+    def __init__(self, device, root=False, timeout_s=DEFAULT_TIMEOUT_S):
+        """
+        Args:
+            device: Device对象
+            root: 是否在会话中启动su
+            timeout_s: 单条命令的默认超时（秒）
+        """
+        self.device = device
+        self.root = root
+        self.timeout_s = timeout_s
+        self._proc = None
+        self._stdout = None
+        self._stderr = None
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex[:12]
+        self._counter = 0
+        # 当前命令是否已经读到输出（读到过输出的命令在会话断开时不重试，避免执行两次）
+        self._received = False
+
+    def __repr__(self):
+        return f"ShellSession({self.device.serial!r}, root={self.root})"
+
+    @property
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    @staticmethod
+    def _pump(stream, q):
+        """后台线程：逐行读取输出放入队列，EOF时放入None"""
+        for line in iter(stream.readline, b""):
+            q.put(line.decode("utf-8", "ignore"))
+        q.put(None)
+
+    def _start(self):
+        """启动adb shell（和su）"""
+        self._proc = subprocess.Popen(
+            self.device.adb_args("shell"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        self._stdout = queue.Queue()
+        self._stderr = queue.Queue()
+        for stream, q in ((self._proc.stdout, self._stdout), (self._proc.stderr, self._stderr)):
+            threading.Thread(target=self._pump, args=(stream, q), daemon=True).start()
+
+        if self.root:
+            self._proc.stdin.write(b"su\n")
+            self._proc.stdin.flush()
+            # 确认su成功：未root或授权被拒绝时，id -u 不为0
+            rc, out, err = self._exchange("id -u", self.timeout_s)
+            if rc != 0 or out.strip() != "0":
+                self.close()
+                raise AdbError("su", rc if rc else 1, err or f"su 后 id -u 返回: {out.strip()}")
+
+    def close(self):
+        """关闭会话"""
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.kill()
+            self._proc.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self._proc = None
+
+    def _read_until(self, q, sentinel, deadline):
+        """
+        从队列读取直到遇到哨兵
+
+        Args:
+            deadline: 整条命令的截止时间（time.monotonic()），持续输出的命令同样会超时
+
+        Returns:
+            tuple: (哨兵之前的输出, 哨兵之后的同行内容)
+
+        Raises:
+            EOFError: 会话在命令完成前退出
+            queue.Empty: 超时
+        """
+        lines = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise queue.Empty
+            line = q.get(timeout=remaining)
+            if line is None:
+                raise EOFError
+            self._received = True
+            pos = line.find(sentinel)
+            if pos < 0:
+                lines.append(line)
+                continue
+            # 命令输出没有以换行结尾时，哨兵会出现在同一行
+            if pos > 0:
+                lines.append(line[:pos])
+            return "".join(lines), line[pos + len(sentinel):].strip()
+
+    def _exchange(self, cmd, timeout_s):
+        """写入一条命令并读取其输出（调用方持有锁），timeout_s 是整条命令的超时"""
+        deadline = time.monotonic() + timeout_s
+        self._received = False
+        self._counter += 1
+        sentinel = f"__SHELL_SESSION_{self._token}_{self._counter}__"
+        # 命令的stdin重定向到/dev/null，避免误读会话后续写入的命令
+        payload = f"{{\n{cmd}\n}} </dev/null\necho \"{sentinel} $?\"\necho \"{sentinel}\" >&2\n"
+        self._proc.stdin.write(payload.encode("utf-8"))
+        self._proc.stdin.flush()
+        out, rc_str = self._read_until(self._stdout, sentinel, deadline)
+        err, _ = self._read_until(self._stderr, sentinel, deadline)
+        try:
+            rc = int(rc_str)
+        except ValueError:
+            rc = -1
+        return rc, out, err
+
+    def run(self, cmd, timeout_s=None):
+        """
+        在会话中执行一条命令
+
+        会话未启动或已断开时自动（重新）连接；会话断开时只有在还没有读到这条命令的任何输出时
+        才重连并重试一次（已经开始输出的命令可能已执行了写入，重试会执行两次）
+
+        Returns:
+            tuple: (returncode, stdout, stderr)
+
+        Raises:
+            AdbError: 连接失败或命令超时
+        """
+        timeout_s = timeout_s or self.timeout_s
+        with self._lock:
+            for attempt in range(2):
+                if not self.alive:
+                    self._start()
+                try:
+                    return self._exchange(cmd, timeout_s)
+                except (EOFError, BrokenPipeError, OSError):
+                    # 会话断开（设备重连、adb server重启等）；命令还没有输出时重连后重试
+                    self.close()
+                    if attempt == 1 or self._received:
+                        raise AdbError(cmd, -1, "shell会话断开")
+                except queue.Empty:
+                    # 超时后会话状态未知（命令可能仍在执行），直接丢弃
+                    self.close()
+                    raise AdbError(cmd, -1, f"命令超时（{timeout_s}秒）")
+
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(device, root=False):
+    """
+    获取设备的共享会话（按 序列号 + 是否root 缓存）
+
+    Args:
+        device: Device对象
+        root: 是否需要root会话
+    """
+    key = (device.serial, root)
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = ShellSession(device, root=root)
+            _SESSIONS[key] = session
+        return session
+
+
+def close_all_sessions():
+    """关闭所有会话（进程退出时自动调用）"""
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
+
+
+atexit.register(close_all_sessions)
@@ -0,0 +1,377 @@
+"""
+设备频率拓扑缓存
+一次批量读取所有cpufreq policy、GPU和 /sys/class/devfreq 下所有devfreq域（DDR、总线、缓存等）
+的静态属性（关联CPU、硬件频率范围、可用频率列表），按 设备序列号 + 系统构建指纹 缓存到磁盘。之后的频率操作直接使用缓存，不再逐项cat sysfs。
+
+系统升级后构建指纹变化，缓存自动失效；也可以用 --refresh / --invalidate 手动刷新或删除
+"""
+import os
+import sys
+import json
+import re
+import hashlib
+import argparse
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device.device import resolve_device
+
+
+CPUFREQ_PATH = "/sys/devices/system/cpu/cpufreq"
+GPU_DEVFREQ_PATH = "/sys/devices/genpd:0:1f000000.mali/consumer:platform:1f000000.mali/consumer"
+DEVFREQ_CLASS_PATH = "/sys/class/devfreq"
+
+# 缓存目录（可通过环境变量 DEVICE_TOPOLOGY_CACHE_DIR 覆盖）
+TOPOLOGY_CACHE_DIR = os.environ.get(
+    "DEVICE_TOPOLOGY_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '../../.device_cache'))
+)
+
+# 缓存格式版本，字段变化时递增使旧缓存失效
+TOPOLOGY_VERSION = 3
+
+# 只缓存静态属性；调度器等运行时状态会被governor后端和恢复操作修改，需要时实时读取
+POLICY_ATTRS = (
+    "related_cpus", "affected_cpus",
+    "cpuinfo_min_freq", "cpuinfo_max_freq", "scaling_available_frequencies"
+)
+GPU_ATTRS = ("available_frequencies", "cpuinfo_max_freq")
+DEVFREQ_ATTRS = ("available_frequencies", "min_freq", "max_freq")
+
+# devfreq域分类：按域名中的单词匹配（域名形如 17000010.devfreq_mif、soc:qcom,cpu-llcc-ddr-bw）
+DEVFREQ_KINDS = (
+    ("gpu", ("gpu", "mali", "kgsl", "gpubw")),
+    ("ddr", ("mif", "ddr", "dmc", "memlat", "mem")),
+    ("cache", ("dsu", "llcc", "l3", "cache", "bci")),
+    ("bus", ("int", "bus", "noc", "cci", "cpubw", "bw")),
+)
+
+# 批量探测脚本，输出格式：<范围> <属性名> <值...>
+PROBE_SCRIPT = """\
+echo "build fingerprint $(getprop ro.build.fingerprint)"
+for p in {cpufreq}/policy*; do
+  [ -d "$p" ] || continue
+  id=${{p##*policy}}
+  for a in {policy_attrs}; do
+    [ -r "$p/$a" ] && echo "policy$id $a $(cat "$p/$a" 2>/dev/null)"
+  done
+done
+if [ -d "{gpu}" ]; then
+  for a in {gpu_attrs}; do
+    [ -r "{gpu}/$a" ] && echo "gpu $a $(cat "{gpu}/$a" 2>/dev/null)"
+  done
+fi
+for d in {devfreq}/*; do
+  [ -d "$d" ] || continue
+  for a in {devfreq_attrs}; do
+    [ -r "$d/$a" ] && echo "devfreq:${{d##*/}} $a $(cat "$d/$a" 2>/dev/null)"
+  done
+done
+true
+"""
+
+_MEMORY_CACHE = {}
+_MEMORY_CACHE_LOCK = threading.Lock()
+
+
+def _int_list(value):
+    return [int(v) for v in value.split() if v.isdigit()]
+
+
+def _int_or_none(value):
+    return int(value) if value and value.isdigit() else None
+
+
+def classify_devfreq(name):
+    """
+    根据域名判断devfreq域的类型
+
+    Returns:
+        str: "gpu"、"ddr"、"cache"、"bus" 或 "other"
+    """
+    words = set(re.split(r"[^a-z0-9]+", name.lower()))
+    for kind, keywords in DEVFREQ_KINDS:
+        if words & set(keywords):
+            return kind
+    return "other"
+
+
+class DeviceTopology:
+    """
+    一台设备的CPU/GPU频率拓扑
+
+    policies: {policy_id: {path, cpus, cpuinfo_min_freq, cpuinfo_max_freq, available_freqs}}
+    gpu: {path, available_freqs, min_freq, max_freq}，没有GPU devfreq节点时为None
+    devfreq: {域名: {path, kind, available_freqs, min_freq, max_freq}}（/sys/class/devfreq 下的所有域，
+             频率单位以驱动为准）
+    actuation: 频率切换延迟测量结果（见 experiments/cold_start/actuation_latency.py），未测量时为None
+    """
+
+    def __init__(self, serial, fingerprint, policies, gpu=None, actuation=None, devfreq=None):
+        self.serial = serial
+        self.fingerprint = fingerprint
+        self.policies = policies
+        self.gpu = gpu
+        self.actuation = actuation
+        self.devfreq = devfreq or {}
+
+    def __repr__(self):
+        return (f"DeviceTopology({self.serial!r}, policies={list(self.policies)}, gpu={self.gpu is not None}, "
+                f"devfreq={list(self.devfreq)})")
+
+    def to_dict(self):
+        return {
+            'version': TOPOLOGY_VERSION,
+            'serial': self.serial,
+            'fingerprint': self.fingerprint,
+            'policies': self.policies,
+            'gpu': self.gpu,
+            'actuation': self.actuation,
+            'devfreq': self.devfreq
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('serial'), data.get('fingerprint'), data.get('policies', {}),
+                   data.get('gpu'), data.get('actuation'), data.get('devfreq'))
+
+    @property
+    def policy_ids(self):
+        """按数字顺序排列的policy ID列表"""
+        return sorted(self.policies, key=int)
+
+    def policy_for_cpu(self, cpu_id):
+        """
+        查找包含指定CPU核心的policy
+
+        Returns:
+            tuple: (policy_id, policy信息)，找不到返回 (None, None)
+        """
+        for policy_id in self.policy_ids:
+            if int(cpu_id) in self.policies[policy_id]['cpus']:
+                return policy_id, self.policies[policy_id]
+        return None, None
+
+    def resolve_devfreq(self, key):
+        """
+        把时间段配置中的devfreq键解析为域名
+
+        Args:
+            key: 完整域名（如 17000010.devfreq_mif）、类型（ddr / bus / cache / gpu，需唯一）或域名的一部分（如 mif）
+
+        Returns:
+            str: 域名
+
+        Raises:
+            KeyError: 找不到或匹配到多个域
+        """
+        if key in self.devfreq:
+            return key
+        by_kind = [name for name, info in self.devfreq.items() if info['kind'] == key]
+        matches = by_kind or [name for name in self.devfreq if key in name]
+        if len(matches) != 1:
+            found = "、".join(matches) if matches else "无"
+            raise KeyError(f"无法确定devfreq域 '{key}'（匹配: {found}）")
+        return matches[0]
+
+    @classmethod
+    def parse_probe_output(cls, serial, output):
+        """解析 PROBE_SCRIPT 的输出"""
+        fingerprint = None
+        raw_policies = {}
+        raw_gpu = {}
+        raw_devfreq = {}
+        for line in output.splitlines():
+            parts = line.strip().split(" ", 2)
+            if len(parts) < 2:
+                continue
+            scope, attr = parts[0], parts[1]
+            value = parts[2].strip() if len(parts) == 3 else ""
+            if scope == "build" and attr == "fingerprint":
+                fingerprint = value
+            elif scope.startswith("policy"):
+                raw_policies.setdefault(scope[len("policy"):], {})[attr] = value
+            elif scope == "gpu":
+                raw_gpu[attr] = value
+            elif scope.startswith("devfreq:"):
+                raw_devfreq.setdefault(scope[len("devfreq:"):], {})[attr] = value
+
+        policies = {}
+        for policy_id, attrs in raw_policies.items():
+            cpus = _int_list(attrs.get("related_cpus") or attrs.get("affected_cpus", ""))
+            min_freq = _int_or_none(attrs.get("cpuinfo_min_freq"))
+            max_freq = _int_or_none(attrs.get("cpuinfo_max_freq"))
+            available = sorted(_int_list(attrs.get("scaling_available_frequencies", "")))
+            if not available and min_freq is not None and max_freq is not None:
+                # 没有可用频率列表时只记录硬件范围
+                available = [min_freq, max_freq]
+            policies[policy_id] = {
+                'path': f"{CPUFREQ_PATH}/policy{policy_id}",
+                'cpus': cpus,
+                'cpuinfo_min_freq': min_freq,
+                'cpuinfo_max_freq': max_freq,
+                'available_freqs': available
+            }
+
+        gpu = None
+        if raw_gpu:
+            available = sorted(_int_list(raw_gpu.get("available_frequencies", "")))
+            max_freq = max(available) if available else _int_or_none(raw_gpu.get("cpuinfo_max_freq"))
+            gpu = {
+                'path': GPU_DEVFREQ_PATH,
+                'available_freqs': available,
+                'min_freq': min(available) if available else None,
+                'max_freq': max_freq
+            }
+
+        devfreq = {}
+        for name, attrs in sorted(raw_devfreq.items()):
+            available = sorted(_int_list(attrs.get("available_frequencies", "")))
+            devfreq[name] = {
+                'path': f"{DEVFREQ_CLASS_PATH}/{name}",
+                'kind': classify_devfreq(name),
+                'available_freqs': available,
+                'min_freq': min(available) if available else _int_or_none(attrs.get("min_freq")),
+                'max_freq': max(available) if available else _int_or_none(attrs.get("max_freq"))
+            }
+        return cls(serial, fingerprint, policies, gpu, devfreq=devfreq)
+
+
+def probe_topology(device=None):
+    """
+    通过一次adb调用读取设备拓扑（不使用缓存）
+
+    Returns:
+        DeviceTopology
+    """
+    device = resolve_device(device)
+    script = PROBE_SCRIPT.format(
+        cpufreq=CPUFREQ_PATH,
+        policy_attrs=" ".join(POLICY_ATTRS),
+        gpu=GPU_DEVFREQ_PATH,
+        gpu_attrs=" ".join(GPU_ATTRS),
+        devfreq=DEVFREQ_CLASS_PATH,
+        devfreq_attrs=" ".join(DEVFREQ_ATTRS)
+    )
+    output = device.run_script(script, need_root=True)
+    return DeviceTopology.parse_probe_output(device.serial, output)
+
+
+def _cache_path(device, fingerprint):
+    digest = hashlib.sha1((fingerprint or "unknown").encode("utf-8")).hexdigest()[:12]
+    return os.path.join(TOPOLOGY_CACHE_DIR, f"topology_{device.label}_{digest}.json")
+
+
+def get_topology(device=None, refresh=False):
+    """
+    获取设备拓扑：优先使用进程内缓存，其次是磁盘缓存，都没有时探测并写入缓存
+
+    Args:
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+        refresh: 忽略缓存重新探测
+
+    Returns:
+        DeviceTopology
+    """
+    device = resolve_device(device)
+    with _MEMORY_CACHE_LOCK:
+        if not refresh and device.serial in _MEMORY_CACHE:
+            return _MEMORY_CACHE[device.serial]
+
+    topology = None
+    if not refresh:
+        fingerprint = device.getprop("ro.build.fingerprint")
+        path = _cache_path(device, fingerprint)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == TOPOLOGY_VERSION and data.get('fingerprint') == fingerprint:
+                    topology = DeviceTopology.from_dict(data)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  拓扑缓存损坏，重新探测: {e}")
+
+    if topology is None:
+        topology = probe_topology(device)
+        save_topology(topology, device)
+    else:
+        with _MEMORY_CACHE_LOCK:
+            _MEMORY_CACHE[device.serial] = topology
+    return topology
+
+
+def save_topology(topology, device=None):
+    """
+    写入磁盘缓存并更新进程内缓存（测量结果等附加字段修改后调用）
+
+    Args:
+        topology: DeviceTopology
+        device: 目标设备（序列号或Device对象，None为adb默认设备）
+    """
+    device = resolve_device(device)
+    os.makedirs(TOPOLOGY_CACHE_DIR, exist_ok=True)
+    with open(_cache_path(device, topology.fingerprint), 'w', encoding='utf-8') as f:
+        json.dump(topology.to_dict(), f, ensure_ascii=False, indent=2)
+    with _MEMORY_CACHE_LOCK:
+        _MEMORY_CACHE[device.serial] = topology
+
+
+def invalidate_topology(device=None):
+    """
+    删除设备的拓扑缓存（进程内和磁盘上所有构建指纹的缓存）
+
+    Returns:
+        int: 删除的缓存文件数
+    """
+    device = resolve_device(device)
+    with _MEMORY_CACHE_LOCK:
+        _MEMORY_CACHE.pop(device.serial, None)
+    if not os.path.isdir(TOPOLOGY_CACHE_DIR):
+        return 0
+    prefix = f"topology_{device.label}_"
+    removed = 0
+    for name in os.listdir(TOPOLOGY_CACHE_DIR):
+        if name.startswith(prefix) and name.endswith(".json"):
+            os.remove(os.path.join(TOPOLOGY_CACHE_DIR, name))
+            removed += 1
+    return removed
+
+
+def print_topology(topology):
+    """打印拓扑信息"""
+    print(f"📱 设备: {topology.serial or 'default'}")
+    print(f"   构建指纹: {topology.fingerprint}")
+    for policy_id in topology.policy_ids:
+        p = topology.policies[policy_id]
+        freqs = p['available_freqs']
+        print(f"   policy{policy_id}: cpus={p['cpus']} "
+              f"range={p['cpuinfo_min_freq']}-{p['cpuinfo_max_freq']} KHz ({len(freqs)}个频点)")
+    if topology.gpu:
+        print(f"   GPU: {topology.gpu['min_freq']}-{topology.gpu['max_freq']} Hz "
+              f"({len(topology.gpu['available_freqs'])}个频点)")
+    else:
+        print("   GPU: 未找到devfreq节点")
+    for name, info in topology.devfreq.items():
+        print(f"   devfreq {name} [{info['kind']}]: "
+              f"range={info['min_freq']}-{info['max_freq']} ({len(info['available_freqs'])}个频点)")
+    if topology.actuation:
+        print(f"   频率切换延迟: 已测量（{topology.actuation.get('measured_at', '')}）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看/刷新设备频率拓扑缓存')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存重新探测')
+    parser.add_argument('--invalidate', action='store_true', help='删除该设备的拓扑缓存')
+    parser.add_argument('--serial', default=None, help='目标设备序列号（默认: adb默认设备）')
+    args = parser.parse_args()
+
+    if args.invalidate:
+        removed = invalidate_topology(args.serial)
+        print(f"🗑️  已删除 {removed} 个拓扑缓存文件")
+        return
+    print_topology(get_topology(args.serial, refresh=args.refresh))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,57 @@
 """
 将GPU频率设置为最大值
 """
-import subprocess
 import sys
 import os
 import time
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from experiments.device import AdbError, resolve_device
+from experiments.device.topology import GPU_DEVFREQ_PATH, get_topology
 
-def adb_shell(cmd: str, need_root: bool = False) -> str:
+
+def adb_shell(cmd: str, need_root: bool = False, device=None) -> str:
     """执行adb shell命令"""
-    if need_root:
-        full_cmd = f"su -c \"{cmd}\""
-    else:
-        full_cmd = cmd
-    result = subprocess.run(
-        ["adb", "shell", full_cmd],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    out = result.stdout.decode("utf-8", "ignore").strip()
-    err = result.stderr.decode("utf-8", "ignore").strip()
-    if result.returncode != 0:
-        print(f"[ERROR] ADB 命令失败: {full_cmd}\n{err}", file=sys.stderr)
+    try:
+        return resolve_device(device).shell(cmd, need_root=need_root)
+    except AdbError as e:
+        print(f"[ERROR] ADB 命令失败: {e.cmd}\n{e.stderr}", file=sys.stderr)
         sys.exit(1)
-    return out
 
 
 # GPU路径（固定）
-GPU_PATH = "/sys/devices/genpd:0:1f000000.mali/consumer:platform:1f000000.mali/consumer"
+GPU_PATH = GPU_DEVFREQ_PATH
 
 
-def get_gpu_info():
+def get_gpu_info(device=None):
     """
     获取GPU频率信息
     
+    可用频率和硬件范围来自设备拓扑缓存，当前设置的min/max用一次adb调用读取
+    
     Returns:
         dict: 包含GPU频率信息的字典，如果失败返回None
     """
     try:
         info = {}
         
-        # 读取cpuinfo_max_freq（如果存在）
-        try:
-            max_freq = adb_shell(f"cat {GPU_PATH}/cpuinfo_max_freq 2>/dev/null || echo ''", need_root=True).strip()
-            if max_freq:
-                info['max_freq_hz'] = int(max_freq)
-        except:
-            pass
-        
-        # 读取available_frequencies
-        try:
-            freqs_str = adb_shell(f"cat {GPU_PATH}/available_frequencies", need_root=True).strip()
-            if freqs_str:
-                freqs = [int(f) for f in freqs_str.split() if f.isdigit()]
-                if freqs:
-                    info['available_freqs_hz'] = freqs
-                    info['min_freq_hz'] = min(freqs)
-                    info['max_freq_hz'] = max(freqs)
-        except:
-            pass
+        gpu = get_topology(device).gpu
+        if gpu:
+            if gpu['available_freqs']:
+                info['available_freqs_hz'] = list(gpu['available_freqs'])
+                info['min_freq_hz'] = gpu['min_freq']
+            if gpu['max_freq']:
+                info['max_freq_hz'] = gpu['max_freq']
         
         # 读取当前设置的频率
         try:
-            current_min = adb_shell(f"cat {GPU_PATH}/scaling_min_freq", need_root=True).strip()
-            if current_min:
-                info['current_min_freq_hz'] = int(current_min)
-        except:
-            pass
-        
-        try:
-            current_max = adb_shell(f"cat {GPU_PATH}/scaling_max_freq", need_root=True).strip()
-            if current_max:
-                info['current_max_freq_hz'] = int(current_max)
+            current = adb_shell(
+                f"cat {GPU_PATH}/scaling_min_freq {GPU_PATH}/scaling_max_freq",
+                need_root=True, device=device
+            ).split()
+            if len(current) == 2:
+                info['current_min_freq_hz'] = int(current[0])
+                info['current_max_freq_hz'] = int(current[1])
         except:
             pass
         
@@ -81,9 +61,9 @@ def get_gpu_info():
         return None
 
 
-def print_gpu_info():
+def print_gpu_info(device=None):
     """打印GPU频率信息"""
-    info = get_gpu_info()
+    info = get_gpu_info(device)
     if not info:
         print("⚠️  无法获取GPU频率信息")
         return
@@ -100,14 +80,14 @@ def print_gpu_info():
     print()
 
 
-def get_gpu_original_settings():
+def get_gpu_original_settings(device=None):
     """
     获取GPU的原始频率设置（从available_frequencies读取默认范围）
     
     Returns:
         dict: 包含min_freq和max_freq的字典
     """
-    info = get_gpu_info()
+    info = get_gpu_info(device)
     if not info or 'min_freq_hz' not in info or 'max_freq_hz' not in info:
         print("⚠️  无法获取GPU原始频率设置")
         return None
@@ -119,7 +99,7 @@ def get_gpu_original_settings():
     }
 
 
-def set_gpu_to_max(save_original=True):
+def set_gpu_to_max(save_original=True, device=None):
     """
     设置GPU到最大频率
     
@@ -129,7 +109,7 @@ def set_gpu_to_max(save_original=True):
     Returns:
         dict: 原始频率设置，如果save_original=False则返回None
     """
-    info = get_gpu_info()
+    info = get_gpu_info(device)
     if not info or 'max_freq_hz' not in info:
         print("⚠️  无法获取GPU最大频率")
         return None
@@ -139,25 +119,25 @@ def set_gpu_to_max(save_original=True):
     # 保存原始设置
     original_settings = None
     if save_original:
-        original_settings = get_gpu_original_settings()
+        original_settings = get_gpu_original_settings(device)
     
     # 设置最小和最大频率都为最大值
     min_path = f"{GPU_PATH}/scaling_min_freq"
     max_path = f"{GPU_PATH}/scaling_max_freq"
     
     # 使用sh -c来确保重定向正确执行
-    adb_shell(f"sh -c 'echo {max_freq} > {min_path}'", need_root=True)
-    adb_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
+    adb_shell(f"sh -c 'echo {max_freq} > {min_path}'", need_root=True, device=device)
+    adb_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True, device=device)
     
     print(f"✅ GPU: {max_freq} Hz ({max_freq/1e6:.0f} MHz)")
     return original_settings
 
 
-def restore_gpu_frequency():
+def restore_gpu_frequency(device=None):
     """
     恢复GPU频率到默认范围（从available_frequencies读取最小值和最大值）
     """
-    original = get_gpu_original_settings()
+    original = get_gpu_original_settings(device)
     if not original:
         print("⚠️  无法获取GPU原始频率设置，无法恢复")
         return
@@ -170,9 +150,9 @@ def restore_gpu_frequency():
     
     # 使用sh -c来确保重定向正确执行
     # 恢复最小频率到硬件支持的最小值
-    adb_shell(f"sh -c 'echo {min_freq} > {min_path}'", need_root=True)
+    adb_shell(f"sh -c 'echo {min_freq} > {min_path}'", need_root=True, device=device)
     # 恢复最大频率到硬件支持的最大值
-    adb_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True)
+    adb_shell(f"sh -c 'echo {max_freq} > {max_path}'", need_root=True, device=device)
     
     print(f"✅ GPU: 已恢复 (min: {min_freq/1e6:.1f} MHz, max: {max_freq/1e6:.1f} MHz)")
 
@@ -184,21 +164,22 @@ def main():
     parser = argparse.ArgumentParser(description='将GPU频率设置为最大值')
     parser.add_argument('--info', action='store_true', help='查看GPU频率信息')
     parser.add_argument('--restore', action='store_true', help='恢复GPU频率到默认范围')
+    parser.add_argument('--serial', help='目标设备序列号（多台设备连接时必须指定）')
     
     args = parser.parse_args()
     
     # 如果指定了--info，只查看信息并退出
     if args.info:
-        print_gpu_info()
+        print_gpu_info(args.serial)
         return
     
     # 如果指定了--restore，恢复频率
     if args.restore:
-        restore_gpu_frequency()
+        restore_gpu_frequency(args.serial)
         return
     
     # 默认设置GPU到最大频率
-    set_gpu_to_max()
+    set_gpu_to_max(device=args.serial)
 
 
 if __name__ == "__main__":
@@ -4,46 +4,57 @@ import os
 import shutil
 import subprocess
 from datetime import datetime
+
+from experiments.device import resolve_device
+
+
 def start_perfetto(
     config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
-    outfile="/data/misc/perfetto-traces/trace.perfetto-trace"
+    outfile="/data/misc/perfetto-traces/trace.perfetto-trace",
+    device=None
 ):
     """
     在设备上启动一段系统级 Perfetto 跟踪，并拉取到本地后删掉设备端文件。
       config_file: 设备端 Perfetto 配置文件路径
       outfile:     设备端跟踪文件输出路径
+      device:      目标设备（序列号或Device对象，None为adb默认设备）
     """
+    device = resolve_device(device)
     # 1. 启动 trace（使用 -t 分配伪终端，以便之后能用 CTRL+C 优雅地停止）
-    subprocess.run([
-        "adb", "shell", "-t",
+    subprocess.run(device.adb_args(
+        "shell", "-t",
         "perfetto",
         "--txt",
         "-c", config_file,
         "--out", outfile
-    ], check=True)
+    ), check=True)
     print(f"✅ Perfetto 跟踪已完成，保存在设备：{outfile}")
 def start_perfetto_for_AppStartup(
     config_file="/data/misc/perfetto-configs/HardwareInfo.pbtx",
-    outfile="/data/misc/perfetto-traces/trace.perfetto-trace"
+    outfile="/data/misc/perfetto-traces/trace.perfetto-trace",
+    device=None
 ):
     """
     在设备上启动一段系统级 Perfetto 跟踪，并拉取到本地后删掉设备端文件。
       config_file: 设备端 Perfetto 配置文件路径
       outfile:     设备端跟踪文件输出路径
+      device:      目标设备（序列号或Device对象，None为adb默认设备）
     """
+    device = resolve_device(device)
     # 1. 启动 trace（使用 -t 分配伪终端，以便之后能用 CTRL+C 优雅地停止）
-    subprocess.run([
-        "adb", "shell", "-t",
+    subprocess.run(device.adb_args(
+        "shell", "-t",
         "perfetto",
         "--txt",
         "-c", config_file,
         "--out", outfile
-    ], check=True)
+    ), check=True)
     print(f"✅ Perfetto 跟踪已完成，保存在设备：{outfile}")
 
 
 
-def get_perfetto(method):
+def get_perfetto(method, device=None):
+    device = resolve_device(device)
     # 获取当前脚本所在目录（项目根目录）
     script_dir = os.path.dirname(os.path.abspath(__file__))
     # 构建绝对路径：项目根目录/Perfetto/trace/traceRecord/method{method}
@@ -56,26 +67,31 @@ def get_perfetto(method):
         print(f"✅ 创建文件夹：{package_folder}")
 
     # 2. 生成带时间戳的文件名
+    # 多设备并行时同一秒内可能产生多个trace，文件名中带上设备序列号避免覆盖
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    dst_file = os.path.join(package_folder, f"{method}_{timestamp}.perfetto-trace")
+    if device.serial:
+        dst_file = os.path.join(package_folder, f"{method}_{device.label}_{timestamp}.perfetto-trace")
+    else:
+        dst_file = os.path.join(package_folder, f"{method}_{timestamp}.perfetto-trace")
     
-    subprocess.run([
-        "adb", "pull", outfile, dst_file
-    ], check=True)
+    subprocess.run(device.adb_args(
+        "pull", outfile, dst_file
+    ), check=True)
     print(f"✅ 跟踪文件已拉取并保存为：{dst_file}")
 
     # 3. 删除设备端文件
-    subprocess.run([
-        "adb", "shell", "rm", "-f", outfile
-    ], check=True)
+    subprocess.run(device.adb_args(
+        "shell", "rm", "-f", outfile
+    ), check=True)
     print(f"✅ 已删除设备端文件：{outfile}")
     
     # 返回生成的文件名（不含路径）
     return os.path.basename(dst_file)
 
-def stop_perfetto():
+def stop_perfetto(device=None):
     logging.info("结束 Perfetto 采集")
-    subprocess.run(["adb", "shell", "pkill", "-2", "perfetto"], check=False)
+    device = resolve_device(device)
+    subprocess.run(device.adb_args("shell", "pkill", "-2", "perfetto"), check=False)
 
 if __name__ == "__main__":
     start_perfetto()